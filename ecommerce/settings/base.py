@@ -146,7 +146,7 @@ LOGGING = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'knox.auth.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -175,10 +175,12 @@ REST_KNOX = {
     'USER_SERIALIZER': 'users.serializers.UserSerializer',
     'TOKEN_TTL': timedelta(hours=24),
     'AUTO_REFRESH': True,
-    'MIN_REFRESH_INTERVAL': 60,
+    'MIN_REFRESH_INTERVAL': 300,  # A token's expiry is written at most once per this many seconds
     'AUTH_HEADER_PREFIX': 'Token',
 }
 
+AUTH_TOKEN_CACHE_TIMEOUT = 300  # Seconds a verified token skips knox's full check (its row is still read)
+
 AUTH_USER_MODEL = 'users.User'
 
 
@@ -197,7 +199,14 @@ MPESA_PASSKEY = config("MPESA_PASSKEY")
 
 MPESA_SHORTCODE = config("MPESA_SHORTCODE")
 MPESA_CALLBACK_URL = config("CALLBACK_URL")
+# Shared secret sent as ?token= on the callback URL; callbacks without it are refused.
+# Required: a blank value fails the payments.E001 system check.
+MPESA_CALLBACK_TOKEN = config("MPESA_CALLBACK_TOKEN")
 MPESA_BASE_URL = config("MPESA_BASE_URL")
+MPESA_CONNECT_TIMEOUT = 5  # Seconds to open a connection to Daraja
+MPESA_READ_TIMEOUT = 30  # Seconds to wait for a Daraja response
+MPESA_POOL_MAXSIZE = 10  # Keep-alive connections kept per process
+MPESA_CALLBACK_ASYNC = False  # Only store callbacks in the request; process_mpesa_callbacks applies them
 
 # Frontend URLs (for email templates)
 FRONTEND_VERIFICATION_SUCCESS_URL = 'https://yourapp.com/verification-success/'
@@ -225,10 +234,24 @@ SWAGGER_SETTINGS = {
 }
 
 
+# Pagination settings
+PAGINATION_COUNT_CACHE_TIMEOUT = 30  # Seconds a cached list count is reused
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 10000  # Use planner estimates above this many rows
+
+# Catalog response cache
+CATALOG_CACHE_TIMEOUT = 300  # Backstop; entries are invalidated by model version bumps
+
 # Order settings
 ORDER_NUMBER_PREFIX = 'ORD'
+# ORDER_NUMBER_NODE_ID = 1  # Optional fixed per-process node (0-1048575) for order numbers; random if unset, redrawn on a clash
 DEFAULT_CURRENCY = 'USD'
 ORDER_AUTO_CANCEL_DAYS = 7  # Automatically cancel unpaid orders after 7 days
+INVENTORY_HOLD_MINUTES = 15  # Stock held for an unpaid order is released after this
+ANONYMOUS_CART_TIMEOUT = 60 * 60 * 24 * 7  # Seconds an untouched anonymous (cache-backed) cart is kept
+
+# Payment outbox (gateway calls made by the process_payment_outbox worker)
+PAYMENT_OUTBOX_LEASE_SECONDS = 300  # A claimed message is retried if not finished within this; never less than one push's timeouts
+PAYMENT_OUTBOX_MAX_ATTEMPTS = 5  # Transport errors are retried with backoff up to this many times
 
 # Payment gateway settings (example for Stripe)
 STRIPE_PUBLIC_KEY = 'your-stripe-public-key'
@@ -238,6 +261,8 @@ STRIPE_WEBHOOK_SECRET = 'your-stripe-webhook-secret'
 # Email notifications
 ORDER_CONFIRMATION_EMAIL_TEMPLATE = 'emails/order_confirmation.html'
 ORDER_SHIPPED_EMAIL_TEMPLATE = 'emails/order_shipped.html'
+EMAIL_OUTBOX_LEASE_SECONDS = 60  # A claimed email is retried if not sent within this
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5  # Send errors are retried with backoff up to this many times
 
 # Optional but recommended settings for corsheaders
 CORS_ALLOW_CREDENTIALS = True  # Allow cookies to be included in CORS
@@ -0,0 +1,87 @@
+"""
+Original-value tracking for model instances.
+
+``DirtyFieldsMixin`` remembers field values as they were loaded from the
+database, so ``pre_save``/``post_save`` handlers can tell what changed
+without reading the row again.
+"""
+import copy
+
+_MISSING = object()
+
+
+class DirtyFieldsMixin:
+    """
+    Model mixin. ``tracked_fields`` names the fields to watch; ``None``
+    watches every concrete field except the primary key.
+
+    Originals are captured when the instance is loaded and again after
+    each save, so signal handlers running inside ``save()`` still see the
+    values from before it. New instances have no originals: use
+    ``_state.adding`` to tell them apart. A field that was deferred at
+    load time counts as changed once it is assigned.
+    """
+    tracked_fields = None
+
+    @classmethod
+    def _get_tracked_fields(cls):
+        return [
+            field for field in cls._meta.concrete_fields
+            if not field.primary_key
+            and (cls.tracked_fields is None or field.name in cls.tracked_fields)
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._capture_originals()
+        return instance
+
+    def _capture_originals(self, fields=None):
+        originals = getattr(self, '_original_values', None)
+        if originals is None or fields is None:
+            originals = self._original_values = {}
+        for field in self._get_tracked_fields():
+            if fields is not None and field.attname not in fields and field.name not in fields:
+                continue
+            value = self.__dict__.get(field.attname, _MISSING)
+            if value is not _MISSING:
+                # JSON values can be mutated in place; everything else is
+                # replaced on assignment
+                if isinstance(value, (dict, list)):
+                    value = copy.deepcopy(value)
+                originals[field.attname] = value
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._capture_originals(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._capture_originals(kwargs.get('update_fields'))
+
+    def get_original(self, name, default=None):
+        """
+        The value ``name`` had when loaded, or ``default`` if unknown
+        """
+        attname = self._meta.get_field(name).attname
+        return getattr(self, '_original_values', {}).get(attname, default)
+
+    def has_changed(self, name):
+        if self._state.adding:
+            return False
+        attname = self._meta.get_field(name).attname
+        original = getattr(self, '_original_values', {}).get(attname, _MISSING)
+        current = self.__dict__.get(attname, _MISSING)
+        if original is _MISSING:
+            return current is not _MISSING
+        return current is not _MISSING and current != original
+
+    def get_dirty_fields(self):
+        """
+        Tracked field names changed since load, mapped to their originals
+        """
+        return {
+            field.name: self.get_original(field.name)
+            for field in self._get_tracked_fields() if self.has_changed(field.name)
+        }
@@ -5,17 +5,18 @@ from django.utils.http import urlencode
 from django.db.models import Count, Sum, F
 from django.contrib.admin import SimpleListFilter
 from django import forms
-from django.db import models
+from django.db import models, transaction
 from django.forms import Textarea, TextInput
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.contrib import messages
-from django.core.exceptions import ValidationError
 
 from .models import (
     Order, OrderItem, ShippingAddress, 
     BillingAddress, OrderStatusHistory, Cart, CartItem
 )
+from .emails import queue_order_shipped
+from .services import cancel_orders
 
 
 class OrderStatusFilter(SimpleListFilter):
@@ -298,9 +299,18 @@ class OrderAdmin(admin.ModelAdmin):
 
     @admin.action(description=_('Mark selected orders as Shipped'))
     def mark_as_shipped(self, request, queryset):
-        updated = queryset.filter(status=Order.OrderStatus.PROCESSING).update(
-            status=Order.OrderStatus.SHIPPED
-        )
+        with transaction.atomic():
+            orders = list(
+                queryset.filter(status=Order.OrderStatus.PROCESSING)
+                .select_for_update(of=('self',)).select_related('user')
+            )
+            updated = Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+                status=Order.OrderStatus.SHIPPED, updated_at=timezone.now()
+            )
+            # The update skips the order signals, so notify here
+            for order in orders:
+                order.status = Order.OrderStatus.SHIPPED
+                queue_order_shipped(order)
         self.message_user(
             request,
             _('Successfully marked {} orders as shipped.').format(updated),
@@ -320,26 +330,29 @@ class OrderAdmin(admin.ModelAdmin):
 
     @admin.action(description=_('Mark selected orders as Cancelled'))
     def mark_as_cancelled(self, request, queryset):
-        for order in queryset:
-            try:
-                order.cancel(reason="Bulk cancellation from admin")
-            except ValidationError as e:
-                self.message_user(request, str(e), messages.ERROR)
+        # Counted first: a changelist filtered on status no longer matches
+        # the orders once they are cancelled
+        selected = queryset.count()
+        cancelled = cancel_orders(
+            queryset, reason="Bulk cancellation from admin", user=request.user
+        )
+        skipped = selected - cancelled
+        if skipped:
+            self.message_user(
+                request,
+                _('{} orders could not be cancelled.').format(skipped),
+                messages.WARNING
+            )
         self.message_user(
             request,
-            _('Cancellation requested for selected orders.'),
+            _('Successfully cancelled {} orders.').format(cancelled),
             messages.SUCCESS
         )
 
     def save_model(self, request, obj, form, change):
-        if change and 'status' in form.changed_data:
-            OrderStatusHistory.objects.create(
-                order=obj,
-                old_status=form.initial.get('status'),
-                new_status=obj.status,
-                created_by=request.user,
-                note="Changed via admin interface"
-            )
+        # order_pre_save writes the status history row
+        obj._updated_by = request.user
+        obj._status_note = "Changed via admin interface"
         super().save_model(request, obj, form, change)
 
 
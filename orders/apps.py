@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
- 
+
+    def ready(self):
+        # Import signals to ensure they are registered
+        import orders.signals
@@ -0,0 +1,45 @@
+"""
+Order emails, queued in the email outbox (see ``users.outbox``)
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from users.outbox import queue_email
+
+
+def _base_context(order):
+    return {
+        'order': order,
+        'customer': order.user,
+        'company_name': settings.SITE_NAME,
+        'current_year': timezone.now().year,
+    }
+
+
+def queue_order_confirmation(order, items):
+    """
+    Queue the confirmation for a new order. ``items`` are its already
+    loaded lines, so rendering does not query them again.
+    """
+    context = _base_context(order)
+    context['items'] = items
+    return queue_email(
+        f'Order {order.number} confirmed',
+        settings.ORDER_CONFIRMATION_EMAIL_TEMPLATE,
+        context,
+        order.user.email
+    )
+
+
+def queue_order_shipped(order):
+    """
+    Queue the shipping notice for ``order``
+    """
+    context = _base_context(order)
+    context['shipment'] = {'items': order.items}
+    return queue_email(
+        f'Order {order.number} has shipped',
+        settings.ORDER_SHIPPED_EMAIL_TEMPLATE,
+        context,
+        order.user.email
+    )
@@ -0,0 +1,305 @@
+"""
+Stock reservations.
+
+Stock for a whole order is taken with one conditional
+``UPDATE ... WHERE quantity >= n`` per model (products, variants), so
+concurrent checkouts cannot oversell and no row lock is held while the
+customer pays. Each hold expires after ``INVENTORY_HOLD_MINUTES``; confirm
+it when payment succeeds and release it when payment fails or the order is
+cancelled.
+
+A hold records the stock it actually took, which is all a release hands
+back: a backordered product that runs out only takes what was left.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+
+from products.cache import bump_version
+from products.models import Product, ProductVariant
+from .models import StockReservation
+
+
+class InsufficientStock(ValidationError):
+    default_detail = _('Insufficient inventory')
+    default_code = 'insufficient_stock'
+
+
+class _Short(Exception):
+    pass
+
+
+def _hold_expiry(now=None):
+    minutes = getattr(settings, 'INVENTORY_HOLD_MINUTES', 15)
+    return (now or timezone.now()) + timedelta(minutes=minutes)
+
+
+def _per_row(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField()
+    )
+
+
+def _take(model, quantities):
+    """
+    Decrement stock for every row in one UPDATE. A short row is left alone
+    and the call returns False, so run it in a savepoint that can be undone.
+    """
+    if not quantities:
+        return True
+    updated = model.objects.filter(
+        pk__in=list(quantities), quantity__gte=_per_row(quantities)
+    ).update(
+        quantity=F('quantity') - _per_row(quantities),
+        updated_at=timezone.now()
+    )
+    return updated == len(quantities)
+
+
+def _clamp_to_stock(model, quantities, rows):
+    """
+    ``quantities`` with the entries for ``rows`` cut down to the stock they
+    have left. Those rows are locked, so the result holds until commit.
+    """
+    rows = {pk for pk in quantities if pk in rows}
+    if not rows:
+        return quantities
+    available = dict(
+        model.objects.select_for_update().filter(pk__in=rows).values_list('pk', 'quantity')
+    )
+    return Counter({
+        pk: min(quantity, available.get(pk, 0)) if pk in rows else quantity
+        for pk, quantity in quantities.items()
+    })
+
+
+def _give_back(model, quantities):
+    if quantities:
+        model.objects.filter(pk__in=list(quantities)).update(
+            quantity=F('quantity') + _per_row(quantities),
+            updated_at=timezone.now()
+        )
+
+
+def _short_rows(model, quantities):
+    available = dict(
+        model.objects.filter(pk__in=list(quantities)).values_list('pk', 'quantity')
+    )
+    return [pk for pk, quantity in quantities.items() if available.get(pk, 0) < quantity]
+
+
+def _stock_changed(product_ids, taken):
+    """
+    Flip tracked products to out of stock once stock was taken, or back to
+    active once it returned, then invalidate cached catalog responses
+    """
+    if product_ids:
+        products = Product.objects.filter(
+            pk__in=list(product_ids),
+            track_quantity=True,
+            continue_selling_when_out_of_stock=False
+        )
+        if taken:
+            products.filter(
+                status=Product.ProductStatus.ACTIVE, quantity=0
+            ).update(status=Product.ProductStatus.OUT_OF_STOCK, updated_at=timezone.now())
+        else:
+            products.filter(
+                status=Product.ProductStatus.OUT_OF_STOCK, quantity__gt=0
+            ).update(status=Product.ProductStatus.ACTIVE, updated_at=timezone.now())
+    # Stock moves through UPDATEs, which bypass the cache signals
+    bump_version(Product)
+    bump_version(ProductVariant)
+
+
+def _tracked_lines(items):
+    """
+    Quantities per product and per variant for lines whose stock is
+    tracked, plus the products allowed to backorder
+    """
+    products, variants, backorder = Counter(), Counter(), set()
+    for item in items:
+        if item.variant_id:
+            if item.variant.track_quantity:
+                variants[item.variant_id] += item.quantity
+        elif item.product_id and item.product.track_quantity:
+            products[item.product_id] += item.quantity
+            if item.product.continue_selling_when_out_of_stock:
+                backorder.add(item.product_id)
+    return products, variants, backorder
+
+
+def _take_order(products, variants, backorder):
+    """
+    Take stock for both models. Returns the product quantities taken,
+    where backordered products only take what is left, or None if a line
+    is short.
+    """
+    # Both UPDATEs share one savepoint so a short variant undoes the products
+    try:
+        with transaction.atomic():
+            taken = _clamp_to_stock(Product, products, backorder)
+            if not (_take(Product, taken) and _take(ProductVariant, variants)):
+                raise _Short
+    except _Short:
+        return None
+    return taken
+
+
+def reserve_stock(order, items, now=None):
+    """
+    Take stock for every line of ``order`` and record a hold per product
+    or variant. All or nothing: raises ``InsufficientStock`` naming the
+    short lines and leaves stock untouched. ``items`` are order lines with
+    their product and variant loaded.
+    """
+    products, variants, backorder = _tracked_lines(items)
+    if not products and not variants:
+        return []
+
+    with transaction.atomic():
+        taken = _take_order(products, variants, backorder)
+        if taken is None:
+            # Lapsed holds may still be sitting on the stock we need
+            release_expired_reservations(
+                now=now, products=list(products), variants=list(variants)
+            )
+            taken = _take_order(products, variants, backorder)
+            if taken is None:
+                short = (
+                    {(Product, pk) for pk in _short_rows(Product, products) if pk not in backorder}
+                    | {(ProductVariant, pk) for pk in _short_rows(ProductVariant, variants)}
+                )
+                names = [
+                    item.name for item in items
+                    if (ProductVariant, item.variant_id) in short
+                    or (not item.variant_id and (Product, item.product_id) in short)
+                ]
+                raise InsufficientStock(
+                    _('Insufficient inventory for: %(lines)s') % {'lines': ', '.join(names)}
+                )
+
+        expires_at = _hold_expiry(now)
+        reservations = StockReservation.objects.bulk_create([
+            StockReservation(order=order, product_id=pk, quantity=quantity, expires_at=expires_at)
+            for pk, quantity in taken.items() if quantity
+        ] + [
+            StockReservation(order=order, variant_id=pk, quantity=quantity, expires_at=expires_at)
+            for pk, quantity in variants.items()
+        ])
+        _stock_changed(products, taken=True)
+    return reservations
+
+
+def _split(reservations):
+    products, variants = Counter(), Counter()
+    for reservation in reservations:
+        if reservation.variant_id:
+            variants[reservation.variant_id] += reservation.quantity
+        else:
+            products[reservation.product_id] += reservation.quantity
+    return products, variants
+
+
+def _set_status(reservations, status):
+    StockReservation.objects.filter(
+        pk__in=[reservation.pk for reservation in reservations]
+    ).update(status=status, updated_at=timezone.now())
+
+
+def confirm_reservations(order):
+    """
+    Keep the stock for a paid order. Holds that already lapsed are taken
+    again as far as stock allows, without failing, since the customer has
+    paid; each hold then records only what it took back.
+    """
+    with transaction.atomic():
+        reservations = list(
+            order.stock_reservations.select_for_update().exclude(
+                status=StockReservation.Status.CONFIRMED
+            )
+        )
+        if not reservations:
+            return 0
+        lapsed = [
+            reservation for reservation in reservations
+            if reservation.status == StockReservation.Status.RELEASED
+        ]
+        if lapsed:
+            products, variants = _split(lapsed)
+            products = _clamp_to_stock(Product, products, products)
+            variants = _clamp_to_stock(ProductVariant, variants, variants)
+            _take(Product, products)
+            _take(ProductVariant, variants)
+            _stock_changed(products, taken=True)
+            # Each hold records what it took back, which is all a release returns
+            short = []
+            for reservation in lapsed:
+                taken = variants if reservation.variant_id else products
+                pk = reservation.variant_id or reservation.product_id
+                quantity = min(reservation.quantity, taken[pk])
+                taken[pk] -= quantity
+                if quantity != reservation.quantity:
+                    reservation.quantity = quantity
+                    short.append(reservation)
+            StockReservation.objects.bulk_update(short, ['quantity'])
+        _set_status(reservations, StockReservation.Status.CONFIRMED)
+    return len(reservations)
+
+
+def _release(queryset, skip_locked=False):
+    with transaction.atomic():
+        reservations = list(queryset.select_for_update(skip_locked=skip_locked))
+        if not reservations:
+            return 0
+        products, variants = _split(reservations)
+        _give_back(Product, products)
+        _give_back(ProductVariant, variants)
+        _set_status(reservations, StockReservation.Status.RELEASED)
+        _stock_changed(products, taken=False)
+    return len(reservations)
+
+
+def release_reservations(order, include_confirmed=False):
+    """
+    Hand an order's held stock back, e.g. when payment fails. Cancelling a
+    paid order also returns confirmed stock.
+    """
+    return release_order_reservations([order.pk], include_confirmed)
+
+
+def release_order_reservations(order_ids, include_confirmed=False):
+    """
+    ``release_reservations`` for many orders (ids or an id queryset) at
+    once, with one stock UPDATE per model however many orders there are
+    """
+    statuses = [StockReservation.Status.HELD]
+    if include_confirmed:
+        statuses.append(StockReservation.Status.CONFIRMED)
+    return _release(
+        StockReservation.objects.filter(order__in=order_ids, status__in=statuses)
+    )
+
+
+def release_expired_reservations(now=None, products=None, variants=None):
+    """
+    Release holds past their expiry, optionally only for some products or
+    variants. Returns the number released.
+    """
+    queryset = StockReservation.objects.filter(
+        status=StockReservation.Status.HELD,
+        expires_at__lte=now or timezone.now()
+    )
+    if products is not None or variants is not None:
+        queryset = queryset.filter(
+            Q(product__in=products or []) | Q(variant__in=variants or [])
+        )
+    # Holds another transaction is already releasing are left to it
+    return _release(queryset, skip_locked=True)
@@ -1,22 +1,28 @@
 import uuid
-import logging
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.core.validators import MinValueValidator
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.db.models import Sum, F, DecimalField
 from django.utils import timezone
 from django.conf import settings
+from ecommerce.tracking import DirtyFieldsMixin
 from products.models import Product, ProductVariant
+from .numbers import generate_order_number, reset_generator
 from decimal import Decimal
 
 User = settings.AUTH_USER_MODEL
 
+# Inserts tried when a generated order number is already taken
+ORDER_NUMBER_ATTEMPTS = 3
 
-class Order(models.Model):
+
+class Order(DirtyFieldsMixin, models.Model):
     """
     Core order model representing a customer's purchase
     """
+    tracked_fields = ('status', 'payment_status')
+
     class OrderStatus(models.TextChoices):
         DRAFT = 'draft', _('Draft')
         PENDING = 'pending', _('Pending Payment')
@@ -161,28 +167,42 @@ class Order(models.Model):
         return f"Order #{self.number}"
 
     def save(self, *args, **kwargs):
-        if not self.number:
+        generated = not self.number
+        if generated:
             self.number = self.generate_order_number()
         self.calculate_totals()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'payment_status' in update_fields:
+            # Set alongside the payment status by the pre_save signal
+            kwargs['update_fields'] = {*update_fields, 'paid_at'}
+        if not generated:
+            super().save(*args, **kwargs)
+            return
+
+        for attempt in range(ORDER_NUMBER_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # Only a number taken by a process on the same node is retried
+                if (attempt == ORDER_NUMBER_ATTEMPTS - 1
+                        or not Order.objects.filter(number=self.number).exists()):
+                    raise
+                reset_generator()
+                self.number = self.generate_order_number()
 
     def generate_order_number(self):
-        """Generate a unique order number with timestamp and random component"""
-        while True:
-            timestamp = timezone.now().strftime('%Y%m%d%H%M')
-            random_part = uuid.uuid4().hex[:6].upper()
-            order_number = f"ORD-{timestamp}-{random_part}"
-            logging.info(f"Generated order number: {order_number}")
-            if not Order.objects.filter(number=order_number).exists():
-                logging.info(f"Using order number: {order_number}")
-                return order_number
-            logging.warning(f"Duplicate order number detected: {order_number}")
+        """Unique, time-ordered order number; see orders.numbers"""
+        return generate_order_number()
 
     def calculate_totals(self):
         """
         Calculate order totals based on line items
         """
-        if self.pk:
+        # The UUID primary key is assigned on instantiation, so check the
+        # row exists; a new order has no items to aggregate yet
+        if self.pk and not self._state.adding:
             aggregates = self.items.aggregate(
                 subtotal=Sum(
                     F('price') * F('quantity'),
@@ -200,6 +220,8 @@ class Order(models.Model):
     @property
     def item_count(self):
         """Total quantity of items in the order"""
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum(item.quantity for item in self.items.all())
         return self.items.aggregate(total=Sum('quantity'))['total'] or 0
 
     def clean(self):
@@ -227,12 +249,13 @@ class Order(models.Model):
             self.admin_notes = f"Cancellation reason: {reason}\n{self.admin_notes}"
         self.save()
 
-        # Restore inventory
-        for item in self.items.all():
-            if item.variant:
-                item.variant.increase_inventory(item.quantity)
-            elif item.product:
-                item.product.increase_inventory(item.quantity)
+        # Restore inventory taken at checkout
+        from .inventory import release_reservations
+        release_reservations(self, include_confirmed=True)
+
+        # Keep a queued STK push from reaching the customer
+        from payments.outbox import cancel_pending_messages
+        cancel_pending_messages([self.pk])
 
 
 class OrderItem(models.Model):
@@ -563,6 +586,67 @@ class OrderStatusHistory(models.Model):
         return f"Status change for Order #{self.order.number}"
 
 
+class StockReservation(models.Model):
+    """
+    Stock held for an order line between checkout and payment. Stock is
+    taken when the hold is created, kept when confirmed and handed back
+    when released or once ``expires_at`` passes.
+    """
+    class Status(models.TextChoices):
+        HELD = 'held', _('Held')
+        CONFIRMED = 'confirmed', _('Confirmed')
+        RELEASED = 'released', _('Released')
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name=_('order')
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name=_('product'),
+        null=True,
+        blank=True
+    )
+    variant = models.ForeignKey(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name=_('variant'),
+        null=True,
+        blank=True
+    )
+    quantity = models.PositiveIntegerField(_('quantity'))
+    status = models.CharField(
+        _('status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.HELD
+    )
+    expires_at = models.DateTimeField(_('expires at'))
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        _('updated at'),
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = _('stock reservation')
+        verbose_name_plural = _('stock reservations')
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} held for Order #{self.order.number} ({self.status})"
+
+
 
 
 
@@ -602,16 +686,31 @@ class Cart(models.Model):
             return f"Cart for {self.user.email}"
         return f"Anonymous Cart ({self.session_key})"
 
+    def _prefetched_items(self):
+        """The prefetched items, or None if they were not prefetched"""
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            return self.items.all()
+        return None
+
     @property
     def is_empty(self):
-        return self.items.count() == 0
+        items = self._prefetched_items()
+        if items is not None:
+            return not items
+        return not self.items.exists()
 
     @property
     def total_items(self):
+        items = self._prefetched_items()
+        if items is not None:
+            return sum(item.quantity for item in items)
         return self.items.aggregate(total=Sum('quantity'))['total'] or 0
 
     @property
     def subtotal(self):
+        items = self._prefetched_items()
+        if items is not None:
+            return sum((item.total_price for item in items), Decimal('0.00'))
         subtotal = self.items.aggregate(
             total=Sum(F('price') * F('quantity'))
         )['total'] or Decimal('0.00')
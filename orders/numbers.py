@@ -0,0 +1,114 @@
+"""
+Order numbers that need no database round trip.
+
+A number is ``<ORDER_NUMBER_PREFIX>-<YYYYMMDD>-<token>``. The token packs the
+millisecond of the (UTC) day, a node ID and a per-node sequence into 60
+bits, written as 12 Crockford base32 characters, e.g.
+``ORD-20261018-1F3KZ0A7Q2M4``. Numbers from one node are unique and sort
+by creation time. Different processes get different node IDs: set
+``ORDER_NUMBER_NODE_ID`` (0 to 1048575) per process for a hard guarantee,
+otherwise a random one is drawn at start-up and again after a fork. Two
+processes can still draw the same random node; ``Order.save`` then gets a
+unique-constraint error, calls ``reset_generator`` to draw a new node and
+retries.
+"""
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+NODE_BITS = 20
+SEQUENCE_BITS = 13
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+class OrderNumberGenerator:
+    """
+    Thread-safe generator for one node. Up to 8192 numbers per millisecond;
+    beyond that it waits for the next millisecond. A clock stepping back is
+    ignored until it catches up again, so numbers never repeat.
+    """
+
+    def __init__(self, node_id=None):
+        if node_id is None:
+            node_id = random.SystemRandom().randint(0, MAX_NODE)
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f'node_id must be between 0 and {MAX_NODE}')
+        self.node_id = node_id
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def _next_tick(self):
+        with self._lock:
+            now_ms = max(time.time_ns() // 1_000_000, self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond
+                    while now_ms <= self._last_ms:
+                        now_ms = time.time_ns() // 1_000_000
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return now_ms, self._sequence
+
+    def generate(self, prefix=None):
+        if prefix is None:
+            prefix = getattr(settings, 'ORDER_NUMBER_PREFIX', 'ORD')
+        now_ms, sequence = self._next_tick()
+        day = datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc).strftime('%Y%m%d')
+        token = (
+            ((now_ms % DAY_MS) << (NODE_BITS + SEQUENCE_BITS))
+            | (self.node_id << SEQUENCE_BITS)
+            | sequence
+        )
+        return f"{prefix}-{day}-{_encode(token, 12)}"
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def reset_generator():
+    """
+    Start over with a new node ID; called after a fork, since a forked
+    worker must not share its parent's node ID and sequence, and after a
+    number turned out to be taken by another process
+    """
+    global _generator, _generator_lock
+    _generator = None
+    _generator_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_generator)
+
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = OrderNumberGenerator(
+                    getattr(settings, 'ORDER_NUMBER_NODE_ID', None)
+                )
+    return _generator
+
+
+def generate_order_number(prefix=None):
+    return get_generator().generate(prefix)
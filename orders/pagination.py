@@ -1,19 +1,2 @@
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.response import Response
-
-
-class OptimizedPagination(PageNumberPagination):
-    page_size = 24
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-    def get_paginated_response(self, data):
-        return Response({
-            'links': {
-                'next': self.get_next_link(),
-                'previous': self.get_previous_link()
-            },
-            'count': self.page.paginator.count,
-            'page_size': self.get_page_size(self.request),
-            'results': data
-        })
\ No newline at end of file
+# Shared with the catalog so cursor mode behaves the same everywhere
+from products.pagination import OptimizedPagination  # noqa: F401
@@ -8,6 +8,7 @@ from decimal import Decimal
 
 from products.models import Product, ProductVariant
 from products.serializers import ProductSerializer, ProductVariantSerializer
+from products.fieldsets import SparseFieldsetMixin
 from payments.serializers import PaymentSerializer
 from .models import (
     Order, OrderItem, ShippingAddress, BillingAddress,
@@ -75,7 +76,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return data
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, required=False)
     shipping_address = ShippingAddressSerializer(required=False)
     billing_address = BillingAddressSerializer(required=False)
@@ -150,6 +151,56 @@ class OrderSerializer(serializers.ModelSerializer):
             return order
 
 
+class OrderItemListSerializer(serializers.ModelSerializer):
+    """
+    An order line from its name/SKU/price snapshot, linking to the
+    product by ID and slug instead of embedding it. Variant lines link to
+    the variant's product.
+    """
+    product = serializers.ReadOnlyField(source='actual_product.pk')
+    product_slug = serializers.ReadOnlyField(source='actual_product.slug')
+    total_price = serializers.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        read_only=True
+    )
+
+    class Meta:
+        model = OrderItem
+        fields = [
+            'id', 'product', 'product_slug', 'variant', 'sku', 'name',
+            'price', 'discount_amount', 'quantity', 'total_price'
+        ]
+        read_only_fields = fields
+
+
+class OrderListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Order history rows: totals, statuses and the item snapshots
+    """
+    items = OrderItemListSerializer(many=True, read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+    status_display = serializers.CharField(
+        source='get_status_display',
+        read_only=True
+    )
+    payment_status_display = serializers.CharField(
+        source='get_payment_status_display',
+        read_only=True
+    )
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'number', 'user', 'status', 'status_display',
+            'payment_status', 'payment_status_display',
+            'currency', 'subtotal', 'tax', 'shipping_cost', 'discount',
+            'total', 'items', 'item_count', 'created_at', 'updated_at',
+            'paid_at', 'cancelled_at'
+        ]
+        read_only_fields = fields
+
+
 class OrderStatusHistorySerializer(serializers.ModelSerializer):
     old_status_display = serializers.CharField(
         source='get_old_status_display',
@@ -213,8 +264,64 @@ class CartItemSerializer(serializers.ModelSerializer):
         return data
 
 
+class CartLineSerializer(CartItemSerializer):
+    """
+    A compact cart line with just enough of the product to show the cart.
+    Reads its product and primary image from ``cart_line_queryset()``.
+    """
+    product_id = serializers.PrimaryKeyRelatedField(
+        queryset=Product.objects.all(),
+        source='product',
+        required=False,
+        allow_null=True
+    )
+    variant_id = serializers.PrimaryKeyRelatedField(
+        queryset=ProductVariant.objects.all(),
+        source='variant',
+        required=False,
+        allow_null=True
+    )
+    slug = serializers.SerializerMethodField()
+    name = serializers.SerializerMethodField()
+    variant_name = serializers.CharField(
+        source='variant.name',
+        read_only=True,
+        default=None
+    )
+    image_url = serializers.SerializerMethodField()
+    in_stock = serializers.SerializerMethodField()
+
+    class Meta(CartItemSerializer.Meta):
+        fields = [
+            'id', 'product_id', 'variant_id', 'slug', 'name', 'variant_name',
+            'quantity', 'price', 'total_price', 'image_url', 'in_stock',
+            'created_at', 'updated_at'
+        ]
+
+    def _product(self, obj):
+        return obj.variant.product if obj.variant else obj.product
+
+    def get_slug(self, obj):
+        return self._product(obj).slug
+
+    def get_name(self, obj):
+        return self._product(obj).name
+
+    def get_image_url(self, obj):
+        if getattr(obj, 'images_joined', False):
+            image = getattr(obj, 'variant_image' if obj.variant else 'product_image', None)
+        else:
+            image = self._product(obj).primary_image
+        if image and image.image:
+            return image.image.url
+        return None
+
+    def get_in_stock(self, obj):
+        return (obj.variant or obj.product).is_in_stock
+
+
 class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(many=True, read_only=True)
+    items = CartLineSerializer(many=True, read_only=True)
     subtotal = serializers.DecimalField(
         max_digits=12,
         decimal_places=2,
@@ -234,6 +341,40 @@ class CartSerializer(serializers.ModelSerializer):
         ]
 
 
+class ExpandedCartSerializer(CartSerializer):
+    """
+    A cart whose lines embed the full product and variant (``?expand=product``)
+    """
+    items = CartItemSerializer(many=True, read_only=True)
+
+
+class SessionCartItemSerializer(CartLineSerializer):
+    """
+    A line of an anonymous cart; its ID is the line key
+    """
+    id = serializers.CharField(source='line_id', read_only=True)
+
+    class Meta(CartLineSerializer.Meta):
+        fields = [
+            'id', 'product_id', 'variant_id', 'slug', 'name', 'variant_name',
+            'quantity', 'price', 'total_price', 'image_url', 'in_stock'
+        ]
+
+
+class SessionCartSerializer(serializers.Serializer):
+    """
+    An anonymous cart, rendered from ``SessionCart.get_summary()``
+    """
+    cart_token = serializers.CharField(read_only=True)
+    items = SessionCartItemSerializer(many=True, read_only=True)
+    subtotal = serializers.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        read_only=True
+    )
+    total_items = serializers.IntegerField(read_only=True)
+
+
 class CheckoutSerializer(serializers.Serializer):
     shipping_address = ShippingAddressSerializer(required=True)
     billing_address = BillingAddressSerializer(required=False)
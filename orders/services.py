@@ -0,0 +1,223 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, FilteredRelation, Prefetch, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+
+from payments.models import Payment
+from payments.outbox import cancel_pending_messages, enqueue_stk_push
+from products.models import ProductReview
+from .emails import queue_order_confirmation
+from .inventory import release_order_reservations, reserve_stock
+from .models import (
+    Order, OrderItem, OrderStatusHistory, ShippingAddress, BillingAddress, CartItem
+)
+
+NON_CANCELLABLE_STATUSES = (
+    Order.OrderStatus.CANCELLED,
+    Order.OrderStatus.REFUNDED,
+    Order.OrderStatus.DELIVERED,
+)
+
+
+def order_items_prefetch(lookup='items'):
+    """
+    Order items with everything the nested product and variant
+    serializers render, so serializing an order does not query per item
+    """
+    variant_attributes = ('attributes__attribute', 'attributes__value')
+    return Prefetch(lookup, queryset=OrderItem.objects.select_related(
+        'product__category', 'product__brand', 'variant__product'
+    ).prefetch_related(
+        'product__images',
+        'product__specifications',
+        Prefetch('product__reviews', queryset=ProductReview.objects.select_related('user')),
+        *[f'product__variants__{lookup}' for lookup in variant_attributes],
+        *[f'variant__{lookup}' for lookup in variant_attributes],
+    ))
+
+
+def order_list_items_prefetch(lookup='items'):
+    """
+    Order items for ``OrderItemListSerializer``: the snapshot columns and
+    the slug of the product, or of the variant's product, in one query for
+    the whole page
+    """
+    return Prefetch(lookup, queryset=OrderItem.objects.select_related(
+        'product', 'variant__product'
+    ).only(
+        'order_id', 'product_id', 'variant_id', 'sku', 'name', 'price',
+        'discount_amount', 'quantity', 'product__slug',
+        'variant__product_id', 'variant__product__slug'
+    ))
+
+
+def cart_line_queryset(queryset=None):
+    """
+    Cart items with everything ``CartLineSerializer`` renders, including
+    the primary image, joined into one query
+    """
+    if queryset is None:
+        queryset = CartItem.objects.all()
+    return queryset.annotate(
+        product_image=FilteredRelation(
+            'product__images', condition=Q(product__images__is_primary=True)
+        ),
+        variant_image=FilteredRelation(
+            'variant__product__images',
+            condition=Q(variant__product__images__is_primary=True)
+        ),
+        # A FilteredRelation that matched nothing leaves its attribute
+        # unset; this tells the serializer the join did run
+        images_joined=Value(True)
+    ).select_related(
+        'product', 'variant__product', 'product_image', 'variant_image'
+    ).defer(
+        'product__description', 'product__search_vector',
+        'variant__product__description', 'variant__product__search_vector'
+    ).order_by('created_at', 'pk')
+
+
+def load_cart_items(cart):
+    """
+    The cart's lines with their products and variants in one query
+    """
+    return list(
+        CartItem.objects.filter(cart=cart).select_related(
+            'product', 'variant', 'variant__product'
+        ).order_by('created_at', 'pk')
+    )
+
+
+def build_order_items(order, cart_items):
+    """
+    Unsaved order lines snapshotting name, SKU and price from the
+    already loaded products and variants
+    """
+    items = []
+    for cart_item in cart_items:
+        item = OrderItem(
+            order=order,
+            product=cart_item.product,
+            variant=cart_item.variant,
+            quantity=cart_item.quantity,
+            price=cart_item.price
+        )
+        # clean() fills the name/SKU snapshot from the loaded relations
+        item.clean()
+        items.append(item)
+    return items
+
+
+def checkout_cart(cart, user, data, ip_address=None, cart_items=None):
+    """
+    Turn a cart into a pending order with a fixed number of queries
+    regardless of cart size: the order is inserted once with its totals,
+    the lines are bulk inserted, stock is held with one conditional UPDATE
+    per product or variant and the cart is emptied with one DELETE. Gateway
+    calls and the confirmation email are queued in outboxes rather than
+    made here.
+    Returns ``(order, payment)``.
+    """
+    if cart_items is None:
+        cart_items = load_cart_items(cart)
+    if not cart_items:
+        raise ValidationError(_('Cannot checkout with an empty cart'))
+
+    with transaction.atomic():
+        order = Order(
+            user=user,
+            status=Order.OrderStatus.PENDING,
+            payment_status=Order.PaymentStatus.PENDING,
+            customer_notes=data.get('customer_notes', ''),
+            ip_address=ip_address
+        )
+        items = build_order_items(order, cart_items)
+        order.subtotal = sum(
+            (item.price * item.quantity for item in items), Decimal('0.00')
+        )
+        order.discount = sum(
+            (item.discount_amount * item.quantity for item in items), Decimal('0.00')
+        )
+        order.total = order.subtotal + order.tax + order.shipping_cost - order.discount
+        order.save()
+        OrderItem.objects.bulk_create(items)
+        # All or nothing: a short line rolls the whole checkout back
+        reserve_stock(order, items)
+
+        shipping_address_data = data['shipping_address']
+        ShippingAddress.objects.create(order=order, **shipping_address_data)
+        if data.get('use_shipping_as_billing'):
+            BillingAddress.objects.create(order=order, **shipping_address_data)
+        elif 'billing_address' in data:
+            BillingAddress.objects.create(order=order, **data['billing_address'])
+
+        CartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+
+        payment = Payment.objects.create(
+            order=order,
+            amount=order.total,
+            currency=order.currency,
+            method=data['payment_method'],
+            phone_number=data.get('mpesa_phone_number'),
+            status=Payment.PaymentStatus.PENDING,
+        )
+        if payment.method == Payment.PaymentMethod.MPESA:
+            # Sent by the outbox worker after commit, never inside this transaction
+            enqueue_stk_push(payment)
+        queue_order_confirmation(order, items)
+    return order, payment
+
+
+def cancel_orders(queryset, reason=None, user=None):
+    """
+    Cancel every order in ``queryset`` that can still be cancelled, with a
+    fixed number of queries however many there are: the orders are
+    updated in one UPDATE, their stock is returned with one UPDATE per
+    model and the history rows are bulk inserted. Orders that cannot be
+    cancelled (see ``Order.can_cancel``) are skipped. Returns the number
+    cancelled.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # can_cancel() in SQL; the lock keeps a concurrent cancel or
+        # delivery from slipping in between the read and the update
+        orders = dict(
+            Order.objects.select_for_update().filter(
+                pk__in=queryset.values('pk')
+            ).exclude(
+                status__in=NON_CANCELLABLE_STATUSES
+            ).values_list('pk', 'status')
+        )
+        if not orders:
+            return 0
+
+        changes = {
+            'status': Order.OrderStatus.CANCELLED,
+            'cancelled_at': now,
+            'updated_at': now,
+        }
+        if reason:
+            changes['admin_notes'] = Concat(
+                Value(f"Cancellation reason: {reason}\n"), F('admin_notes')
+            )
+        Order.objects.filter(pk__in=list(orders)).update(**changes)
+
+        release_order_reservations(list(orders), include_confirmed=True)
+        cancel_pending_messages(list(orders))
+
+        # The UPDATE bypasses the pre_save signal, so history is written here
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(
+                order_id=pk,
+                old_status=old_status,
+                new_status=Order.OrderStatus.CANCELLED,
+                note=reason or '',
+                created_by=user
+            )
+            for pk, old_status in orders.items()
+        ])
+    return len(orders)
@@ -0,0 +1,186 @@
+"""
+Anonymous carts kept in the cache.
+
+A visitor who is not logged in gets a cart token, sent back in the
+``X-Cart-Token`` response header. Their lines are stored under that token
+in the default cache, so browsing and abandoned carts never write to the
+database. On login or checkout the lines are merged into the user's
+``Cart`` and the cache entry is dropped.
+
+Lines are keyed ``p<product id>`` or ``v<variant id>`` and hold only a
+quantity; prices are read from the catalog when the cart is shown or
+merged. Two concurrent writes to the same cart keep the last one.
+"""
+import re
+import secrets
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import Product, ProductVariant, primary_image_prefetch
+from .models import Cart, CartItem
+
+CART_TOKEN_HEADER = 'X-Cart-Token'
+CART_KEY = 'cart:anonymous:{}'
+TOKEN_PATTERN = re.compile(r'[A-Za-z0-9_-]{16,64}')
+
+
+def get_cart_token(request):
+    """
+    The well-formed cart token sent with the request, if any
+    """
+    token = request.headers.get(CART_TOKEN_HEADER, '')
+    return token if TOKEN_PATTERN.fullmatch(token) else None
+
+
+def line_id_for(product=None, variant=None):
+    return f'v{variant.pk}' if variant else f'p{product.pk}'
+
+
+def is_available(item):
+    """
+    Whether the product behind a cart line is on sale
+    """
+    product = item.variant.product if item.variant else item.product
+    return product.status == Product.ProductStatus.ACTIVE
+
+
+def stock_limit(item):
+    """
+    The most of a cart line that can be ordered, or None if its stock is
+    not tracked
+    """
+    stocked = item.variant or item.product
+    return stocked.quantity if stocked.track_quantity else None
+
+
+class SessionCart:
+    """
+    An anonymous cart. ``load`` never touches the database; ``get_items``
+    loads the products and variants and their primary images.
+    """
+
+    def __init__(self, token=None, lines=None):
+        self.token = token or secrets.token_urlsafe(24)
+        self.lines = lines or {}
+
+    @classmethod
+    def load(cls, token):
+        if not token:
+            return cls()
+        return cls(token, cache.get(CART_KEY.format(token)))
+
+    def save(self):
+        key = CART_KEY.format(self.token)
+        if self.lines:
+            cache.set(key, self.lines, getattr(settings, 'ANONYMOUS_CART_TIMEOUT', None))
+        else:
+            cache.delete(key)
+
+    def clear(self):
+        self.lines = {}
+        self.save()
+
+    def add(self, product=None, variant=None, quantity=1):
+        line_id = line_id_for(product, variant)
+        self.lines[line_id] = self.lines.get(line_id, 0) + quantity
+        return line_id
+
+    def set_quantity(self, line_id, quantity):
+        if line_id not in self.lines:
+            raise KeyError(line_id)
+        self.lines[line_id] = quantity
+
+    def remove(self, line_id):
+        if self.lines.pop(line_id, None) is None:
+            raise KeyError(line_id)
+
+    def get_items(self, line_ids=None):
+        """
+        Unsaved ``CartItem`` objects for the lines, priced from the catalog.
+        Lines whose product or variant no longer exists are left out.
+        """
+        line_ids = [
+            line_id for line_id in (line_ids or self.lines) if line_id in self.lines
+        ]
+        product_ids = [int(line_id[1:]) for line_id in line_ids if line_id[0] == 'p']
+        variant_ids = [int(line_id[1:]) for line_id in line_ids if line_id[0] == 'v']
+        products = Product.objects.prefetch_related(
+            primary_image_prefetch()
+        ).in_bulk(product_ids) if product_ids else {}
+        variants = ProductVariant.objects.select_related('product').prefetch_related(
+            primary_image_prefetch('product__images')
+        ).in_bulk(variant_ids) if variant_ids else {}
+
+        items = []
+        for line_id in line_ids:
+            pk = int(line_id[1:])
+            if line_id[0] == 'p' and pk in products:
+                item = CartItem(product=products[pk], price=products[pk].price)
+            elif line_id[0] == 'v' and pk in variants:
+                item = CartItem(variant=variants[pk], price=variants[pk].price)
+            else:
+                continue
+            item.quantity = self.lines[line_id]
+            item.line_id = line_id
+            items.append(item)
+        return items
+
+    def get_summary(self):
+        items = self.get_items()
+        return {
+            'cart_token': self.token,
+            'items': items,
+            'subtotal': sum((item.total_price for item in items), Decimal('0.00')),
+            'total_items': sum(item.quantity for item in items),
+        }
+
+
+def merge_session_cart(token, user):
+    """
+    Move an anonymous cart's lines into ``user``'s cart. Quantities of
+    lines already in the cart are added together. Lines no longer on sale
+    are dropped and merged quantities are capped at the stock, as adding
+    them to the cart directly would not have been allowed. Returns the
+    cart, or None if there was nothing to merge.
+    """
+    session_cart = SessionCart.load(token)
+    items = session_cart.get_items() if session_cart.lines else []
+    items = [item for item in items if is_available(item)]
+    if not items:
+        session_cart.clear()
+        return None
+
+    now = timezone.now()
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        existing = {
+            (item.product_id, item.variant_id): item
+            for item in cart.items.select_for_update()
+        }
+        new_items, changed = [], []
+        for item in items:
+            current = existing.get((item.product_id, item.variant_id))
+            quantity = item.quantity + (current.quantity if current else 0)
+            limit = stock_limit(item)
+            if limit is not None:
+                # Never lower a line the user already has
+                quantity = min(quantity, max(limit, current.quantity if current else 0))
+            if current is None:
+                if quantity < 1:
+                    continue
+                item.cart = cart
+                item.quantity = quantity
+                new_items.append(item)
+            elif quantity != current.quantity:
+                current.quantity = quantity
+                current.updated_at = now
+                changed.append(current)
+        CartItem.objects.bulk_create(new_items)
+        if changed:
+            CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+    session_cart.clear()
+    return cart
@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
+from .emails import queue_order_shipped
 from .models import Order, OrderStatusHistory
 
 @receiver(pre_save, sender=Order)
@@ -8,19 +9,33 @@ def order_pre_save(sender, instance, **kwargs):
     """
     Track order status changes and update timestamps
     """
-    if instance.pk:
-        original = Order.objects.get(pk=instance.pk)
-        
-        # Check if status changed
-        if original.status != instance.status:
-            OrderStatusHistory.objects.create(
-                order=instance,
-                old_status=original.status,
-                new_status=instance.status,
-                created_by=getattr(instance, '_updated_by', None)
-            )
-        
-        # Check if payment status changed to paid
-        if (original.payment_status != instance.payment_status and 
-            instance.payment_status == Order.PaymentStatus.PAID):
-            instance.paid_at = timezone.now()
\ No newline at end of file
+    # Compared with the values loaded from the database, so no extra query
+    if instance._state.adding:
+        return
+
+    # Check if status changed
+    if instance.has_changed('status'):
+        OrderStatusHistory.objects.create(
+            order=instance,
+            old_status=instance.get_original('status'),
+            new_status=instance.status,
+            note=getattr(instance, '_status_note', ''),
+            created_by=getattr(instance, '_updated_by', None)
+        )
+
+    # Check if payment status changed to paid
+    if (instance.has_changed('payment_status') and
+        instance.payment_status == Order.PaymentStatus.PAID and
+        not instance.paid_at):
+        instance.paid_at = timezone.now()
+
+
+@receiver(post_save, sender=Order)
+def order_post_save(sender, instance, created, **kwargs):
+    """
+    Queue the shipping notice when an order moves to shipped
+    """
+    # Originals are recaptured only after post_save, so has_changed still works
+    if (not created and instance.has_changed('status') and
+            instance.status == Order.OrderStatus.SHIPPED):
+        queue_order_shipped(instance)
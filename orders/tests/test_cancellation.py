@@ -0,0 +1,133 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.inventory import reserve_stock
+from orders.models import Order, OrderItem, OrderStatusHistory, StockReservation
+from orders.services import cancel_orders
+from products.models import Category, Product
+from users.models import User
+
+
+class BulkCancellationTests(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            first_name='Ad',
+            last_name='Min',
+            phone='+254712345670'
+        )
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Phone', description='Description', category=category,
+            sku='PHONE', price=Decimal('10.00'), quantity=100, status='active'
+        )
+
+    def create_orders(self, count, quantity=2):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, status=Order.OrderStatus.PENDING)
+            item = OrderItem(order=order, product=self.product, quantity=quantity,
+                             price=self.product.price)
+            item.clean()
+            reserve_stock(order, [item])
+            orders.append(order)
+        return orders
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.quantity
+
+    def test_cancel_restores_stock_and_records_history(self):
+        """Test cancelling returns held stock and writes one history row per order"""
+        orders = self.create_orders(3)
+        delivered = orders[2]
+        Order.objects.filter(pk=delivered.pk).update(status=Order.OrderStatus.DELIVERED)
+        self.assertEqual(self.stock(), 94)
+
+        cancelled = cancel_orders(Order.objects.all(), reason='Stale', user=self.admin)
+        self.assertEqual(cancelled, 2)
+        self.assertEqual(self.stock(), 98)
+
+        self.assertEqual(
+            Order.objects.filter(status=Order.OrderStatus.CANCELLED).count(), 2
+        )
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.status, Order.OrderStatus.DELIVERED)
+        history = OrderStatusHistory.objects.filter(created_by=self.admin)
+        self.assertEqual(history.count(), 2)
+        self.assertEqual(set(history.values_list('old_status', flat=True)), {'pending'})
+        order = Order.objects.get(pk=orders[0].pk)
+        self.assertTrue(order.admin_notes.startswith('Cancellation reason: Stale'))
+        self.assertIsNotNone(order.cancelled_at)
+        self.assertFalse(
+            StockReservation.objects.filter(order=order).exclude(status='released').exists()
+        )
+
+    def test_query_count_is_flat(self):
+        """Benchmark: cancelling 20 orders costs the same queries as cancelling 2"""
+        self.create_orders(2)
+        with CaptureQueriesContext(connection) as small:
+            cancel_orders(Order.objects.all())
+
+        self.create_orders(20)
+        with CaptureQueriesContext(connection) as large:
+            cancel_orders(Order.objects.exclude(status=Order.OrderStatus.CANCELLED))
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(self.stock(), 100)
+
+    def test_bulk_cancel_endpoint(self):
+        """Test the bulk cancel endpoint is admin only and reports skipped orders"""
+        orders = self.create_orders(2)
+        numbers = [order.number for order in orders] + ['ORD-UNKNOWN']
+        url = reverse('order-bulk-cancel')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(url, {'numbers': numbers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(url, {'numbers': numbers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'cancelled': 2, 'skipped': 1})
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 400)
+
+    def test_admin_action(self):
+        """Test the admin cancel action goes through the bulk service"""
+        orders = self.create_orders(2)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'mark_as_cancelled',
+            '_selected_action': [order.pk for order in orders],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Order.objects.filter(status=Order.OrderStatus.CANCELLED).count(), 2
+        )
+        self.assertEqual(self.stock(), 100)
+
+    def test_admin_action_on_filtered_changelist(self):
+        """Test cancelling from a status-filtered changelist reports no skipped orders"""
+        orders = self.create_orders(2)
+        self.client.force_login(self.admin)
+        url = reverse('admin:orders_order_changelist') + '?status=pending'
+        response = self.client.post(url, {
+            'action': 'mark_as_cancelled',
+            '_selected_action': [order.pk for order in orders],
+        }, follow=True)
+        messages = [str(message) for message in response.context['messages']]
+        self.assertIn('Successfully cancelled 2 orders.', messages)
+        self.assertFalse([message for message in messages if 'could not' in message])
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Cart, CartItem
+from products.models import Category, Product, ProductImage, ProductReview, ProductVariant
+from users.models import User
+
+
+class CartLineTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def create_product(self, index, quantity=100):
+        product = Product.objects.create(
+            name=f'Product {index}', description='Description',
+            category=self.category, sku=f'SKU-{index}',
+            price=Decimal('10.00'), quantity=quantity, status='active'
+        )
+        ProductImage.objects.create(
+            product=product, image=f'products/images/{index}.jpg', is_primary=True
+        )
+        ProductImage.objects.create(product=product, image=f'products/images/{index}-2.jpg')
+        ProductReview.objects.create(
+            product=product, user=self.user, rating=5,
+            title='Great', comment='Great product', is_approved=True
+        )
+        return product
+
+    def add_items(self, count, start=0):
+        for index in range(start, start + count):
+            CartItem.objects.create(
+                cart=self.cart, product=self.create_product(index), quantity=1
+            )
+
+    def test_compact_lines(self):
+        """Test cart lines carry the product link, image and stock flag only"""
+        product = self.create_product('p', quantity=0)
+        variant = ProductVariant.objects.create(
+            product=product, name='Blue', sku='SKU-BLUE',
+            price=Decimal('12.00'), quantity=5
+        )
+        CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+        CartItem.objects.create(cart=self.cart, variant=variant, quantity=2)
+
+        response = self.client.get(reverse('cart-detail', args=[self.cart.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = {line['variant_name']: line for line in response.data['items']}
+        self.assertNotIn('product', lines[None])
+        self.assertEqual(lines[None]['product_id'], product.pk)
+        self.assertEqual(lines[None]['slug'], product.slug)
+        self.assertEqual(lines[None]['image_url'], '/media/products/images/p.jpg')
+        self.assertFalse(lines[None]['in_stock'])
+        self.assertEqual(lines['Blue']['variant_id'], variant.pk)
+        self.assertEqual(lines['Blue']['name'], product.name)
+        self.assertEqual(lines['Blue']['image_url'], '/media/products/images/p.jpg')
+        self.assertTrue(lines['Blue']['in_stock'])
+        self.assertEqual(response.data['subtotal'], '34.00')
+
+    def test_cart_get_query_count_is_flat(self):
+        """Benchmark: a cart GET costs the cart and items queries at any size"""
+        url = reverse('cart-detail', args=[self.cart.pk])
+        self.add_items(1)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        self.add_items(14, start=1)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['items']), 15)
+
+    def test_expand_product(self):
+        """Test ?expand=product returns the full nested product"""
+        self.add_items(1)
+        response = self.client.get(
+            reverse('cart-detail', args=[self.cart.pk]), {'expand': 'product'}
+        )
+        self.assertEqual(response.data['items'][0]['product']['sku'], 'SKU-0')
+        response = self.client.get(reverse('cart-item-list'), {'expand': 'product'})
+        self.assertIn('reviews', response.data['results'][0]['product'])
+
+    def test_add_line_returns_compact_line(self):
+        """Test adding a line answers with the compact representation"""
+        product = self.create_product('new')
+        response = self.client.post(
+            reverse('cart-item-list'), {'product_id': product.pk, 'quantity': 2},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['product_id'], product.pk)
+        self.assertEqual(response.data['total_price'], '20.00')
+        self.assertTrue(response.data['in_stock'])
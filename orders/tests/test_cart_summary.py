@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.db.models import Prefetch
+from django.test import TestCase
+
+from orders.models import Cart, CartItem
+from products.models import Category, Product
+from users.models import User
+
+
+class CartSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add_items(self, count):
+        for index in range(count):
+            product = Product.objects.create(
+                name=f'Product {index}', description='Description',
+                category=self.category, sku=f'SKU-{index}',
+                price=Decimal('10.50'), quantity=100, status='active'
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def load_cart(self):
+        return Cart.objects.prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('product'))
+        ).get(pk=self.cart.pk)
+
+    def test_summary_matches_aggregates(self):
+        """Test prefetched totals agree with the database aggregates"""
+        self.add_items(3)
+        cart = self.load_cart()
+        self.assertEqual(cart.total_items, self.cart.total_items)
+        self.assertEqual(cart.subtotal, self.cart.subtotal)
+        self.assertEqual(cart.subtotal, Decimal('63.00'))
+        self.assertFalse(cart.is_empty)
+
+    def test_empty_cart(self):
+        """Test an empty cart reports zero totals"""
+        cart = self.load_cart()
+        self.assertTrue(cart.is_empty)
+        self.assertEqual(cart.total_items, 0)
+        self.assertEqual(cart.subtotal, Decimal('0.00'))
+        self.assertTrue(self.cart.is_empty)
+
+    def test_summary_costs_no_extra_queries(self):
+        """Benchmark: the summary of a 20-item cart costs the cart and items queries"""
+        self.add_items(20)
+        with self.assertNumQueries(2):
+            cart = self.load_cart()
+            self.assertEqual(cart.total_items, 40)
+            self.assertEqual(cart.subtotal, Decimal('420.00'))
+            self.assertFalse(cart.is_empty)
@@ -0,0 +1,132 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from decimal import Decimal
+
+from orders.models import Cart, CartItem, Order
+from products.models import Category, Product, ProductImage, ProductVariant
+from users.models import EmailOutbox, User
+
+CHECKOUT_DATA = {
+    'payment_method': 'credit_card',
+    'shipping_address': {
+        'first_name': 'Test',
+        'last_name': 'User',
+        'address_line_1': '123 Main St',
+        'city': 'Nairobi',
+        'state': 'Nairobi',
+        'postal_code': '00100',
+        'country': 'KE',
+        'phone': '+254712345678',
+        'email': 'test@example.com'
+    },
+    'use_shipping_as_billing': True
+}
+
+
+class CheckoutTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+
+    def fill_cart(self, lines, start=0):
+        for index in range(start, start + lines):
+            product = Product.objects.create(
+                name=f'Product {index}',
+                description='Description',
+                category=self.category,
+                sku=f'SKU-{index}',
+                price=Decimal('10.00'),
+                quantity=100,
+                status='active'
+            )
+            ProductImage.objects.create(
+                product=product, image=f'products/images/{index}.jpg', is_primary=True
+            )
+            if index % 2:
+                variant = ProductVariant.objects.create(
+                    product=product, name='Large', sku=f'SKU-{index}-L', price=Decimal('12.50'),
+                    quantity=100
+                )
+                CartItem.objects.create(cart=self.cart, variant=variant, quantity=2)
+            else:
+                CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+
+    def checkout(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('cart-checkout'), CHECKOUT_DATA, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response, len(context.captured_queries)
+
+    def test_checkout_snapshots_lines_and_totals(self):
+        """Test checkout copies names, SKUs and prices and totals the order once"""
+        self.fill_cart(2)
+        response, _ = self.checkout()
+
+        order = Order.objects.get(number=response.data['number'])
+        items = {item.sku: item for item in order.items.all()}
+        self.assertEqual(items['SKU-0'].name, 'Product 0')
+        self.assertEqual(items['SKU-1-L'].name, 'Product 1 - Large')
+        self.assertEqual(order.subtotal, Decimal('35.00'))
+        self.assertEqual(order.total, Decimal('35.00'))
+        self.assertEqual(response.data['total'], '35.00')
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        self.assertEqual(order.payments.get().amount, Decimal('35.00'))
+
+    def test_empty_cart(self):
+        """Test checking out an empty cart is rejected"""
+        response = self.client.post(reverse('cart-checkout'), CHECKOUT_DATA, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_reserves_stock(self):
+        """Test checkout takes stock and records a hold per product and variant"""
+        self.fill_cart(2)
+        response, _ = self.checkout()
+
+        order = Order.objects.get(number=response.data['number'])
+        self.assertEqual(Product.objects.get(sku='SKU-0').quantity, 99)
+        self.assertEqual(ProductVariant.objects.get(sku='SKU-1-L').quantity, 98)
+        self.assertEqual(order.stock_reservations.filter(status='held').count(), 2)
+
+    def test_checkout_out_of_stock(self):
+        """Test a short line rejects checkout without creating the order"""
+        self.fill_cart(2)
+        ProductVariant.objects.filter(sku='SKU-1-L').update(quantity=1)
+
+        response = self.client.post(reverse('cart-checkout'), CHECKOUT_DATA, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(sku='SKU-0').quantity, 100)
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+
+    def test_checkout_query_count_is_flat(self):
+        """Benchmark: checkout queries do not grow with cart size"""
+        self.fill_cart(2)
+        _, small = self.checkout()
+
+        self.fill_cart(10, start=2)
+        _, large = self.checkout()
+        self.assertEqual(small, large)
+
+    def test_checkout_queues_confirmation(self):
+        """Test checkout queues the confirmation email instead of sending it"""
+        self.fill_cart(2)
+        response, _ = self.checkout()
+
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.to, ['shopper@example.com'])
+        self.assertIn(response.data['number'], email.subject)
+        self.assertIn('SKU-1-L', email.html_body)
+        self.assertIn('123 Main St', email.html_body)
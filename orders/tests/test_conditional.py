@@ -0,0 +1,35 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from orders.models import Order
+from users.models import User
+
+
+class OrderConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.order = Order.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_order_not_modified(self):
+        """Test order retrieve and list answer 304 until the order changes"""
+        for url in (
+            reverse('order-detail', kwargs={'number': self.order.number}),
+            reverse('order-list')
+        ):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+        url = reverse('order-detail', kwargs={'number': self.order.number})
+        etag = self.client.get(url)['ETag']
+        self.order.customer_notes = 'Leave at the door'
+        self.order.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
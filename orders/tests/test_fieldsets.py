@@ -0,0 +1,29 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from orders.models import Order
+from users.models import User
+
+
+class OrderSparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.order = Order.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_order_fields(self):
+        """Test orders honour ?fields= and ?omit="""
+        url = reverse('order-detail', kwargs={'number': self.order.number})
+        response = self.client.get(url, {'fields': 'number,total,status'})
+        self.assertEqual(set(response.data), {'number', 'total', 'status'})
+
+        response = self.client.get(url, {'omit': 'items,payments'})
+        self.assertNotIn('items', response.data)
+        self.assertIn('shipping_address', response.data)
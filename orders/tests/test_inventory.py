@@ -0,0 +1,138 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.inventory import (
+    InsufficientStock, confirm_reservations, release_expired_reservations,
+    release_reservations, reserve_stock
+)
+from orders.models import Order, OrderItem, StockReservation
+from products.models import Category, Product, ProductVariant
+from users.models import User
+
+
+class StockReservationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.order = Order.objects.create(user=self.user)
+        category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Phone', description='Description', category=category,
+            sku='PHONE', price=Decimal('10.00'), quantity=5, status='active'
+        )
+        self.variant = ProductVariant.objects.create(
+            product=self.product, name='Large', sku='PHONE-L',
+            price=Decimal('12.50'), quantity=3
+        )
+
+    def lines(self, order, product_quantity, variant_quantity):
+        items = [
+            OrderItem(order=order, product=self.product, quantity=product_quantity,
+                      price=self.product.price),
+            OrderItem(order=order, variant=self.variant, quantity=variant_quantity,
+                      price=self.variant.price),
+        ]
+        for item in items:
+            item.clean()
+        return items
+
+    def assertStock(self, product, variant):
+        self.product.refresh_from_db()
+        self.variant.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.variant.quantity), (product, variant))
+
+    def test_reserve_takes_stock(self):
+        """Test reserving takes stock and records one hold per product or variant"""
+        with self.assertNumQueries(8):
+            reserve_stock(self.order, self.lines(self.order, 5, 2))
+        self.assertStock(0, 1)
+        self.assertEqual(self.order.stock_reservations.count(), 2)
+        self.assertEqual(self.product.status, Product.ProductStatus.OUT_OF_STOCK)
+
+    def test_shortage_takes_nothing(self):
+        """Test a short variant leaves the product's stock untouched too"""
+        with self.assertRaises(InsufficientStock) as context:
+            reserve_stock(self.order, self.lines(self.order, 1, 4))
+        self.assertIn('Phone - Large', str(context.exception.detail))
+        self.assertStock(5, 3)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_release_returns_stock(self):
+        """Test releasing an order's holds hands the stock back"""
+        reserve_stock(self.order, self.lines(self.order, 5, 3))
+        self.assertEqual(release_reservations(self.order), 2)
+        self.assertStock(5, 3)
+        self.assertEqual(self.product.status, Product.ProductStatus.ACTIVE)
+        self.assertEqual(release_reservations(self.order), 0)
+
+    def test_expired_holds_are_reclaimed(self):
+        """Test a checkout can take stock still held by a lapsed order"""
+        reserve_stock(self.order, self.lines(self.order, 5, 3))
+        later = timezone.now() + timedelta(hours=1)
+        other = Order.objects.create(user=self.user)
+
+        reserve_stock(other, self.lines(other, 4, 3), now=later)
+        self.assertStock(1, 0)
+        self.assertFalse(self.order.stock_reservations.filter(status='held').exists())
+
+    def test_release_expired_command(self):
+        """Test the command releases only expired holds"""
+        reserve_stock(self.order, self.lines(self.order, 2, 1))
+        self.assertEqual(release_expired_reservations(), 0)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command('release_expired_reservations', stdout=out)
+        self.assertIn('Released 2', out.getvalue())
+        self.assertStock(5, 3)
+
+    def test_confirm_keeps_stock(self):
+        """Test confirmed stock survives expiry and returns on cancellation"""
+        reserve_stock(self.order, self.lines(self.order, 2, 1))
+        confirm_reservations(self.order)
+        release_expired_reservations(now=timezone.now() + timedelta(hours=1))
+        self.assertStock(3, 2)
+
+        self.order.cancel()
+        self.assertStock(5, 3)
+
+    def test_backorder_returns_only_what_it_took(self):
+        """Test releasing a backordered line hands back only the stock it took"""
+        Product.objects.filter(pk=self.product.pk).update(
+            quantity=1, continue_selling_when_out_of_stock=True
+        )
+        self.product.refresh_from_db()
+        reserve_stock(self.order, self.lines(self.order, 5, 1)[:1])
+        self.assertStock(0, 3)
+        self.assertEqual(self.order.stock_reservations.get().quantity, 1)
+
+        release_reservations(self.order)
+        self.assertStock(1, 3)
+
+    def test_confirm_lapsed_hold_takes_what_is_left(self):
+        """Test paying after a lapsed hold was reclaimed takes only the stock left"""
+        reserve_stock(self.order, self.lines(self.order, 5, 3))
+        later = timezone.now() + timedelta(hours=1)
+        other = Order.objects.create(user=self.user)
+        reserve_stock(other, self.lines(other, 4, 3), now=later)
+        self.assertStock(1, 0)
+
+        confirm_reservations(self.order)
+        self.assertStock(0, 0)
+        self.assertEqual(
+            sorted(self.order.stock_reservations.values_list('quantity', flat=True)), [0, 1]
+        )
+
+        self.order.cancel()
+        self.assertStock(1, 0)
@@ -0,0 +1,122 @@
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order
+from orders.numbers import OrderNumberGenerator, generate_order_number, get_generator
+from users.models import User
+
+NUMBER_PATTERN = re.compile(r'^ORD-\d{8}-[0-9A-HJKMNP-TV-Z]{12}$')
+
+
+def generate_batch(count):
+    return [generate_order_number() for _ in range(count)]
+
+
+class OrderNumberTests(TestCase):
+
+    def test_format_and_ordering(self):
+        """Test numbers keep the ORD- prefix and sort in creation order"""
+        generator = OrderNumberGenerator(node_id=7)
+        numbers = [generator.generate() for _ in range(1000)]
+        self.assertTrue(all(NUMBER_PATTERN.match(number) for number in numbers))
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(len(set(numbers)), 1000)
+
+    @override_settings(ORDER_NUMBER_PREFIX='SHOP')
+    def test_prefix_setting(self):
+        """Test the prefix comes from ORDER_NUMBER_PREFIX"""
+        self.assertTrue(generate_order_number().startswith('SHOP-'))
+
+    def test_invalid_node_id(self):
+        """Test node IDs outside 20 bits are rejected"""
+        with self.assertRaises(ValueError):
+            OrderNumberGenerator(node_id=1 << 20)
+
+    def test_generated_without_queries(self):
+        """Test saving an order does not query for a free number"""
+        user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            order = Order.objects.create(user=user)
+        statements = [
+            query['sql'].split()[0].upper() for query in queries.captured_queries
+        ]
+        # One INSERT, inside a savepoint so a taken number can be retried
+        self.assertEqual(
+            [statement for statement in statements if statement not in ('SAVEPOINT', 'RELEASE')],
+            ['INSERT']
+        )
+        self.assertTrue(NUMBER_PATTERN.match(order.number))
+
+    def test_parallel_processes_never_collide(self):
+        """Test forked workers each draw their own node and never repeat a number"""
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=4, mp_context=context) as pool:
+            numbers = [n for batch in pool.map(generate_batch, [2000] * 4) for n in batch]
+        self.assertEqual(len(set(numbers)), 8000)
+
+    def test_taken_number_is_retried_on_a_new_node(self):
+        """Test a number another process already inserted is replaced, not a failed checkout"""
+        user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        taken = Order.objects.create(user=user).number
+        node_id = get_generator().node_id
+        numbers = iter([taken])
+
+        def clashing(order):
+            # As if another process on the same node made this number first
+            return next(numbers, None) or generate_order_number()
+
+        with patch.object(Order, 'generate_order_number', clashing):
+            order = Order.objects.create(user=user)
+        self.assertNotEqual(order.number, taken)
+        self.assertEqual(Order.objects.count(), 2)
+        if getattr(settings, 'ORDER_NUMBER_NODE_ID', None) is None:
+            self.assertNotEqual(get_generator().node_id, node_id)
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite test databases take one writer at a time')
+class ConcurrentOrderCreationTests(TransactionTestCase):
+
+    def test_parallel_order_creation(self):
+        """Benchmark: thousands of orders created from parallel threads all insert"""
+        user = User.objects.create_user(
+            email='bulk@example.com',
+            password='testpass123',
+            first_name='Bulk',
+            last_name='Buyer',
+            phone='+254712345679'
+        )
+        barrier = threading.Barrier(8)
+
+        def create_orders(count):
+            barrier.wait()
+            try:
+                return [Order.objects.create(user=user).number for _ in range(count)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            numbers = [n for batch in pool.map(create_orders, [250] * 8) for n in batch]
+
+        self.assertEqual(len(set(numbers)), 2000)
+        self.assertEqual(Order.objects.count(), 2000)
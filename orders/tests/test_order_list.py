@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from orders.models import Order, OrderItem
+from products.models import Category, Product, ProductReview, ProductVariant
+from users.models import User
+
+
+class OrderListTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Phone', description='Description', category=category,
+            sku='PHONE', price=Decimal('10.00'), quantity=100, status='active'
+        )
+        self.variant = ProductVariant.objects.create(
+            product=self.product, name='Blue', sku='PHONE-BLUE',
+            price=Decimal('12.00'), quantity=10
+        )
+        ProductReview.objects.create(
+            product=self.product, user=self.user, rating=5,
+            title='Great', comment='Great phone', is_approved=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user)
+            OrderItem.objects.create(order=order, product=self.product, quantity=2,
+                                     price=self.product.price)
+            OrderItem.objects.create(order=order, variant=self.variant, quantity=1,
+                                     price=self.variant.price)
+
+    def get_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def test_list_renders_item_snapshots(self):
+        """Test the order list shows snapshot lines with product links only"""
+        self.create_orders(1)
+        response, _ = self.get_list()
+        order = response.data['results'][0]
+        self.assertNotIn('shipping_address', order)
+        self.assertEqual(order['item_count'], 3)
+        item = next(item for item in order['items'] if item['sku'] == 'PHONE')
+        self.assertEqual(item['product'], self.product.pk)
+        self.assertEqual(item['product_slug'], self.product.slug)
+        self.assertEqual(item['name'], 'Phone')
+        self.assertEqual(item['total_price'], '20.00')
+        variant_item = next(item for item in order['items'] if item['sku'] == 'PHONE-BLUE')
+        self.assertEqual(variant_item['variant'], self.variant.pk)
+        self.assertEqual(variant_item['product'], self.product.pk)
+        self.assertEqual(variant_item['product_slug'], self.product.slug)
+
+    def test_query_count_is_flat(self):
+        """Benchmark: listing 10 orders costs the same queries as listing 1"""
+        self.create_orders(1)
+        _, small = self.get_list()
+        self.create_orders(9)
+        cache.clear()
+        response, large = self.get_list()
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(small, large)
+
+    def test_detail_keeps_full_items(self):
+        """Test the order detail still embeds the full product"""
+        self.create_orders(1)
+        order = Order.objects.get()
+        response = self.client.get(reverse('order-detail', kwargs={'number': order.number}))
+        item = next(item for item in response.data['items'] if item['sku'] == 'PHONE')
+        self.assertEqual(item['product']['slug'], self.product.slug)
+        self.assertIn('shipping_address', response.data)
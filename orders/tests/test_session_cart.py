@@ -0,0 +1,146 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Cart, CartItem
+from orders.session_cart import CART_TOKEN_HEADER, SessionCart, merge_session_cart
+from products.models import Category, Product
+from users.models import User
+
+
+class SessionCartTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        User.objects.filter(pk=self.user.pk).update(is_verified=True)
+        category = Category.objects.create(name='Electronics', slug='electronics')
+        self.phone = Product.objects.create(
+            name='Phone', description='Description', category=category,
+            sku='PHONE', price=Decimal('10.00'), quantity=100, status='active'
+        )
+        self.case = Product.objects.create(
+            name='Case', description='Description', category=category,
+            sku='CASE', price=Decimal('2.50'), quantity=100, status='active'
+        )
+
+    def add(self, product, quantity, token=None):
+        headers = {'HTTP_X_CART_TOKEN': token} if token else {}
+        return self.client.post(
+            reverse('cart-item-list'),
+            {'product_id': product.pk, 'quantity': quantity},
+            format='json',
+            **headers
+        )
+
+    def test_anonymous_cart_does_not_write_to_database(self):
+        """Test adding to and reading an anonymous cart only reads the catalog"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add(self.phone, 2)
+            token = response[CART_TOKEN_HEADER]
+            self.add(self.case, 1, token)
+            self.add(self.phone, 1, token)
+            response = self.client.get(reverse('cart-list'), HTTP_X_CART_TOKEN=token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cart_token'], token)
+        self.assertEqual(response.data['total_items'], 4)
+        self.assertEqual(response.data['subtotal'], '32.50')
+        self.assertEqual(
+            [item['id'] for item in response.data['items']],
+            [f'p{self.phone.pk}', f'p{self.case.pk}']
+        )
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if not query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+        self.assertEqual(writes, [])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_update_and_remove_lines(self):
+        """Test anonymous lines can be changed and removed by their key"""
+        token = self.add(self.phone, 2)[CART_TOKEN_HEADER]
+        url = reverse('cart-item-detail', args=[f'p{self.phone.pk}'])
+
+        response = self.client.patch(url, {'quantity': 5}, format='json',
+                                     HTTP_X_CART_TOKEN=token)
+        self.assertEqual(response.data['total_items'], 5)
+        response = self.client.patch(url, {'quantity': 500}, format='json',
+                                     HTTP_X_CART_TOKEN=token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.delete(url, HTTP_X_CART_TOKEN=token)
+        self.assertEqual(response.data['items'], [])
+        response = self.client.delete(url, HTTP_X_CART_TOKEN=token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_merge_adds_to_existing_cart(self):
+        """Test merging adds quantities to lines the user already has"""
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.phone, quantity=1)
+        session_cart = SessionCart()
+        session_cart.add(product=self.phone, quantity=2)
+        session_cart.add(product=self.case, quantity=3)
+        session_cart.save()
+
+        self.assertEqual(merge_session_cart(session_cart.token, self.user), cart)
+        quantities = dict(cart.items.values_list('product__sku', 'quantity'))
+        self.assertEqual(quantities, {'PHONE': 3, 'CASE': 3})
+        self.assertEqual(cart.items.get(product=self.case).price, Decimal('2.50'))
+        self.assertEqual(SessionCart.load(session_cart.token).lines, {})
+        self.assertIsNone(merge_session_cart(session_cart.token, self.user))
+
+    def test_login_merges_anonymous_cart(self):
+        """Test logging in with a cart token moves the lines into the user's cart"""
+        token = self.add(self.phone, 2)[CART_TOKEN_HEADER]
+        response = self.client.post(
+            reverse('login'),
+            {'email': 'shopper@example.com', 'password': 'testpass123'},
+            format='json',
+            HTTP_X_CART_TOKEN=token
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.cart.items.get().quantity, 2)
+
+    def test_unavailable_or_oversold_lines_are_refused(self):
+        """Test anonymous adds are checked for sale status and stock like cart updates"""
+        Product.objects.filter(pk=self.case.pk).update(status='draft')
+        response = self.add(self.case, 1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        token = self.add(self.phone, 60)[CART_TOKEN_HEADER]
+        response = self.add(self.phone, 60, token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(SessionCart.load(token).lines, {f'p{self.phone.pk}': 60})
+
+    def test_merge_drops_unavailable_lines_and_caps_stock(self):
+        """Test merging skips products taken off sale and caps quantities at stock"""
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.phone, quantity=80)
+        session_cart = SessionCart()
+        session_cart.add(product=self.phone, quantity=50)
+        session_cart.add(product=self.case, quantity=3)
+        session_cart.save()
+        Product.objects.filter(pk=self.case.pk).update(status='archived')
+
+        merge_session_cart(session_cart.token, self.user)
+        quantities = dict(cart.items.values_list('product__sku', 'quantity'))
+        self.assertEqual(quantities, {'PHONE': 100})
+        self.assertEqual(SessionCart.load(session_cart.token).lines, {})
+
+    def test_options_on_anonymous_line(self):
+        """Test metadata requests from anonymous visitors do not look for a user cart"""
+        url = reverse('cart-item-detail', args=[f'p{self.phone.pk}'])
+        self.assertEqual(self.client.options(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.options(reverse('cart-item-list')).status_code, status.HTTP_200_OK)
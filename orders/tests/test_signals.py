@@ -0,0 +1,78 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from orders.models import Order, OrderStatusHistory
+from users.models import EmailOutbox, User
+
+
+class OrderSignalTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        Order.objects.create(user=self.user)
+        self.order = Order.objects.get()
+
+    def test_status_change_recorded_without_reload(self):
+        """Test a status change writes history and reads nothing back"""
+        self.order.status = Order.OrderStatus.PROCESSING
+        with self.assertNumQueries(3):
+            # items aggregate, history insert and the order update
+            self.order.save()
+
+        history = OrderStatusHistory.objects.get()
+        self.assertEqual(history.old_status, Order.OrderStatus.DRAFT)
+        self.assertEqual(history.new_status, Order.OrderStatus.PROCESSING)
+
+        # The saved value becomes the new original
+        self.order.save()
+        self.assertEqual(OrderStatusHistory.objects.count(), 1)
+
+    def test_paid_at_set_once_paid(self):
+        """Test paid_at is stamped when the payment status becomes paid"""
+        self.order.customer_notes = 'Ring the bell'
+        self.order.save()
+        self.assertIsNone(self.order.paid_at)
+
+        self.order.payment_status = Order.PaymentStatus.PAID
+        self.order.save(update_fields=['payment_status'])
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.paid_at)
+        self.assertFalse(OrderStatusHistory.objects.exists())
+
+    def test_shipping_queues_notice(self):
+        """Test moving an order to shipped queues the shipping email once"""
+        self.order.status = Order.OrderStatus.SHIPPED
+        self.order.save()
+        self.order.customer_notes = 'Leave at the door'
+        self.order.save()
+
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.to, ['shopper@example.com'])
+        self.assertIn(self.order.number, email.subject)
+
+    def test_admin_ship_action_queues_notices(self):
+        """Test the bulk shipped action notifies each shipped order"""
+        admin = User.objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            first_name='Ad',
+            last_name='Min',
+            phone='+254712345670'
+        )
+        Order.objects.update(status=Order.OrderStatus.PROCESSING)
+        Order.objects.create(user=self.user)
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'mark_as_shipped',
+            '_selected_action': list(Order.objects.values_list('pk', flat=True)),
+        })
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.OrderStatus.SHIPPED)
+        self.assertEqual(EmailOutbox.objects.get().subject,
+                         f'Order {self.order.number} has shipped')
@@ -1,42 +1,48 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Prefetch, Count
-from django.db import transaction, IntegrityError
-from rest_framework.exceptions import ValidationError
+from django.db.models import Prefetch, Count, Max
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework import serializers
 from django.utils.translation import gettext as _
 import logging
 
+from products.models import primary_image_prefetch
+from products.conditional import ConditionalGetMixin, related_aggregates
+from products.fieldsets import SparseFieldsetViewMixin, is_expanded
 from payments.models import Payment
-from payments.mpesa_utils import initiate_stk_push
-from decouple import config
-from .models import (
-    Order, OrderItem, ShippingAddress, BillingAddress,
-    Cart, CartItem
-)
+from .models import Order, OrderItem, Cart, CartItem
 from .serializers import (
-    OrderSerializer,
+    OrderSerializer, OrderListSerializer,
     OrderStatusHistorySerializer,
-    CartSerializer, CartItemSerializer, CheckoutSerializer
+    CartSerializer, CartItemSerializer, CartLineSerializer,
+    CheckoutSerializer, ExpandedCartSerializer,
+    SessionCartSerializer, SessionCartItemSerializer
 )
 from .filters import OrderFilter
+from .services import (
+    cancel_orders, cart_line_queryset, checkout_cart, load_cart_items,
+    order_items_prefetch,
+    order_list_items_prefetch
+)
 from .pagination import OptimizedPagination
+from .session_cart import (
+    CART_TOKEN_HEADER, SessionCart, get_cart_token, is_available,
+    line_id_for, merge_session_cart, stock_limit
+)
 
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Order.objects.select_related(
         'user', 'shipping_address', 'billing_address'
     ).prefetch_related(
-        Prefetch('items', queryset=OrderItem.objects.select_related(
-            'product', 'variant', 'variant__product'
-        )),
-        'status_history'
-    ).annotate(
-        item_count=Count('items')
+        order_items_prefetch(),
+        'status_history',
+        'payments'
     )
     serializer_class = OrderSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -52,6 +58,15 @@ class OrderViewSet(viewsets.ModelViewSet):
     ]
     ordering = ['-created_at']
     pagination_class = OptimizedPagination
+    count_strategy = 'auto'
+    sparse_field_lookups = {
+        'items': ['items'],
+        # Order.item_count sums the prefetched items
+        'item_count': ['items'],
+        'shipping_address': ['shipping_address'],
+        'billing_address': ['billing_address'],
+        'payments': ['payments'],
+    }
     lookup_field = 'number'
 
     def get_permissions(self):
@@ -59,9 +74,35 @@ class OrderViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAuthenticated(), IsAdminUser()]
 
+    def get_conditional_aggregates(self):
+        return {
+            **super().get_conditional_aggregates(),
+            **related_aggregates(
+                OrderItem.objects.all(), 'order',
+                _items=Count('pk'),
+                _products_updated_at=Max('product__updated_at'),
+                _variants_updated_at=Max('variant__updated_at')
+            ),
+            **related_aggregates(
+                Payment.objects.all(), 'order',
+                _payments=Count('pk'), _payments_processed_at=Max('processed_at')
+            ),
+        }
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderListSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
+        if self.action == 'list':
+            # The list renders item snapshots, not the catalog behind them
+            queryset = self.prune_sparse_lookups(
+                Order.objects.prefetch_related(order_list_items_prefetch())
+            )
+        else:
+            queryset = super().get_queryset()
+
         # Non-admin users can only see their own orders
         if not self.request.user.is_staff:
             queryset = queryset.filter(user=self.request.user)
@@ -85,6 +126,26 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['post'], url_path='bulk-cancel')
+    def bulk_cancel(self, request):
+        """Cancel many orders by number in one set-based pass (admin only)"""
+        numbers = request.data.get('numbers')
+        if not isinstance(numbers, list) or not numbers:
+            return Response(
+                {'error': _('Provide a non-empty list of order numbers.')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cancelled = cancel_orders(
+            Order.objects.filter(number__in=numbers),
+            reason=request.data.get('reason', ''),
+            user=request.user
+        )
+        return Response(
+            {'cancelled': cancelled, 'skipped': len(set(numbers)) - cancelled},
+            status=status.HTTP_200_OK
+        )
+
     @action(detail=True, methods=['get'])
     def status_history(self, request, number=None):
         order = self.get_object()
@@ -93,24 +154,107 @@ class OrderViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CartViewSet(viewsets.ModelViewSet):
-    queryset = Cart.objects.prefetch_related(
-        Prefetch('items', queryset=CartItem.objects.select_related(
-            'product', 'variant', 'variant__product'
-        ))
-    )
+def check_inventory(item, quantity):
+    """
+    Reject a quantity above the stock of a tracked product or variant
+    """
+    limit = stock_limit(item)
+    if limit is not None and quantity > limit:
+        raise ValidationError(
+            _("Requested quantity exceeds available inventory")
+        )
+
+
+def check_available(item):
+    """
+    Reject a line whose product is not on sale
+    """
+    if not is_available(item):
+        raise ValidationError(_("This product is not available"))
+
+
+class SessionCartMixin:
+    """
+    Serves anonymous requests from the cache-backed ``SessionCart``
+    """
+
+    def get_session_cart(self):
+        return SessionCart.load(get_cart_token(self.request))
+
+    def session_cart_response(self, session_cart, data=None, status_code=status.HTTP_200_OK):
+        if data is None:
+            data = SessionCartSerializer(
+                session_cart.get_summary(), context=self.get_serializer_context()
+            ).data
+        response = Response(data, status=status_code)
+        response[CART_TOKEN_HEADER] = session_cart.token
+        return response
+
+
+def full_cart_item_queryset(queryset=None):
+    """
+    Cart items for ``CartItemSerializer``, which embeds the whole product
+    """
+    if queryset is None:
+        queryset = CartItem.objects.all()
+    return queryset.select_related(
+        'product', 'variant', 'variant__product'
+    ).prefetch_related(
+        primary_image_prefetch('product__images')
+    ).order_by('created_at', 'pk')
+
+
+class CartViewSet(SessionCartMixin, viewsets.ModelViewSet):
+    """
+    The user's cart. Lines are compact unless ``?expand=product`` asks
+    for the full product and variant.
+    """
+    queryset = Cart.objects.all()
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = OptimizedPagination
 
+    def get_serializer_class(self):
+        if is_expanded(self.request, 'product'):
+            return ExpandedCartSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        if is_expanded(self.request, 'product'):
+            items = full_cart_item_queryset()
+        else:
+            items = cart_line_queryset()
+        return super().get_queryset().prefetch_related(Prefetch('items', queryset=items))
+
+    def get_permissions(self):
+        # Anonymous visitors can read their cache-backed cart
+        if self.action in ('list', 'retrieve'):
+            return [AllowAny()]
+        return super().get_permissions()
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.session_cart_response(self.get_session_cart())
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.session_cart_response(self.get_session_cart())
+        return super().retrieve(request, *args, **kwargs)
+
     def get_object(self):
-        # Get or create cart for the current user
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        # Get or create cart for the current user, with its items prefetched
+        cart = self.get_queryset().filter(user=self.request.user).first()
+        if cart is None:
+            cart, created = Cart.objects.get_or_create(user=self.request.user)
         return cart
 
     @action(detail=False, methods=['post'])
     def checkout(self, request):
         logging.info("Checkout process started.")
+        cart_token = get_cart_token(request)
+        if cart_token:
+            merge_session_cart(cart_token, request.user)
         try:
             cart = Cart.objects.get(user=request.user)
             logging.info(f"Cart {cart.id} found for user {request.user.id}.")
@@ -121,7 +265,8 @@ class CartViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        if cart.is_empty:
+        cart_items = load_cart_items(cart)
+        if not cart_items:
             return Response(
                 {'error': _('Cannot checkout with an empty cart')},
                 status=status.HTTP_400_BAD_REQUEST
@@ -136,128 +281,33 @@ class CartViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            with transaction.atomic():
-                logging.info("Creating order...")
-                # Create order
-                try:
-                    order = Order.objects.create(
-                        user=request.user,
-                        status=Order.OrderStatus.PENDING,
-                        payment_status=Order.PaymentStatus.PENDING,
-                        customer_notes=serializer.validated_data.get('customer_notes', ''),
-                        ip_address=request.META.get('REMOTE_ADDR')
-                    )
-                    logging.info(f"Order {order.id} created.")
-                    try:
-                        logging.info(f"Order {order.id} created successfully with number {order.number}")
-                    except Exception as e:
-                        logging.error(f"Error creating order: {str(e)}")
-                        raise
-
-                except IntegrityError:
-                    logging.error("Failed to create order due to an integrity error. Retrying...")
-                    order = Order.objects.create(
-                        user=request.user,
-                        status=Order.OrderStatus.PENDING,
-                        payment_status=Order.PaymentStatus.PENDING,
-                        customer_notes=serializer.validated_data.get('customer_notes', ''),
-                        ip_address=request.META.get('REMOTE_ADDR')
-                    )
-                    logging.info(f"Order {order.id} created on retry.")
-                
-                # Create order items from cart items
-                for cart_item in cart.items.all():
-                    item_data = {
-                        'order': order,
-                        'product': cart_item.product,
-                        'variant': cart_item.variant,
-                        'quantity': cart_item.quantity,
-                        'price': cart_item.price
-                    }
-                    OrderItem.objects.create(**item_data)
-                
-                # Create addresses
-                shipping_address_data = serializer.validated_data['shipping_address']
-                ShippingAddress.objects.create(
-                    order=order,
-                    **shipping_address_data
-                )
-                
-                if serializer.validated_data['use_shipping_as_billing']:
-                    BillingAddress.objects.create(
-                        order=order,
-                        **shipping_address_data
-                    )
-                elif 'billing_address' in serializer.validated_data:
-                    BillingAddress.objects.create(
-                        order=order,
-                        **serializer.validated_data['billing_address']
-                    )
-                
-                # Clear the cart
-                cart.items.all().delete()
-                logging.info("Cart cleared.")
-
-                logging.info("Recalculating order totals...")
-                # Recalculate order totals
-                order.calculate_totals()
-                order.save()
-                logging.info("Order totals recalculated.")
-
-                logging.info("Creating payment...")
-                # Create payment
-                payment_method = serializer.validated_data['payment_method']
-                phone_number = serializer.validated_data.get('mpesa_phone_number')
-
-                payment = Payment.objects.create(
-                    order=order,
-                    amount=order.total,
-                    currency=order.currency,
-                    method=payment_method,
-                    phone_number=phone_number,
-                    status=Payment.PaymentStatus.PENDING,
-                )
-                logging.info(f"Payment {payment.id} created.")
-
-                if payment_method == Order.PaymentMethod.MPESA:
-                    logging.info("Initiating M-Pesa payment...")
-                    # Initiate STK push
-                    shortcode = config('MPESA_SHORTCODE')
-                    passkey = config('MPESA_PASSKEY')
-                    callback_url = config('CALLBACK_URL')
-
-                    response_data = initiate_stk_push(
-                        phone_number,
-                        int(order.total),
-                        str(order.id),
-                        shortcode,
-                        passkey,
-                        callback_url
-                    )
-
-                    if response_data and response_data.get('ResponseCode') == '0':
-                        payment.mpesa_request_id = response_data['CheckoutRequestID']
-                        payment.save()
-                        logging.info("M-Pesa payment initiated successfully.")
-                    else:
-                        payment.status = Payment.PaymentStatus.FAILED
-                        payment.gateway_response = response_data
-                        payment.save()
-                        order.payment_status = Order.PaymentStatus.FAILED
-                        order.save()
-                        logging.error(f"Failed to initiate M-Pesa payment: {response_data}")
-                        return Response({
-                            "error": "Failed to initiate M-Pesa payment.",
-                            "details": response_data
-                        }, status=status.HTTP_400_BAD_REQUEST)
-
-                logging.info("Checkout process completed successfully.")
-
-                return Response(
-                    OrderSerializer(order, context={'request': request}).data,
-                    status=status.HTTP_201_CREATED
-                )
-        
+            # The service commits its own transaction; the response is built
+            # after commit so no rows stay locked while it is serialized
+            order, payment = checkout_cart(
+                cart,
+                request.user,
+                serializer.validated_data,
+                ip_address=request.META.get('REMOTE_ADDR'),
+                cart_items=cart_items
+            )
+            logging.info(f"Order {order.number} created with payment {payment.id}.")
+            logging.info("Checkout process completed successfully.")
+
+            order = Order.objects.select_related(
+                'shipping_address', 'billing_address'
+            ).prefetch_related(
+                order_items_prefetch(), 'payments'
+            ).get(pk=order.pk)
+            return Response(
+                OrderSerializer(order, context={'request': request}).data,
+                status=status.HTTP_201_CREATED
+            )
+
+        except ValidationError as e:
+            return Response(
+                {'error': e.detail},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -265,13 +315,99 @@ class CartViewSet(viewsets.ModelViewSet):
             )
 
 
-class CartItemViewSet(viewsets.ModelViewSet):
-    serializer_class = CartItemSerializer
-    permission_classes = [IsAuthenticated]
+class CartItemViewSet(SessionCartMixin, viewsets.ModelViewSet):
+    """
+    Lines of the user's cart, compact unless ``?expand=product``.
+    Anonymous requests work on the cache-backed cart named by the
+    ``X-Cart-Token`` header instead.
+    """
+    serializer_class = CartLineSerializer
+    permission_classes = [AllowAny]
+
+    def get_serializer_class(self):
+        if is_expanded(self.request, 'product'):
+            return CartItemSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
+        # Anonymous lines live in the session cart; metadata (OPTIONS),
+        # the browsable API and schema generation still land here
+        if not self.request.user.is_authenticated:
+            return CartItem.objects.none()
         cart, created = Cart.objects.get_or_create(user=self.request.user)
-        return cart.items.select_related('product', 'variant', 'variant__product')
+        if is_expanded(self.request, 'product'):
+            return full_cart_item_queryset(cart.items.all())
+        return cart_line_queryset(cart.items.all())
+
+    def get_session_line(self, session_cart):
+        items = session_cart.get_items([self.kwargs['pk']])
+        if not items:
+            raise NotFound()
+        return items[0]
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        session_cart = self.get_session_cart()
+        data = SessionCartItemSerializer(
+            session_cart.get_items(), many=True, context=self.get_serializer_context()
+        ).data
+        return self.session_cart_response(session_cart, data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().retrieve(request, *args, **kwargs)
+        session_cart = self.get_session_cart()
+        item = self.get_session_line(session_cart)
+        data = SessionCartItemSerializer(item, context=self.get_serializer_context()).data
+        return self.session_cart_response(session_cart, data)
+
+    def create(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().create(request, *args, **kwargs)
+        serializer = SessionCartItemSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        item = CartItem(
+            product=serializer.validated_data.get('product'),
+            variant=serializer.validated_data.get('variant'),
+            quantity=serializer.validated_data.get('quantity', 1)
+        )
+        session_cart = self.get_session_cart()
+        line_id = line_id_for(item.product, item.variant)
+        check_available(item)
+        check_inventory(item, session_cart.lines.get(line_id, 0) + item.quantity)
+        session_cart.add(item.product, item.variant, item.quantity)
+        session_cart.save()
+        return self.session_cart_response(
+            session_cart, status_code=status.HTTP_201_CREATED
+        )
+
+    def update(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().update(request, *args, **kwargs)
+        quantity = serializers.IntegerField(min_value=1).run_validation(
+            request.data.get('quantity')
+        )
+        session_cart = self.get_session_cart()
+        item = self.get_session_line(session_cart)
+        check_available(item)
+        check_inventory(item, quantity)
+        session_cart.set_quantity(self.kwargs['pk'], quantity)
+        session_cart.save()
+        return self.session_cart_response(session_cart)
+
+    def destroy(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().destroy(request, *args, **kwargs)
+        session_cart = self.get_session_cart()
+        try:
+            session_cart.remove(self.kwargs['pk'])
+        except KeyError:
+            raise NotFound()
+        session_cart.save()
+        return self.session_cart_response(session_cart)
 
     def perform_create(self, serializer):
         cart, created = Cart.objects.get_or_create(user=self.request.user)
@@ -280,16 +416,5 @@ class CartItemViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         instance = serializer.instance
         new_quantity = serializer.validated_data.get('quantity', instance.quantity)
-        
-        if instance.variant:
-            if new_quantity > instance.variant.quantity and instance.variant.track_quantity:
-                raise ValidationError(
-                    _("Requested quantity exceeds available inventory")
-                )
-        elif instance.product:
-            if new_quantity > instance.product.quantity and instance.product.track_quantity:
-                raise ValidationError(
-                    _("Requested quantity exceeds available inventory")
-                )
-        
-        serializer.save()
\ No newline at end of file
+        check_inventory(instance, new_quantity)
+        serializer.save()
@@ -0,0 +1,182 @@
+"""
+M-Pesa STK callback ingestion.
+
+Every callback is first stored as an ``MpesaCallback`` row. The unique
+CheckoutRequestID makes a resent callback fail on insert, so it is
+acknowledged without being applied again. Applying a callback takes one
+transaction: the payment and its order are read with one indexed query,
+and the payment moves out of ``pending`` with a conditional UPDATE, so two
+racing deliveries cannot both apply.
+
+A successful payment for an order that was cancelled in the meantime does
+not take stock again; the order is noted for a refund instead.
+
+With ``MPESA_CALLBACK_ASYNC`` the view only stores the callback and
+returns; the ``process_mpesa_callbacks`` command applies stored callbacks.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from orders.inventory import confirm_reservations, release_reservations
+from orders.models import Order
+from .models import MpesaCallback, Payment
+
+# Callbacks can beat the outbox worker recording the CheckoutRequestID on
+# the payment; unmatched ones are retried for this long
+UNMATCHED_RETRY_WINDOW = timedelta(hours=1)
+
+
+def is_trusted_callback(token):
+    """
+    Whether ``token`` (from the callback URL) is MPESA_CALLBACK_TOKEN.
+    The payments.E001 check keeps the site from starting without one.
+    """
+    expected = getattr(settings, 'MPESA_CALLBACK_TOKEN', '')
+    return bool(expected and token) and constant_time_compare(token, expected)
+
+
+def parse_callback(data):
+    """
+    (checkout_request_id, result_code, receipt_number) from a callback body
+    """
+    callback = (data.get('Body') or {}).get('stkCallback') or {}
+    metadata = (callback.get('CallbackMetadata') or {}).get('Item') or []
+    receipt_number = next(
+        (item.get('Value') for item in metadata if item.get('Name') == 'MpesaReceiptNumber'),
+        ''
+    )
+    result_code = callback.get('ResultCode')
+    try:
+        result_code = int(result_code)
+    except (TypeError, ValueError):
+        result_code = None
+    return callback.get('CheckoutRequestID'), result_code, str(receipt_number or '')
+
+
+def ingest_callback(data):
+    """
+    Store a callback. Returns ``(callback, created)``; ``created`` is False
+    when the same CheckoutRequestID was delivered before. Raises
+    ``ValueError`` for a body without a CheckoutRequestID.
+    """
+    checkout_request_id, result_code, receipt_number = parse_callback(data)
+    if not checkout_request_id:
+        raise ValueError('Invalid callback data')
+    try:
+        with transaction.atomic():
+            callback = MpesaCallback.objects.create(
+                checkout_request_id=checkout_request_id,
+                result_code=result_code,
+                receipt_number=receipt_number,
+                payload=data
+            )
+        return callback, True
+    except IntegrityError:
+        return MpesaCallback.objects.get(checkout_request_id=checkout_request_id), False
+
+
+def _finish(callback, status):
+    MpesaCallback.objects.filter(pk=callback.pk).update(
+        status=status, processed_at=timezone.now()
+    )
+    callback.status = status
+    return callback
+
+
+def _apply(callback):
+    payment = Payment.objects.select_related('order').filter(
+        mpesa_request_id=callback.checkout_request_id
+    ).first()
+    if payment is None:
+        return MpesaCallback.Status.UNMATCHED
+
+    paid = callback.result_code == 0
+    if paid and callback.receipt_number and Payment.objects.filter(
+        transaction_id=callback.receipt_number
+    ).exists():
+        # The same receipt already settled a payment
+        return MpesaCallback.Status.DUPLICATE
+
+    now = timezone.now()
+    changes = {
+        'status': Payment.PaymentStatus.PAID if paid else Payment.PaymentStatus.FAILED,
+        'gateway_response': callback.payload,
+    }
+    if paid:
+        changes.update(transaction_id=callback.receipt_number or None, processed_at=now)
+    # Only the first delivery moves the payment out of pending
+    if not Payment.objects.filter(
+        pk=payment.pk, status=Payment.PaymentStatus.PENDING
+    ).update(**changes):
+        return MpesaCallback.Status.DUPLICATE
+
+    # Locked so a concurrent cancel either finishes first or waits for us
+    order_status = Order.objects.select_for_update().filter(
+        pk=payment.order_id
+    ).values_list('status', flat=True).first()
+    refund_due = paid and order_status == Order.OrderStatus.CANCELLED
+
+    # A queryset update skips the order signals, so paid_at is set here
+    order_changes = {'paid_at': now} if paid else {}
+    if refund_due:
+        logging.warning(f"Order {payment.order_id} was paid after it was cancelled; refund due")
+        order_changes['admin_notes'] = Concat(
+            Value(f"Paid after cancellation (receipt {callback.receipt_number}); refund due\n"),
+            F('admin_notes')
+        )
+    Order.objects.filter(pk=payment.order_id).update(
+        payment_status=Order.PaymentStatus.PAID if paid else Order.PaymentStatus.FAILED,
+        updated_at=now,
+        **order_changes
+    )
+    if not paid:
+        release_reservations(payment.order)
+    elif not refund_due:
+        # A cancelled order's stock went back on cancel; it is not taken again
+        confirm_reservations(payment.order)
+    return MpesaCallback.Status.PROCESSED
+
+
+def process_callback(callback):
+    """
+    Apply a stored callback to its payment and order if nobody has yet.
+    Returns the callback with its final status.
+    """
+    with transaction.atomic():
+        callback = MpesaCallback.objects.select_for_update().get(pk=callback.pk)
+        if callback.status not in (
+            MpesaCallback.Status.RECEIVED, MpesaCallback.Status.UNMATCHED
+        ):
+            return callback
+        return _finish(callback, _apply(callback))
+
+
+def process_pending_callbacks(batch_size=100, now=None):
+    """
+    Apply one batch of stored callbacks, including recent unmatched ones.
+    Rows locked by another worker are skipped. Returns how many were
+    resolved; unmatched callbacks that still match nothing do not count.
+    """
+    now = now or timezone.now()
+    # 'received' sorts before 'unmatched', so retries never starve new callbacks
+    callbacks = MpesaCallback.objects.select_for_update(skip_locked=True).filter(
+        Q(status=MpesaCallback.Status.RECEIVED)
+        | Q(status=MpesaCallback.Status.UNMATCHED,
+            created_at__gte=now - UNMATCHED_RETRY_WINDOW)
+    ).order_by('status', 'created_at')
+    resolved = 0
+    with transaction.atomic():
+        for callback in callbacks[:batch_size]:
+            status = _apply(callback)
+            if status != callback.status:
+                _finish(callback, status)
+            if status != MpesaCallback.Status.UNMATCHED:
+                resolved += 1
+    return resolved
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_callback_token(app_configs, **kwargs):
+    """
+    Refuse to start without MPESA_CALLBACK_TOKEN: every M-Pesa callback
+    would be rejected and no payment would ever settle
+    """
+    if getattr(settings, 'MPESA_CALLBACK_TOKEN', ''):
+        return []
+    return [
+        Error(
+            'MPESA_CALLBACK_TOKEN is not set.',
+            hint='Set the MPESA_CALLBACK_TOKEN environment variable to a long random '
+                 'string; it is added to CALLBACK_URL and checked on every callback.',
+            id='payments.E001',
+        )
+    ]
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.callbacks import process_pending_callbacks
+
+
+class Command(BaseCommand):
+    help = 'Apply M-Pesa callbacks stored by the callback endpoint in fast-ack mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Callbacks applied per transaction'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new callbacks instead of exiting when none are left'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep between polls when nothing is pending (with --loop)'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            resolved = process_pending_callbacks(options['batch_size'])
+            processed += resolved
+            if resolved:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} callbacks.'))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Perform queued payment gateway calls (M-Pesa STK pushes) recorded at checkout'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Messages claimed per batch'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new messages instead of exiting when the outbox is drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep between polls when the outbox is empty (with --loop)'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            claimed = process_outbox(options['batch_size'])
+            processed += claimed
+            if claimed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} outbox messages.'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_alter_payment_currency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('stk_push', 'M-Pesa STK Push')], max_length=20, verbose_name='action')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Not picked up by a worker before this time', verbose_name='available at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='processed at')),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_messages', to='payments.payment', verbose_name='payment')),
+            ],
+            options={
+                'verbose_name': 'payment outbox message',
+                'verbose_name_plural': 'payment outbox messages',
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='payments_pa_status_30048c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_paymentoutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='mpesa_request_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='M-Pesa request ID'),
+        ),
+        migrations.CreateModel(
+            name='MpesaCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkout_request_id', models.CharField(max_length=100, unique=True, verbose_name='checkout request ID')),
+                ('result_code', models.IntegerField(blank=True, null=True, verbose_name='result code')),
+                ('receipt_number', models.CharField(blank=True, max_length=100, verbose_name='M-Pesa receipt number')),
+                ('payload', models.JSONField(default=dict, verbose_name='payload')),
+                ('status', models.CharField(choices=[('received', 'Received'), ('processed', 'Processed'), ('duplicate', 'Duplicate'), ('unmatched', 'Unmatched')], default='received', max_length=20, verbose_name='status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='processed at')),
+            ],
+            options={
+                'verbose_name': 'M-Pesa callback',
+                'verbose_name_plural': 'M-Pesa callbacks',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='payments_mp_status_dbfd5b_idx')],
+            },
+        ),
+    ]
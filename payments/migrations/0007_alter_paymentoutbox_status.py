@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_mpesacallback'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20, verbose_name='status'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_alter_paymentoutbox_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentoutbox',
+            name='lease_token',
+            field=models.CharField(blank=True, help_text='The claim of the worker sending this message', max_length=32, verbose_name='lease token'),
+        ),
+        migrations.AlterField(
+            model_name='paymentoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20, verbose_name='status'),
+        ),
+    ]
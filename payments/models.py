@@ -40,7 +40,8 @@ class Payment(models.Model):
         _('M-Pesa request ID'),
         max_length=100,
         blank=True,
-        null=True
+        null=True,
+        db_index=True
     )
     transaction_id = models.CharField(
         _('transaction ID'),
@@ -101,4 +102,123 @@ class Payment(models.Model):
     def save(self, *args, **kwargs):
         if self.status == self.PaymentStatus.PAID and not self.processed_at:
             self.processed_at = timezone.now()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class PaymentOutbox(models.Model):
+    """
+    Gateway calls recorded in the same transaction as the payment they act
+    on and performed by a worker once that transaction has committed
+    """
+    class Action(models.TextChoices):
+        STK_PUSH = 'stk_push', _('M-Pesa STK Push')
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SENDING = 'sending', _('Sending')
+        SENT = 'sent', _('Sent')
+        FAILED = 'failed', _('Failed')
+        CANCELLED = 'cancelled', _('Cancelled')
+
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name='outbox_messages',
+        verbose_name=_('payment')
+    )
+    action = models.CharField(
+        _('action'),
+        max_length=20,
+        choices=Action.choices
+    )
+    status = models.CharField(
+        _('status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    available_at = models.DateTimeField(
+        _('available at'),
+        default=timezone.now,
+        help_text=_('Not picked up by a worker before this time')
+    )
+    lease_token = models.CharField(
+        _('lease token'),
+        max_length=32,
+        blank=True,
+        help_text=_('The claim of the worker sending this message')
+    )
+    last_error = models.TextField(_('last error'), blank=True)
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True
+    )
+    processed_at = models.DateTimeField(
+        _('processed at'),
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = _('payment outbox message')
+        verbose_name_plural = _('payment outbox messages')
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} for Payment {self.payment_id} ({self.status})"
+
+
+class MpesaCallback(models.Model):
+    """
+    Raw STK callbacks as received from Safaricom, one per
+    CheckoutRequestID, so duplicates are recognised on insert and
+    callbacks can be acknowledged before they are applied
+    """
+    class Status(models.TextChoices):
+        RECEIVED = 'received', _('Received')
+        PROCESSED = 'processed', _('Processed')
+        DUPLICATE = 'duplicate', _('Duplicate')
+        UNMATCHED = 'unmatched', _('Unmatched')
+
+    checkout_request_id = models.CharField(
+        _('checkout request ID'),
+        max_length=100,
+        unique=True
+    )
+    result_code = models.IntegerField(_('result code'), null=True, blank=True)
+    receipt_number = models.CharField(
+        _('M-Pesa receipt number'),
+        max_length=100,
+        blank=True
+    )
+    payload = models.JSONField(_('payload'), default=dict)
+    status = models.CharField(
+        _('status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.RECEIVED
+    )
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True
+    )
+    processed_at = models.DateTimeField(
+        _('processed at'),
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = _('M-Pesa callback')
+        verbose_name_plural = _('M-Pesa callbacks')
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Callback {self.checkout_request_id} ({self.status})"
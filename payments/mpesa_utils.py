@@ -1,52 +1,155 @@
-import os
 import base64
+import threading
+import time
 import requests
 from datetime import datetime
-from decouple import config
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
-def get_mpesa_access_token():
-    consumer_key = config('CONSUMER_KEY')
-    consumer_secret = config('CONSUMER_SECRET')
-    api_url = f"{config('MPESA_BASE_URL')}/oauth/v1/generate?grant_type=client_credentials"
 
-    response = requests.get(api_url, auth=(consumer_key, consumer_secret))
-    if response.status_code == 200:
-        return response.json()['access_token']
-    return None
+class MpesaClient:
+    """
+    Daraja API client. One instance is shared per process: its Session
+    keeps connections to Safaricom alive between calls and the OAuth token
+    is reused until shortly before it expires, so a push is normally a
+    single request over an already open connection.
+    """
+    # Refresh this many seconds before the token's expires_in runs out
+    token_refresh_margin = 60
+
+    def __init__(self, base_url, consumer_key, consumer_secret,
+                 timeout=(5, 30), pool_maxsize=10):
+        self.base_url = base_url.rstrip('/')
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
+
+    def _token_is_fresh(self):
+        return self._token and time.monotonic() < self._token_expires_at
+
+    def get_access_token(self):
+        """
+        Cached OAuth token, fetched by at most one thread at a time when it
+        is missing or about to expire. Returns None if Daraja refuses.
+        """
+        if self._token_is_fresh():
+            return self._token
+        with self._token_lock:
+            # Another thread may have refreshed it while we waited
+            if self._token_is_fresh():
+                return self._token
+            response = self.session.get(
+                f"{self.base_url}/oauth/v1/generate",
+                params={'grant_type': 'client_credentials'},
+                auth=(self.consumer_key, self.consumer_secret),
+                timeout=self.timeout
+            )
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            expires_in = int(data.get('expires_in', 3599))
+            self._token = data['access_token']
+            self._token_expires_at = (
+                time.monotonic() + max(expires_in - self.token_refresh_margin, 0)
+            )
+            return self._token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0
+
+    def stk_push(self, phone_number, amount, order_id, shortcode, passkey, callback_url):
+        """
+        Send an STK push; returns Daraja's JSON response, or None when no
+        access token could be obtained
+        """
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        payload = {
+            "BusinessShortCode": shortcode,
+            "Password": get_lipa_na_mpesa_password(shortcode, passkey, timestamp),
+            "Timestamp": timestamp,
+            "TransactionType": "CustomerPayBillOnline",
+            "Amount": amount,
+            "PartyA": phone_number,
+            "PartyB": shortcode,
+            "PhoneNumber": phone_number,
+            "CallBackURL": callback_url,
+            "AccountReference": order_id,
+            "TransactionDesc": f"Payment for order {order_id}"
+        }
+
+        for attempt in range(2):
+            access_token = self.get_access_token()
+            if not access_token:
+                return None
+            response = self.session.post(
+                f"{self.base_url}/mpesa/stkpush/v1/processrequest",
+                json=payload,
+                headers={'Authorization': f'Bearer {access_token}'},
+                timeout=self.timeout
+            )
+            if response.status_code != 401:
+                break
+            # Token revoked early; fetch a new one and try once more
+            self.invalidate_token()
+        return response.json()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_mpesa_client():
+    """
+    The process-wide client, created on first use
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MpesaClient(
+                    settings.MPESA_BASE_URL,
+                    settings.MPESA_CONSUMER_KEY,
+                    settings.MPESA_CONSUMER_SECRET,
+                    timeout=(
+                        getattr(settings, 'MPESA_CONNECT_TIMEOUT', 5),
+                        getattr(settings, 'MPESA_READ_TIMEOUT', 30)
+                    ),
+                    pool_maxsize=getattr(settings, 'MPESA_POOL_MAXSIZE', 10)
+                )
+    return _client
+
+
+def get_callback_url():
+    """
+    MPESA_CALLBACK_URL with MPESA_CALLBACK_TOKEN added as ``token``, so
+    the callback view can tell Safaricom's calls from forged ones
+    """
+    parts = urlsplit(settings.MPESA_CALLBACK_URL)
+    query = parse_qsl(parts.query)
+    query.append(('token', getattr(settings, 'MPESA_CALLBACK_TOKEN', '')))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def get_mpesa_access_token():
+    return get_mpesa_client().get_access_token()
 
-def get_lipa_na_mpesa_password(shortcode, passkey):
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+def get_lipa_na_mpesa_password(shortcode, passkey, timestamp=None):
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d%H%M%S')
     password_str = f"{shortcode}{passkey}{timestamp}"
     password_bytes = password_str.encode('utf-8')
     return base64.b64encode(password_bytes).decode('utf-8')
 
 def initiate_stk_push(phone_number, amount, order_id, shortcode, passkey, callback_url):
-    access_token = get_mpesa_access_token()
-    if not access_token:
-        return None
-
-    api_url = f"{config('MPESA_BASE_URL')}/mpesa/stkpush/v1/processrequest"
-    password = get_lipa_na_mpesa_password(shortcode, passkey)
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-
-    payload = {
-        "BusinessShortCode": shortcode,
-        "Password": password,
-        "Timestamp": timestamp,
-        "TransactionType": "CustomerPayBillOnline",
-        "Amount": amount,
-        "PartyA": phone_number,
-        "PartyB": shortcode,
-        "PhoneNumber": phone_number,
-        "CallBackURL": callback_url,
-        "AccountReference": order_id,
-        "TransactionDesc": f"Payment for order {order_id}"
-    }
-
-    response = requests.post(api_url, json=payload, headers=headers)
-    return response.json()
+    return get_mpesa_client().stk_push(
+        phone_number, amount, order_id, shortcode, passkey, callback_url
+    )
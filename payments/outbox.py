@@ -0,0 +1,203 @@
+"""
+Transactional outbox for payment gateway calls.
+
+Checkout records an outbox row next to the payment instead of calling the
+gateway, so no database transaction or row lock is held for an HTTP round
+trip. ``process_outbox`` (run by the ``process_payment_outbox`` command)
+claims due rows, commits the claim, calls the gateway outside any
+transaction and then records the outcome on the payment.
+
+A claim marks rows SENDING under a lease token and pushes ``available_at``
+forward by the lease (see ``lease_duration``); only the worker holding the
+token may finish or requeue them. Each message's lease is renewed just
+before it is sent, so a slow batch never lets another worker take over a
+live send. A row whose owner dies is claimed again once its lease runs
+out.
+
+Cancelling an order cancels its pending messages; a message already
+claimed when the order is cancelled is dropped by the worker instead.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from orders.inventory import release_reservations
+from orders.models import Order
+from .models import Payment, PaymentOutbox
+from .mpesa_utils import get_callback_url, get_mpesa_client
+
+
+def enqueue_stk_push(payment):
+    """
+    Queue the STK push for ``payment``; call inside the transaction that
+    creates it so the push only happens if the payment is committed
+    """
+    return PaymentOutbox.objects.create(
+        payment=payment, action=PaymentOutbox.Action.STK_PUSH
+    )
+
+
+def cancel_pending_messages(order_ids):
+    """
+    Cancel the not yet performed messages for the payments of these
+    orders; returns how many were cancelled. A worker holding one of
+    them loses its claim and does not send it.
+    """
+    return PaymentOutbox.objects.filter(
+        payment__order_id__in=order_ids,
+        status__in=[PaymentOutbox.Status.PENDING, PaymentOutbox.Status.SENDING]
+    ).update(
+        status=PaymentOutbox.Status.CANCELLED, lease_token='', processed_at=timezone.now()
+    )
+
+
+def lease_duration():
+    """
+    How long a claim lasts: ``PAYMENT_OUTBOX_LEASE_SECONDS``, but never
+    less than the longest one push can take (a token fetch and the POST,
+    both repeated after a 401) plus a margin
+    """
+    request_timeout = (
+        getattr(settings, 'MPESA_CONNECT_TIMEOUT', 5)
+        + getattr(settings, 'MPESA_READ_TIMEOUT', 30)
+    )
+    return timedelta(seconds=max(
+        getattr(settings, 'PAYMENT_OUTBOX_LEASE_SECONDS', 300),
+        4 * request_timeout + 30
+    ))
+
+
+def claim_messages(batch_size=10, now=None):
+    """
+    Lease up to ``batch_size`` due messages to this worker. Rows another
+    worker has locked are skipped rather than waited on; SENDING rows
+    whose lease ran out are taken over.
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        messages = list(
+            PaymentOutbox.objects.select_for_update(skip_locked=True).filter(
+                status__in=[PaymentOutbox.Status.PENDING, PaymentOutbox.Status.SENDING],
+                available_at__lte=now
+            ).order_by('available_at')[:batch_size]
+        )
+        PaymentOutbox.objects.filter(pk__in=[message.pk for message in messages]).update(
+            status=PaymentOutbox.Status.SENDING,
+            lease_token=token,
+            available_at=now + lease_duration(),
+            attempts=F('attempts') + 1
+        )
+    for message in messages:
+        message.lease_token = token
+    return messages
+
+
+def _owned(message):
+    """
+    The message's row, as long as this worker's claim on it stands
+    """
+    return PaymentOutbox.objects.filter(
+        pk=message.pk,
+        status=PaymentOutbox.Status.SENDING,
+        lease_token=message.lease_token
+    )
+
+
+def _fail_payment(payment, response_data):
+    with transaction.atomic():
+        payment.status = Payment.PaymentStatus.FAILED
+        payment.gateway_response = response_data or {}
+        payment.save(update_fields=['status', 'gateway_response'])
+        Order.objects.filter(pk=payment.order_id).update(
+            payment_status=Order.PaymentStatus.FAILED, updated_at=timezone.now()
+        )
+        release_reservations(payment.order)
+
+
+def _push(payment):
+    return get_mpesa_client().stk_push(
+        payment.phone_number,
+        int(payment.amount),
+        str(payment.order_id),
+        settings.MPESA_SHORTCODE,
+        settings.MPESA_PASSKEY,
+        get_callback_url()
+    )
+
+
+def process_message(message):
+    """
+    Perform one claimed message. Returns the status it was left in, or
+    None if the claim was lost (cancelled, or taken over by another
+    worker) and nothing was done.
+    """
+    payment = Payment.objects.select_related('order').get(pk=message.payment_id)
+    max_attempts = getattr(settings, 'PAYMENT_OUTBOX_MAX_ATTEMPTS', 5)
+    now = timezone.now()
+
+    if payment.order.status == Order.OrderStatus.CANCELLED:
+        _owned(message).update(
+            status=PaymentOutbox.Status.CANCELLED, lease_token='', processed_at=now
+        )
+        return PaymentOutbox.Status.CANCELLED
+
+    # A fresh lease for this send alone, however long the batch has taken
+    if not _owned(message).update(available_at=now + lease_duration()):
+        logging.warning(f"Outbox message {message.pk} is no longer claimed; not sent")
+        return None
+
+    try:
+        response_data = _push(payment)
+    except Exception as e:
+        # Transport errors are retried with backoff until attempts run out
+        logging.warning(f"STK push for payment {payment.pk} failed: {e}")
+        attempts = message.attempts + 1
+        if attempts < max_attempts:
+            _owned(message).update(
+                status=PaymentOutbox.Status.PENDING,
+                lease_token='',
+                available_at=now + timedelta(seconds=30 * 2 ** attempts),
+                last_error=str(e)
+            )
+            return PaymentOutbox.Status.PENDING
+        response_data = {'error': str(e)}
+
+    if response_data and response_data.get('ResponseCode') == '0':
+        # Recorded even if the claim was lost, so the callback can be matched
+        Payment.objects.filter(pk=payment.pk).update(
+            mpesa_request_id=response_data['CheckoutRequestID']
+        )
+        status = PaymentOutbox.Status.SENT
+    else:
+        logging.error(f"Failed to initiate M-Pesa payment {payment.pk}: {response_data}")
+        status = PaymentOutbox.Status.FAILED
+
+    finished = _owned(message).update(
+        status=status,
+        lease_token='',
+        processed_at=timezone.now(),
+        last_error='' if status == PaymentOutbox.Status.SENT else str(response_data)
+    )
+    if not finished:
+        logging.warning(f"Outbox message {message.pk} was cancelled while being sent")
+        return None
+    if status == PaymentOutbox.Status.FAILED:
+        _fail_payment(payment, response_data)
+    return status
+
+
+def process_outbox(batch_size=10, now=None):
+    """
+    Claim and perform one batch of due messages; returns how many were
+    claimed
+    """
+    messages = claim_messages(batch_size, now)
+    for message in messages:
+        process_message(message)
+    return len(messages)
@@ -0,0 +1,190 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.inventory import reserve_stock
+from orders.models import Order, OrderItem, StockReservation
+from orders.services import cancel_orders
+from payments.checks import check_callback_token
+from payments.models import MpesaCallback, Payment
+from payments.mpesa_utils import get_callback_url
+from products.models import Category, Product
+from users.models import User
+
+
+def callback_data(checkout_request_id, result_code=0, receipt='ABC123XYZ'):
+    callback = {
+        'CheckoutRequestID': checkout_request_id,
+        'ResultCode': result_code,
+    }
+    if result_code == 0:
+        callback['CallbackMetadata'] = {'Item': [
+            {'Name': 'Amount', 'Value': 100.0},
+            {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+            {'Name': 'PhoneNumber', 'Value': 254712345678},
+        ]}
+    return {'Body': {'stkCallback': callback}}
+
+
+@override_settings(MPESA_CALLBACK_TOKEN='callback-secret')
+class MpesaCallbackTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.order = Order.objects.create(user=self.user, total=Decimal('100.00'))
+        self.payment = self.create_payment('ws_CO_1')
+        self.url = reverse('mpesa-callback') + '?token=callback-secret'
+
+    def create_payment(self, checkout_request_id):
+        return Payment.objects.create(
+            order=self.order,
+            amount=Decimal('100.00'),
+            method=Payment.PaymentMethod.MPESA,
+            mpesa_request_id=checkout_request_id
+        )
+
+    def post(self, data):
+        return self.client.post(self.url, data, format='json')
+
+    def test_success_marks_payment_and_order_paid(self):
+        """Test a successful callback settles the payment and the order"""
+        self.assertEqual(self.post(callback_data('ws_CO_1')).status_code, status.HTTP_200_OK)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.PaymentStatus.PAID)
+        self.assertEqual(self.payment.transaction_id, 'ABC123XYZ')
+        self.assertIsNotNone(self.payment.processed_at)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, Order.PaymentStatus.PAID)
+        self.assertEqual(MpesaCallback.objects.get().status, MpesaCallback.Status.PROCESSED)
+
+    def test_failure_marks_payment_failed(self):
+        """Test a cancelled push fails the payment and the order"""
+        self.post(callback_data('ws_CO_1', result_code=1032))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.PaymentStatus.FAILED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, Order.PaymentStatus.FAILED)
+
+    def test_redelivered_callback_is_applied_once(self):
+        """Test a resent callback is acknowledged without touching the payment"""
+        self.post(callback_data('ws_CO_1'))
+        Payment.objects.filter(pk=self.payment.pk).update(gateway_response={})
+
+        # The failed insert and one read; nothing else is touched
+        with self.assertNumQueries(5):
+            response = self.post(callback_data('ws_CO_1', result_code=1032))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.PaymentStatus.PAID)
+        self.assertEqual(self.payment.gateway_response, {})
+
+    def test_reused_receipt_is_duplicate(self):
+        """Test a receipt that already settled a payment is not applied again"""
+        self.create_payment('ws_CO_2')
+        self.post(callback_data('ws_CO_1'))
+        self.post(callback_data('ws_CO_2'))
+
+        second = MpesaCallback.objects.get(checkout_request_id='ws_CO_2')
+        self.assertEqual(second.status, MpesaCallback.Status.DUPLICATE)
+        self.assertEqual(Payment.objects.filter(status=Payment.PaymentStatus.PAID).count(), 1)
+
+    def test_invalid_and_unknown_callbacks(self):
+        """Test bodies without a request ID are rejected and unknown IDs are 404"""
+        self.assertEqual(self.post({'Body': {}}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post(callback_data('ws_CO_unknown'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            MpesaCallback.objects.get().status, MpesaCallback.Status.UNMATCHED
+        )
+
+    @override_settings(MPESA_CALLBACK_ASYNC=True)
+    def test_fast_ack_defers_processing(self):
+        """Test fast-ack mode stores the callback and the command applies it"""
+        with self.assertNumQueries(3):
+            self.assertEqual(self.post(callback_data('ws_CO_1')).status_code, status.HTTP_200_OK)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.PaymentStatus.PENDING)
+
+        out = StringIO()
+        call_command('process_mpesa_callbacks', stdout=out)
+        self.assertIn('Processed 1', out.getvalue())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.PaymentStatus.PAID)
+
+    @override_settings(MPESA_CALLBACK_ASYNC=True)
+    def test_early_callback_matched_later(self):
+        """Test a callback arriving before its request ID is recorded is retried"""
+        self.post(callback_data('ws_CO_early'))
+        call_command('process_mpesa_callbacks', stdout=StringIO())
+        self.assertEqual(MpesaCallback.objects.get().status, MpesaCallback.Status.UNMATCHED)
+
+        Payment.objects.filter(pk=self.payment.pk).update(mpesa_request_id='ws_CO_early')
+        call_command('process_mpesa_callbacks', stdout=StringIO())
+        self.assertEqual(MpesaCallback.objects.get().status, MpesaCallback.Status.PROCESSED)
+
+    def test_callback_without_token_is_refused(self):
+        """Test a forged callback without the shared token changes nothing"""
+        url = reverse('mpesa-callback')
+        for query in ('', '?token=guess'):
+            response = self.client.post(url + query, callback_data('ws_CO_1'), format='json')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.PaymentStatus.PENDING)
+        self.assertFalse(MpesaCallback.objects.exists())
+
+    @override_settings(MPESA_CALLBACK_TOKEN='')
+    def test_unconfigured_token_refuses_everything(self):
+        """Test callbacks are refused while no token is configured"""
+        self.assertEqual(self.post(callback_data('ws_CO_1')).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(MPESA_CALLBACK_TOKEN='')
+    def test_unconfigured_token_fails_system_check(self):
+        """Test a blank token is reported by the system checks instead of passing silently"""
+        self.assertEqual(
+            [error.id for error in check_callback_token(None)], ['payments.E001']
+        )
+        with override_settings(MPESA_CALLBACK_TOKEN='callback-secret'):
+            self.assertEqual(check_callback_token(None), [])
+
+    @override_settings(MPESA_CALLBACK_URL='https://example.com/cb/?source=daraja')
+    def test_callback_url_carries_token(self):
+        """Test the URL given to Daraja includes the token"""
+        self.assertEqual(
+            get_callback_url(), 'https://example.com/cb/?source=daraja&token=callback-secret'
+        )
+
+    def test_paid_after_cancel_does_not_take_stock(self):
+        """Test a late successful callback on a cancelled order flags a refund instead"""
+        category = Category.objects.create(name='Electronics', slug='electronics')
+        product = Product.objects.create(
+            name='Phone', description='Description', category=category,
+            sku='PHONE', price=Decimal('100.00'), quantity=1, status='active'
+        )
+        item = OrderItem(order=self.order, product=product, quantity=1, price=product.price)
+        item.clean()
+        reserve_stock(self.order, [item])
+        cancel_orders(Order.objects.filter(pk=self.order.pk))
+
+        self.assertEqual(self.post(callback_data('ws_CO_1')).status_code, status.HTTP_200_OK)
+
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 1)
+        self.assertFalse(self.order.stock_reservations.exclude(
+            status=StockReservation.Status.RELEASED
+        ).exists())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.OrderStatus.CANCELLED)
+        self.assertEqual(self.order.payment_status, Order.PaymentStatus.PAID)
+        self.assertIn('refund due', self.order.admin_notes)
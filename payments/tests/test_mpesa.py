@@ -1,4 +1,5 @@
 import pytest
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -11,6 +12,7 @@ from payments.models import Payment
 
 User = get_user_model()
 
+@override_settings(MPESA_CALLBACK_TOKEN='callback-secret')
 class MpesaPaymentAPITests(APITestCase):
 
     def setUp(self):
@@ -18,7 +20,7 @@ class MpesaPaymentAPITests(APITestCase):
         self.order = Order.objects.create(user=self.user, total=Decimal('100.00'))
         self.client.force_authenticate(user=self.user)
         self.mpesa_payment_url = reverse('mpesa-payment')
-        self.mpesa_callback_url = reverse('mpesa-callback')
+        self.mpesa_callback_url = reverse('mpesa-callback') + '?token=callback-secret'
 
     @patch('payments.mpesa_utils.initiate_stk_push')
     def test_initiate_mpesa_payment_success(self, mock_initiate_stk_push):
@@ -0,0 +1,67 @@
+import threading
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from payments.mpesa_utils import MpesaClient
+
+
+def json_response(data, status_code=200):
+    return Mock(status_code=status_code, json=Mock(return_value=data))
+
+
+class MpesaClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.client = MpesaClient('https://sandbox.example.com/', 'key', 'secret', timeout=(1, 2))
+        self.client.session.get = Mock(
+            return_value=json_response({'access_token': 'token-1', 'expires_in': '3599'})
+        )
+        self.client.session.post = Mock(
+            return_value=json_response({'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'})
+        )
+
+    def push(self):
+        return self.client.stk_push('254712345678', 10, 'order-1', '174379', 'pass', 'https://e.com/cb')
+
+    def test_token_is_reused_between_pushes(self):
+        """Test consecutive pushes fetch the OAuth token once"""
+        self.assertEqual(self.push()['CheckoutRequestID'], 'ws_CO_1')
+        self.push()
+        self.client.session.get.assert_called_once()
+        self.assertEqual(self.client.session.post.call_count, 2)
+        self.assertEqual(self.client.session.post.call_args.kwargs['timeout'], (1, 2))
+        self.assertEqual(
+            self.client.session.post.call_args.kwargs['headers']['Authorization'], 'Bearer token-1'
+        )
+
+    def test_token_refreshed_before_expiry(self):
+        """Test a token inside the refresh margin is fetched again"""
+        self.client.get_access_token()
+        with patch('payments.mpesa_utils.time.monotonic', return_value=10 ** 9):
+            self.client.get_access_token()
+        self.assertEqual(self.client.session.get.call_count, 2)
+
+    def test_token_fetched_once_across_threads(self):
+        """Test concurrent callers share a single token request"""
+        threads = [threading.Thread(target=self.client.get_access_token) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.client.session.get.assert_called_once()
+
+    def test_rejected_token_is_replaced(self):
+        """Test a 401 drops the cached token and retries the push once"""
+        self.client.session.post.side_effect = [
+            json_response({'errorCode': '404.001.03'}, status_code=401),
+            json_response({'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_2'}),
+        ]
+        self.assertEqual(self.push()['CheckoutRequestID'], 'ws_CO_2')
+        self.assertEqual(self.client.session.get.call_count, 2)
+
+    def test_no_token(self):
+        """Test a push without credentials returns None instead of posting"""
+        self.client.session.get.return_value = json_response({}, status_code=400)
+        self.assertIsNone(self.push())
+        self.client.session.post.assert_not_called()
@@ -0,0 +1,165 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from orders.models import Cart, CartItem, Order
+from orders.services import cancel_orders
+from payments.models import Payment, PaymentOutbox
+from payments.mpesa_utils import MpesaClient
+from payments.outbox import (
+    claim_messages, lease_duration, process_message, process_outbox
+)
+from products.models import Category, Product
+from users.models import User
+
+CHECKOUT_DATA = {
+    'payment_method': 'mpesa',
+    'mpesa_phone_number': '254712345678',
+    'shipping_address': {
+        'first_name': 'Test',
+        'last_name': 'User',
+        'address_line_1': '123 Main St',
+        'city': 'Nairobi',
+        'state': 'Nairobi',
+        'postal_code': '00100',
+        'country': 'KE',
+        'phone': '+254712345678',
+        'email': 'test@example.com'
+    },
+    'use_shipping_as_billing': True
+}
+
+
+class PaymentOutboxTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Phone', description='Description', category=category,
+            sku='PHONE', price=Decimal('10.00'), quantity=5, status='active'
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+
+    def checkout(self):
+        with patch.object(MpesaClient, 'stk_push') as push:
+            response = self.client.post(reverse('cart-checkout'), CHECKOUT_DATA, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        push.assert_not_called()
+        return Payment.objects.get(order__number=response.data['number'])
+
+    def test_checkout_queues_stk_push(self):
+        """Test M-Pesa checkout records an outbox message instead of calling the gateway"""
+        payment = self.checkout()
+        message = payment.outbox_messages.get()
+        self.assertEqual(message.action, PaymentOutbox.Action.STK_PUSH)
+        self.assertEqual(message.status, PaymentOutbox.Status.PENDING)
+        self.assertIsNone(payment.mpesa_request_id)
+
+    @patch.object(MpesaClient, 'stk_push')
+    def test_worker_records_request_id(self, push):
+        """Test the worker performs the push and stores the checkout request ID"""
+        payment = self.checkout()
+        push.return_value = {'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'}
+
+        out = StringIO()
+        call_command('process_payment_outbox', stdout=out)
+        self.assertIn('Processed 1', out.getvalue())
+        push.assert_called_once()
+        self.assertEqual(push.call_args.args[:3], ('254712345678', 20, str(payment.order_id)))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.mpesa_request_id, 'ws_CO_1')
+        self.assertEqual(payment.outbox_messages.get().status, PaymentOutbox.Status.SENT)
+        self.assertEqual(process_outbox(), 0)
+
+    @patch.object(MpesaClient, 'stk_push')
+    def test_rejected_push_fails_payment(self, push):
+        """Test a gateway rejection fails the payment and releases the stock"""
+        payment = self.checkout()
+        push.return_value = {'ResponseCode': '1', 'errorMessage': 'Invalid credentials'}
+        process_outbox()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.PaymentStatus.FAILED)
+        self.assertEqual(payment.order.payment_status, Order.PaymentStatus.FAILED)
+        self.assertEqual(payment.outbox_messages.get().status, PaymentOutbox.Status.FAILED)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+
+    @patch.object(MpesaClient, 'stk_push')
+    def test_transport_error_is_retried(self, push):
+        """Test a connection error leaves the message queued for a later attempt"""
+        payment = self.checkout()
+        push.side_effect = ConnectionError('timed out')
+        process_outbox()
+
+        message = payment.outbox_messages.get()
+        self.assertEqual(message.status, PaymentOutbox.Status.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(process_outbox(), 0)
+
+        push.side_effect = None
+        push.return_value = {'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_2'}
+        self.assertEqual(process_outbox(now=timezone.now() + timedelta(hours=1)), 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.mpesa_request_id, 'ws_CO_2')
+
+    @patch.object(MpesaClient, 'stk_push')
+    def test_cancelled_order_is_not_pushed(self, push):
+        """Test cancelling an order cancels its queued STK push"""
+        payment = self.checkout()
+        cancel_orders(Order.objects.filter(pk=payment.order_id))
+
+        self.assertEqual(payment.outbox_messages.get().status, PaymentOutbox.Status.CANCELLED)
+        self.assertEqual(process_outbox(), 0)
+        push.assert_not_called()
+
+    @patch.object(MpesaClient, 'stk_push')
+    def test_claimed_message_of_cancelled_order_is_dropped(self, push):
+        """Test the worker drops a message claimed before its order was cancelled"""
+        payment = self.checkout()
+        message = claim_messages()[0]
+        Order.objects.filter(pk=payment.order_id).update(status=Order.OrderStatus.CANCELLED)
+
+        self.assertEqual(process_message(message), PaymentOutbox.Status.CANCELLED)
+        push.assert_not_called()
+        self.assertEqual(payment.outbox_messages.get().status, PaymentOutbox.Status.CANCELLED)
+
+    @patch.object(MpesaClient, 'stk_push')
+    def test_claimed_message_is_not_sent_twice(self, push):
+        """Test a message taken over after its lease ran out is sent only by the new owner"""
+        self.checkout()
+        push.return_value = {'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_3'}
+        stale = claim_messages()[0]
+        self.assertEqual(claim_messages(), [])
+
+        later = timezone.now() + lease_duration() + timedelta(seconds=1)
+        current = claim_messages(now=later)[0]
+        self.assertIsNone(process_message(stale))
+        push.assert_not_called()
+
+        self.assertEqual(process_message(current), PaymentOutbox.Status.SENT)
+        push.assert_called_once()
+
+    @override_settings(PAYMENT_OUTBOX_LEASE_SECONDS=10, MPESA_CONNECT_TIMEOUT=5,
+                       MPESA_READ_TIMEOUT=30)
+    def test_lease_outlasts_a_push(self):
+        """Test the lease covers the token fetch and POST, each retried after a 401"""
+        self.assertGreater(lease_duration(), timedelta(seconds=4 * 35))
@@ -1,17 +1,19 @@
 
+import requests
+from django.conf import settings
 from rest_framework import viewsets, views, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from django.db.models import Count, Prefetch
-from .models import Payment
+from .models import Payment, MpesaCallback
 from orders.models import Order
 from .serializers import PaymentSerializer, MpesaPaymentSerializer
 from .filters import PaymentFilter
 from .pagination import OptimizedPagination
-from .mpesa_utils import initiate_stk_push
-from decouple import config
+from .mpesa_utils import get_callback_url, get_mpesa_client
+from .callbacks import ingest_callback, is_trusted_callback, process_callback
 
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.select_related('order')
@@ -59,19 +61,18 @@ class MpesaPaymentView(views.APIView):
                 status=Payment.PaymentStatus.PENDING,
             )
 
-            # Initiate STK push
-            shortcode = config('MPESA_SHORTCODE')
-            passkey = config('MPESA_PASSKEY')
-            callback_url = config('CALLBACK_URL')
-
-            response_data = initiate_stk_push(
-                phone_number,
-                amount,
-                str(order.id),
-                shortcode,
-                passkey,
-                callback_url
-            )
+            # Initiate STK push over the shared, pooled client
+            try:
+                response_data = get_mpesa_client().stk_push(
+                    phone_number,
+                    amount,
+                    str(order.id),
+                    settings.MPESA_SHORTCODE,
+                    settings.MPESA_PASSKEY,
+                    get_callback_url()
+                )
+            except requests.RequestException as e:
+                response_data = {"error": str(e)}
 
             if response_data and response_data.get('ResponseCode') == '0':
                 payment.mpesa_request_id = response_data['CheckoutRequestID']
@@ -92,37 +93,29 @@ class MpesaPaymentView(views.APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class MpesaCallbackView(views.APIView):
-    def post(self, request, *args, **kwargs):
-        data = request.data
-        checkout_request_id = data.get('Body', {}).get('stkCallback', {}).get('CheckoutRequestID')
+    # Safaricom calls this without credentials; the token in the
+    # callback URL is checked instead
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
-        if not checkout_request_id:
-            return Response({"error": "Invalid callback data"}, status=status.HTTP_400_BAD_REQUEST)
+    def post(self, request, *args, **kwargs):
+        if not is_trusted_callback(request.query_params.get('token')):
+            return Response({"error": "Invalid callback token"}, status=status.HTTP_403_FORBIDDEN)
 
         try:
-            payment = Payment.objects.get(mpesa_request_id=checkout_request_id)
-        except Payment.DoesNotExist:
-            return Response({"error": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        result_code = data.get('Body', {}).get('stkCallback', {}).get('ResultCode')
-
-        payment.gateway_response = data
-
-        if result_code == 0:
-            payment.status = Payment.PaymentStatus.PAID
-            payment.order.payment_status = Order.PaymentStatus.PAID
+            callback, created = ingest_callback(request.data)
+        except ValueError:
+            return Response({"error": "Invalid callback data"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Extract transaction ID
-            metadata = data.get('Body', {}).get('stkCallback', {}).get('CallbackMetadata', {}).get('Item', [])
-            for item in metadata:
-                if item.get('Name') == 'MpesaReceiptNumber':
-                    payment.transaction_id = item.get('Value')
-                    break
-        else:
-            payment.status = Payment.PaymentStatus.FAILED
-            payment.order.payment_status = Order.PaymentStatus.FAILED
+        # Fast-ack: the callback is stored, process_mpesa_callbacks applies it
+        if getattr(settings, 'MPESA_CALLBACK_ASYNC', False):
+            return Response(status=status.HTTP_200_OK)
 
-        payment.save()
-        payment.order.save()
+        if created or callback.status in (
+            MpesaCallback.Status.RECEIVED, MpesaCallback.Status.UNMATCHED
+        ):
+            callback = process_callback(callback)
+        if callback.status == MpesaCallback.Status.UNMATCHED:
+            return Response({"error": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response(status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(status=status.HTTP_200_OK)
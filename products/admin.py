@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.http import urlencode
-from django.db.models import Avg, Count, Sum
+from django.db.models import Count
 from django.contrib.admin import SimpleListFilter
 from django import forms
 from django.db import models
@@ -14,6 +14,7 @@ from .models import (
     ProductAttributeValue, ProductVariantAttribute,
     ProductReview, ProductSpecification
 )
+from .services import set_reviews_approval
 
 class InventoryFilter(SimpleListFilter):
     title = 'inventory status'
@@ -246,6 +247,7 @@ class ProductAdmin(admin.ModelAdmin):
         'inventory_status',
         'discount_percentage',
         'average_rating',
+        'review_count',
         'primary_image_preview',
     )
     fieldsets = (
@@ -295,6 +297,7 @@ class ProductAdmin(admin.ModelAdmin):
                 'updated_at',
                 'created_by',
                 'average_rating',
+                'review_count',
             )
         }),
     )
@@ -310,13 +313,11 @@ class ProductAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.annotate(
-            _average_rating=Avg('reviews__rating')
-        ).select_related('category', 'brand')
+        return queryset.select_related('category', 'brand')
 
     def rating(self, obj):
-        return obj._average_rating or '-'
-    rating.admin_order_field = '_average_rating'
+        return obj.rating_average if obj.review_count else '-'
+    rating.admin_order_field = 'rating_average'
     rating.short_description = 'Rating'
 
     def price_display(self, obj):
@@ -364,7 +365,7 @@ class ProductAdmin(admin.ModelAdmin):
     brand_link.admin_order_field = 'brand__name'
 
     def primary_image_preview(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        primary_image = obj.primary_image
         if primary_image:
             return format_html(
                 '<img src="{}" style="max-height: 200px; max-width: 200px;" />',
@@ -451,7 +452,7 @@ class ProductReviewAdmin(admin.ModelAdmin):
 
     @admin.action(description='Approve selected reviews')
     def approve_reviews(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        updated = set_reviews_approval(queryset, approved=True)
         self.message_user(
             request,
             f'{updated} reviews were successfully approved.'
@@ -459,7 +460,7 @@ class ProductReviewAdmin(admin.ModelAdmin):
 
     @admin.action(description='Disapprove selected reviews')
     def disapprove_reviews(self, request, queryset):
-        updated = queryset.update(is_approved=False)
+        updated = set_reviews_approval(queryset, approved=False)
         self.message_user(
             request,
             f'{updated} reviews were successfully disapproved.'
@@ -0,0 +1,128 @@
+"""
+Response cache for anonymous catalog reads.
+
+Responses are keyed on host, path, normalized query parameters and the
+current version of every model the view depends on. Saving or deleting one
+of those models bumps its version, so stale entries are never read again
+and simply age out; ``CATALOG_CACHE_TIMEOUT`` is only a backstop.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .conditional import conditional_response
+
+VERSION_KEY = 'catalog:version:{}'
+RESPONSE_KEY = 'catalog:response:{}'
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def get_versions(models):
+    """
+    Current version of each model, read in one cache round trip
+    """
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # Start from the clock rather than 1 so an evicted counter can never
+        # come back to a version that already has responses stored
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    """
+    Invalidate cached responses built from ``model``. The bump runs after
+    the surrounding transaction commits, so a concurrent request cannot
+    cache pre-commit rows under the new version.
+    """
+    def bump():
+        key = _version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+def _count(key):
+    if not cache.add(key, 1, None):
+        cache.incr(key)
+
+
+def get_stats():
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': stats.get(HITS_KEY, 0),
+        'misses': stats.get(MISSES_KEY, 0),
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+class CatalogCacheMixin:
+    """
+    Serve ``list`` and ``retrieve`` for anonymous users from the cache.
+    ``cache_models`` lists every model whose changes affect the response.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        parts = [
+            request.get_host(), request.path, repr(params),
+            repr(get_versions(self.cache_models)),
+        ]
+        digest = hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+        return RESPONSE_KEY.format(digest)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            _count(HITS_KEY)
+            data, headers = cached
+            # Validators are stored with the body, so conditional requests
+            # are answered without touching the database either
+            not_modified = conditional_response(request, headers.get('ETag'))
+            if not_modified is not None:
+                return not_modified
+            return Response(data, headers={**headers, 'X-Cache': 'HIT'})
+
+        _count(MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {'ETag': response['ETag']} if response.has_header('ETag') else {}
+            cache.set(
+                key, (response.data, headers),
+                getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+            )
+        response['X-Cache'] = 'MISS'
+        return response
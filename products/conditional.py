@@ -0,0 +1,125 @@
+"""
+Conditional GET (ETag) for list and retrieve endpoints.
+
+The ETag comes from a single aggregate query over the rows the response is
+built from: the looked-up object, or the requested page of a list plus the
+count the page reports. It covers ``max(updated_at)`` and counts, so
+deletions are seen too. A list page also hashes its primary keys in
+order, so a row shifted onto the page by a deletion before it changes the
+ETag even while a cached count stays the same. To-many relations are aggregated with one
+correlated subquery each rather than joined, so the cost grows with the
+number of rows, not with the product of their related rows. A 304 is
+answered without loading or serializing anything.
+
+No Last-Modified is sent: a deleted related row or a changed rating moves
+the ETag but no timestamp, so If-Modified-Since would answer 304 wrongly.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+def related_aggregates(queryset, parent_field, **aggregates):
+    """
+    Aggregates over the ``queryset`` rows pointing at each row of the
+    outer queryset through ``parent_field``, computed per row with a
+    correlated subquery and rolled up: counts are summed, anything else
+    takes the maximum.
+    """
+    rows = queryset.filter(**{parent_field: OuterRef('pk')}).order_by().values(parent_field)
+    return {
+        name: (Sum if isinstance(aggregate, Count) else Max)(
+            Subquery(rows.annotate(_value=aggregate).values('_value'))
+        )
+        for name, aggregate in aggregates.items()
+    }
+
+
+def get_validators(request, queryset, aggregates, count=None, page=None):
+    """
+    ETag for ``queryset``, or None when it is empty. ``count`` is the
+    total a paginated list reports and ``page`` the primary keys it
+    shows, in order, if any.
+    """
+    values = queryset.order_by().aggregate(
+        _count=Count('pk'), **aggregates
+    )
+    if not values['_count']:
+        return None
+
+    # Responses differ per URL and, for scoped querysets, per user
+    parts = [
+        request.get_full_path(), str(request.user.pk),
+        repr(sorted(values.items())), repr(count), repr(page),
+    ]
+    return quote_etag(hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest())
+
+
+def conditional_response(request, etag, response=None):
+    """
+    The 304/412 response for this ETag, else ``response``
+    """
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+class ConditionalGetMixin:
+    """
+    Answer ``list`` and ``retrieve`` with 304 Not Modified when the
+    client's ETag still matches.
+
+    ``get_conditional_aggregates()`` returns the extra aggregates (for
+    related rows rendered in the response) added to
+    ``max(updated_at)`` and the row count. Use ``related_aggregates`` for
+    to-many relations.
+    """
+
+    def get_conditional_aggregates(self):
+        return {'_updated_at': Max('updated_at')}
+
+    def get_conditional_queryset(self):
+        """
+        The rows the response is built from and, for a paginated list,
+        the count it reports and the primary keys of the page in order
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        count = page = None
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            rows = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).values('pk')
+        elif self.paginator is None:
+            rows = queryset.values('pk')
+        else:
+            # Only the requested page, so a list never scans the whole result
+            rows, count = self.paginator.get_page_window(queryset, self.request, view=self)
+            rows = page = [row['pk'] for row in rows]
+        # Aggregated without the view's own annotations, which may group rows
+        return queryset.model._base_manager.filter(pk__in=rows), count, page
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(super().retrieve, request, *args, **kwargs)
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        if request.method != 'GET':
+            return handler(request, *args, **kwargs)
+
+        queryset, count, page = self.get_conditional_queryset()
+        etag = get_validators(
+            request, queryset, self.get_conditional_aggregates(), count, page
+        )
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
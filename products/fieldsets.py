@@ -0,0 +1,123 @@
+"""
+Sparse fieldsets: ``?fields=a,b`` keeps only the listed top-level fields,
+``?omit=a,b`` drops fields. Omitted nested fields also drop the
+``select_related``/``Prefetch`` lookups that only they needed.
+``?expand=a,b`` asks views with a compact default representation for the
+full nested one.
+"""
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+EXPAND_PARAM = 'expand'
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_sparse_fieldset(request):
+    """
+    (fields, omit) requested by the client; ``fields`` is None when every
+    field was asked for. Writes always use the full serializer.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    fields = request.query_params.get(FIELDS_PARAM)
+    return (
+        _split(fields) if fields else None,
+        _split(request.query_params.get(OMIT_PARAM, ''))
+    )
+
+
+def is_field_requested(name, fields, omit):
+    return name not in omit and (fields is None or name in fields)
+
+
+def is_expanded(request, name):
+    """
+    Whether the client asked for the full representation of ``name``
+    """
+    if request is None:
+        return False
+    return name in _split(request.query_params.get(EXPAND_PARAM, ''))
+
+
+def _select_related_lookups(select_related, prefix=''):
+    lookups = []
+    for name, nested in select_related.items():
+        lookups.append(prefix + name)
+        lookups.extend(_select_related_lookups(nested, f'{prefix}{name}__'))
+    return lookups
+
+
+def prune_related_lookups(queryset, dropped):
+    """
+    Remove ``dropped`` (and anything below them) from the queryset's
+    select_related and prefetch_related lookups
+    """
+    if not dropped:
+        return queryset
+
+    def is_dropped(lookup):
+        return any(lookup == name or lookup.startswith(f'{name}__') for name in dropped)
+
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if not is_dropped(
+            lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+        )
+    ]
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetches)
+
+    if isinstance(queryset.query.select_related, dict):
+        selected = [
+            lookup for lookup in _select_related_lookups(queryset.query.select_related)
+            if not is_dropped(lookup)
+        ]
+        queryset = queryset.select_related(None)
+        if selected:
+            queryset = queryset.select_related(*selected)
+    return queryset
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin applying ``?fields=``/``?omit=`` to the top-level
+    serializer. Nested serializers are built without the request context,
+    so they always render in full.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, omit = get_sparse_fieldset(self.context.get('request'))
+        if fields is None and not omit:
+            return
+        for name in list(self.fields):
+            if not is_field_requested(name, fields, omit):
+                self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Viewset mixin that drops related lookups no requested field needs.
+    ``sparse_field_lookups`` maps serializer field names to the
+    select_related/prefetch lookups used to render them.
+    """
+    sparse_field_lookups = {}
+
+    def get_queryset(self):
+        return self.prune_sparse_lookups(super().get_queryset())
+
+    def prune_sparse_lookups(self, queryset):
+        fields, omit = get_sparse_fieldset(self.request)
+        if fields is None and not omit:
+            return queryset
+
+        needed, mapped = set(), set()
+        for name, lookups in self.sparse_field_lookups.items():
+            mapped.update(lookups)
+            if is_field_requested(name, fields, omit):
+                needed.update(lookups)
+        return prune_related_lookups(queryset, mapped - needed)
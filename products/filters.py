@@ -1,11 +1,8 @@
 import django_filters
 from django.db.models import Q
+from rest_framework.filters import OrderingFilter
 from .models import Product, Category, ProductVariant
-
-
-import django_filters
-from django.db.models import Q
-from .models import Product, Category, ProductVariant
+from .search import search_products, icontains_search
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -16,6 +13,11 @@ class ProductFilter(django_filters.FilterSet):
     status = django_filters.CharFilter(field_name='status')
     featured = django_filters.BooleanFilter(field_name='is_featured')
     search = django_filters.CharFilter(method='custom_search')
+    q = django_filters.CharFilter(
+        method='full_text_search',
+        label='Full-text search',
+        help_text='Relevance-ranked search over name, SKU, barcode, category, brand and description'
+    )
     include_subcategories = django_filters.BooleanFilter(
         method='filter_include_subcategories',
         label='Include subcategories',
@@ -28,14 +30,10 @@ class ProductFilter(django_filters.FilterSet):
         fields = []
 
     def custom_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(name__icontains=value) |
-            Q(description__icontains=value) |
-            Q(sku__icontains=value) |
-            Q(barcode__icontains=value) |
-            Q(category__name__icontains=value) |
-            Q(brand__name__icontains=value)
-        )
+        return icontains_search(queryset, value)
+
+    def full_text_search(self, queryset, name, value):
+        return search_products(queryset, value)
 
     def filter_by_category(self, queryset, name, value):
         """
@@ -46,21 +44,22 @@ class ProductFilter(django_filters.FilterSet):
             return queryset
 
         category_slugs = [slug.strip() for slug in value.split(',') if slug.strip()]
-        categories = Category.objects.filter(slug__in=category_slugs)
+        categories = list(
+            Category.objects.filter(slug__in=category_slugs).only('id', 'path')
+        )
 
-        if not categories.exists():
+        if not categories:
             return queryset.none()
 
         include_subcategories = self.data.get('include_subcategories', 'true').lower() == 'true'
 
+        if not include_subcategories:
+            return queryset.filter(category__in=categories)
+
+        # Match whole subtrees through the indexed materialized path
         category_filters = Q()
         for category in categories:
-            if include_subcategories:
-                # Get all descendant categories including self
-                descendants = category.get_descendants(include_self=True)
-                category_filters |= Q(category__in=descendants)
-            else:
-                category_filters |= Q(category=category)
+            category_filters |= Q(category__path__startswith=category.path)
 
         return queryset.filter(category_filters)
 
@@ -72,6 +71,16 @@ class ProductFilter(django_filters.FilterSet):
         return queryset
 
 
+class SearchRankOrderingFilter(OrderingFilter):
+    """
+    Orders ?q= results by relevance unless the client asks for an ordering
+    """
+    def get_default_ordering(self, view):
+        if view.request.query_params.get('q', '').strip():
+            return ['-search_rank']
+        return super().get_default_ordering(view)
+
+
 class CategoryFilter(django_filters.FilterSet):
     is_active = django_filters.BooleanFilter(field_name='is_active')
     parent = django_filters.CharFilter(field_name='parent__slug')
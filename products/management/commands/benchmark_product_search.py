@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from products.models import Product
+from products.search import icontains_search, search_products
+
+
+class Command(BaseCommand):
+    help = 'Compare the full-text product search with the icontains search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='+', help='Search terms to benchmark')
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Times each search is run (default: 20)'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=24,
+            help='Rows fetched per search, like a listing page (default: 24)'
+        )
+
+    def _time(self, search, term, iterations, page_size):
+        queryset = Product.objects.filter(status=Product.ProductStatus.ACTIVE)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            results = search(queryset, term)
+            count = results.count()
+            list(results.values_list('pk', flat=True)[:page_size])
+        elapsed = (time.perf_counter() - started) / iterations
+        return elapsed * 1000, count
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        page_size = options['page_size']
+        self.stdout.write(
+            f'Backend: {connection.vendor}, '
+            f'{Product.objects.count()} products, {iterations} iterations'
+        )
+        self.stdout.write(f"{'term':<24}{'icontains ms':>14}{'hits':>8}{'ranked ms':>12}{'hits':>8}")
+
+        for term in options['terms']:
+            icontains_ms, icontains_hits = self._time(
+                icontains_search, term, iterations, page_size
+            )
+            ranked_ms, ranked_hits = self._time(
+                search_products, term, iterations, page_size
+            )
+            self.stdout.write(
+                f'{term:<24}{icontains_ms:>14.2f}{icontains_hits:>8}'
+                f'{ranked_ms:>12.2f}{ranked_hits:>8}'
+            )
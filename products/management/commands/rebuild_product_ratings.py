@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from products.services import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized product rating aggregates from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            action='append',
+            dest='slugs',
+            help='Only rebuild the product with this slug (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['slugs']:
+            products = products.filter(slug__in=options['slugs'])
+
+        rebuilt = rebuild_rating_aggregates(products)
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt rating aggregates for {rebuilt} products.')
+        )
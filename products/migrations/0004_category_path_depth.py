@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:56
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    level = list(Category.objects.filter(parent__isnull=True))
+    parent_paths = {}
+    depth = 0
+    while level:
+        for category in level:
+            category.path = f"{parent_paths.get(category.parent_id, '')}{category.pk}/"
+            category.depth = depth
+            parent_paths[category.pk] = category.path
+        Category.objects.bulk_update(level, ['path', 'depth'])
+        level = list(Category.objects.filter(parent_id__in=[c.pk for c in level]))
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_alter_brand_logo_alter_productimage_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='depth'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='path'),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:59
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductReview = apps.get_model('products', 'ProductReview')
+    totals = {}
+    rows = ProductReview.objects.filter(is_approved=True).values(
+        'product_id', 'rating'
+    ).annotate(total=models.Count('id')).order_by()
+    for row in rows:
+        product = totals.setdefault(row['product_id'], {'review_count': 0, 'rating_sum': 0})
+        product[f"rating_{row['rating']}_count"] = row['total']
+        product['review_count'] += row['total']
+        product['rating_sum'] += row['rating'] * row['total']
+    for product_id, values in totals.items():
+        values['rating_average'] = round(values['rating_sum'] / values['review_count'], 2)
+        Product.objects.filter(pk=product_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_category_path_depth'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='1 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='2 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='3 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='4 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='5 star reviews'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_average',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=3, verbose_name='rating average'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='rating sum'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='review count'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating_average'], name='products_pr_rating__5f951b_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:03
+
+import django.contrib.postgres.search
+from django.db import migrations, OperationalError
+
+POSTGRES_INDEX = """
+CREATE INDEX IF NOT EXISTS products_product_search_vector_gin
+    ON products_product USING gin (search_vector);
+UPDATE products_product p SET search_vector =
+    setweight(to_tsvector('english',
+        coalesce(p.name, '') || ' ' || coalesce(p.sku, '') || ' ' || coalesce(p.barcode, '')), 'A') ||
+    setweight(to_tsvector('english',
+        coalesce((SELECT name FROM products_category WHERE id = p.category_id), '') || ' ' ||
+        coalesce((SELECT name FROM products_brand WHERE id = p.brand_id), '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(p.description, '')), 'C');
+"""
+
+SQLITE_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5(
+    name, sku, barcode, category, brand, description,
+    tokenize='porter unicode61'
+)
+"""
+
+SQLITE_FTS_BACKFILL = """
+INSERT INTO products_product_fts (rowid, name, sku, barcode, category, brand, description)
+SELECT p.id, coalesce(p.name, ''), coalesce(p.sku, ''), coalesce(p.barcode, ''),
+       coalesce(c.name, ''), coalesce(b.name, ''), coalesce(p.description, '')
+FROM products_product p
+LEFT JOIN products_category c ON c.id = p.category_id
+LEFT JOIN products_brand b ON b.id = p.brand_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_INDEX)
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_FTS_TABLE)
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains
+            return
+        schema_editor.execute(SQLITE_FTS_BACKFILL)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS products_product_search_vector_gin')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS products_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:50
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+def rename_search_index(apps, schema_editor):
+    # 0006 created the index with raw SQL under a name Django does not allow
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER INDEX IF EXISTS products_product_search_vector_gin '
+            'RENAME TO product_search_vector_gin'
+        )
+
+
+def restore_search_index_name(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER INDEX IF EXISTS product_search_vector_gin '
+            'RENAME TO products_product_search_vector_gin'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(rename_search_index, restore_search_index_name),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='product',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=['search_vector'], name='product_search_vector_gin'
+                    ),
+                ),
+            ],
+        ),
+    ]
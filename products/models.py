@@ -1,23 +1,38 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
-from django.db.models import Q, F, Avg
+from django.db import transaction
+from django.db.models import Q, F, Value, Prefetch
+from django.db.models.functions import Concat, Greatest, Substr
 from django.utils import timezone
 from django.conf import settings
 from decimal import Decimal
 
+from ecommerce.tracking import DirtyFieldsMixin
+from .cache import bump_version
+
 User = get_user_model()
 
 if not settings.DEBUG:
     from cloudinary.models import CloudinaryField
 
-class Category(models.Model):
+class Category(DirtyFieldsMixin, models.Model):
     """
-    Hierarchical category model for product classification
+    Hierarchical category model for product classification.
+
+    The tree is indexed with a materialized path of ancestor ids
+    (e.g. ``"1/5/12/"``) plus a depth, maintained on save, so subtree and
+    ancestor lookups are single indexed queries instead of parent walks.
     """
+    PATH_SEPARATOR = '/'
+    # Renames re-index the category's products
+    tracked_fields = ['name']
+
     name = models.CharField(_('name'), max_length=100, unique=True)
     slug = models.SlugField(_('slug'), max_length=100, unique=True)
     parent = models.ForeignKey(
@@ -27,6 +42,15 @@ class Category(models.Model):
         blank=True,
         related_name='children'
     )
+    path = models.CharField(
+        _('path'),
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True
+    )
+    depth = models.PositiveSmallIntegerField(_('depth'), default=0, editable=False)
     description = models.TextField(_('description'), blank=True)
     is_active = models.BooleanField(_('is active'), default=True)
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
@@ -50,23 +74,105 @@ class Category(models.Model):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        self._update_tree_path()
+
+    def clean(self):
+        if self.parent_id and self.pk and self.path and \
+                self.parent.path.startswith(self.path):
+            raise ValidationError(
+                _('A category cannot be moved under itself or its descendants.')
+            )
+
+    def _update_tree_path(self):
+        """
+        Recompute path/depth after a save and re-root the subtree if moved
+        """
+        parent_path = self.parent.path if self.parent_id else ''
+        new_path = f"{parent_path}{self.pk}{self.PATH_SEPARATOR}"
+        if new_path == self.path:
+            return
+
+        old_path, old_depth = self.path, self.depth
+        self.path = new_path
+        self.depth = new_path.count(self.PATH_SEPARATOR) - 1
+        Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+        if old_path:
+            # Rewrite the prefix of every descendant in one UPDATE
+            Category.objects.filter(
+                path__startswith=old_path
+            ).exclude(pk=self.pk).update(
+                path=Concat(
+                    Value(new_path),
+                    Substr('path', len(old_path) + 1),
+                    output_field=models.CharField()
+                ),
+                depth=F('depth') + (self.depth - old_depth)
+            )
+
+    def get_ancestor_ids(self):
+        """
+        Returns ancestor ids from the root down, read from the path
+        """
+        return [int(pk) for pk in self.path.split(self.PATH_SEPARATOR)[:-2]]
+
+    def get_ancestors(self, include_self=False):
+        ids = self.get_ancestor_ids()
+        if include_self:
+            ids.append(self.pk)
+        return Category.objects.filter(pk__in=ids).order_by('depth')
+
+    def get_descendants(self, include_self=False):
+        if not self.path:
+            return Category.objects.none()
+        queryset = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
 
     def get_full_path(self):
         """
         Returns the full hierarchical path of the category
         """
-        path = [self.name]
-        parent = self.parent
-        while parent is not None:
-            path.append(parent.name)
-            parent = parent.parent
-        return ' > '.join(reversed(path))
+        names = list(
+            self.get_ancestors().values_list('name', flat=True)
+        ) if self.depth else []
+        names.append(self.name)
+        return ' > '.join(names)
+
+    @property
+    def full_path(self):
+        if not hasattr(self, '_full_path'):
+            self._full_path = self.get_full_path()
+        return self._full_path
+
+    @classmethod
+    def prefetch_full_paths(cls, categories):
+        """
+        Resolve ``full_path`` for many categories with a single query
+        """
+        categories = list(categories)
+        ancestor_ids = {
+            pk for category in categories for pk in category.get_ancestor_ids()
+        }
+        names = dict(
+            cls.objects.filter(pk__in=ancestor_ids).values_list('pk', 'name')
+        ) if ancestor_ids else {}
+        for category in categories:
+            category._full_path = ' > '.join(
+                [names.get(pk, '') for pk in category.get_ancestor_ids()] +
+                [category.name]
+            )
+        return categories
 
 
-class Brand(models.Model):
+class Brand(DirtyFieldsMixin, models.Model):
     """
     Brand model for product manufacturers
     """
+    # Renames re-index the brand's products
+    tracked_fields = ['name']
+
     name = models.CharField(_('name'), max_length=100, unique=True)
     slug = models.SlugField(_('slug'), max_length=100, unique=True)
     description = models.TextField(_('description'), blank=True)
@@ -196,6 +302,23 @@ class Product(models.Model):
     is_digital = models.BooleanField(_('is digital'), default=False)
     requires_shipping = models.BooleanField(_('requires shipping'), default=True)
     published_at = models.DateTimeField(_('published at'), null=True, blank=True)
+    # Denormalized aggregates over approved reviews, see products.services
+    review_count = models.PositiveIntegerField(_('review count'), default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(_('rating sum'), default=0, editable=False)
+    rating_average = models.DecimalField(
+        _('rating average'),
+        max_digits=3,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False
+    )
+    rating_1_count = models.PositiveIntegerField(_('1 star reviews'), default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(_('2 star reviews'), default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(_('3 star reviews'), default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(_('4 star reviews'), default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(_('5 star reviews'), default=0, editable=False)
+    # Weighted full-text document on PostgreSQL (GIN indexed), see products.search
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
     created_by = models.ForeignKey(
@@ -219,6 +342,8 @@ class Product(models.Model):
             models.Index(fields=['price']),
             models.Index(fields=['created_at']),
             models.Index(fields=['updated_at']),
+            models.Index(fields=['rating_average']),
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
         ]
 
     def __str__(self):
@@ -261,28 +386,64 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        return self.reviews.aggregate(
-            average_rating=Avg('rating')
-        )['average_rating'] or 0
+        return self.rating_average
+
+    @property
+    def primary_image(self):
+        """
+        The primary image, read from prefetched data when available so
+        serializing a page of products does not query once per row
+        """
+        if hasattr(self, 'primary_images'):
+            return self.primary_images[0] if self.primary_images else None
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if 'images' in prefetched:
+            return next(
+                (image for image in prefetched['images'] if image.is_primary),
+                None
+            )
+        return self.images.filter(is_primary=True).first()
+
+    @property
+    def rating_histogram(self):
+        return {
+            rating: getattr(self, f'rating_{rating}_count')
+            for rating in range(1, 6)
+        }
 
     def decrease_inventory(self, amount=1):
-        if self.track_quantity:
-            if self.quantity < amount:
-                raise ValidationError(_('Insufficient inventory'))
-            self.quantity = F('quantity') - amount
-            self.save(update_fields=['quantity'])
-            if self.quantity <= 0 and not self.continue_selling_when_out_of_stock:
-                self.status = self.ProductStatus.OUT_OF_STOCK
-                self.save(update_fields=['status'])
+        """
+        Take stock with one conditional UPDATE, so two concurrent buyers
+        cannot both pass the check on a stale quantity
+        """
+        if not self.track_quantity:
+            return
+        products = Product.objects.filter(pk=self.pk)
+        if not self.continue_selling_when_out_of_stock:
+            products = products.filter(quantity__gte=amount)
+        updated = products.update(
+            quantity=Greatest(F('quantity') - amount, Value(0)),
+            updated_at=timezone.now()
+        )
+        if not updated:
+            raise ValidationError(_('Insufficient inventory'))
+        bump_version(Product)
+        self.refresh_from_db(fields=['quantity', 'status', 'updated_at'])
+        if self.quantity <= 0 and not self.continue_selling_when_out_of_stock:
+            self.status = self.ProductStatus.OUT_OF_STOCK
+            self.save(update_fields=['status', 'updated_at'])
 
     def increase_inventory(self, amount=1):
-        if self.track_quantity:
-            self.quantity = F('quantity') + amount
-            if self.status == self.ProductStatus.OUT_OF_STOCK:
-                self.status = self.ProductStatus.ACTIVE
-                self.save(update_fields=['quantity', 'status'])
-            else:
-                self.save(update_fields=['quantity'])
+        if not self.track_quantity:
+            return
+        Product.objects.filter(pk=self.pk).update(
+            quantity=F('quantity') + amount, updated_at=timezone.now()
+        )
+        bump_version(Product)
+        self.refresh_from_db(fields=['quantity', 'status', 'updated_at'])
+        if self.status == self.ProductStatus.OUT_OF_STOCK:
+            self.status = self.ProductStatus.ACTIVE
+            self.save(update_fields=['status', 'updated_at'])
 
 
 class ProductImage(models.Model):
@@ -346,6 +507,19 @@ class ProductImage(models.Model):
         super().save(*args, **kwargs)
 
 
+def primary_image_prefetch(lookup='images'):
+    """
+    Prefetch only primary images into ``primary_images`` for
+    ``Product.primary_image``; pass e.g. ``'product__images'`` from
+    related models
+    """
+    return Prefetch(
+        lookup,
+        queryset=ProductImage.objects.filter(is_primary=True),
+        to_attr='primary_images'
+    )
+
+
 class ProductVariant(models.Model):
     """
     Product variants with different attributes (size, color, etc.)
@@ -409,6 +583,26 @@ class ProductVariant(models.Model):
             return True
         return self.quantity > 0
 
+    def decrease_inventory(self, amount=1):
+        if not self.track_quantity:
+            return
+        updated = ProductVariant.objects.filter(
+            pk=self.pk, quantity__gte=amount
+        ).update(quantity=F('quantity') - amount, updated_at=timezone.now())
+        if not updated:
+            raise ValidationError(_('Insufficient inventory'))
+        bump_version(ProductVariant)
+        self.refresh_from_db(fields=['quantity', 'updated_at'])
+
+    def increase_inventory(self, amount=1):
+        if not self.track_quantity:
+            return
+        ProductVariant.objects.filter(pk=self.pk).update(
+            quantity=F('quantity') + amount, updated_at=timezone.now()
+        )
+        bump_version(ProductVariant)
+        self.refresh_from_db(fields=['quantity', 'updated_at'])
+
 
 class ProductAttribute(models.Model):
     """
@@ -549,10 +743,31 @@ class ProductReview(models.Model):
     def __str__(self):
         return f"Review for {self.product.name} by {self.user}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rating_state = instance.rating_state
+        return instance
+
+    @property
+    def rating_state(self):
+        """
+        The (product, rating) this review contributes to the product
+        aggregates, or None when it does not count
+        """
+        if self.is_approved and self.rating:
+            return (self.product_id, self.rating)
+        return None
+
     def clean(self):
         if self.rating < 1 or self.rating > 5:
             raise ValidationError(_('Rating must be between 1 and 5'))
 
+    def save(self, *args, **kwargs):
+        # Keep the product rating aggregates in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class ProductSpecification(models.Model):
     """
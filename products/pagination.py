@@ -1,19 +1,351 @@
+import base64
+import hashlib
+import json
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date, time)):
+        # isoformat() keeps microseconds, which keyset equality relies on
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATED = 'estimated'
+COUNT_AUTO = 'auto'
+
+
+class CountStrategyPaginator(DjangoPaginator):
+    """
+    Django paginator that asks the pagination class for its count
+    """
+    def __init__(self, object_list, per_page, counter, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        return self.counter(self.object_list)
 
 
 class OptimizedPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode.
+
+    Cursor mode is enabled with ``?pagination=cursor`` or by following a
+    ``cursor`` link. Rows are keyed on the queryset ordering plus the
+    primary key as a unique tiebreaker, so deep pages cost the same as the
+    first one and no ``OFFSET`` is used. The ``count`` is only computed in
+    cursor mode when ``?count=true`` is passed.
+
+    Views choose how the count is produced with ``count_strategy``:
+    ``exact`` runs ``COUNT(*)``, ``cached`` reuses a count for the same
+    filtered query for ``PAGINATION_COUNT_CACHE_TIMEOUT`` seconds, and
+    ``auto`` additionally uses the PostgreSQL planner estimate when the
+    client applied no filters and the estimate is over
+    ``PAGINATION_COUNT_ESTIMATE_THRESHOLD`` rows. ``count_strategy`` in the
+    response says which one produced the number.
+    """
     page_size = 24
     page_size_query_param = 'page_size'
     max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+    count_strategy = COUNT_EXACT
+    # Query parameters that do not narrow the result set
+    unfiltered_query_params = (
+        'page', 'page_size', 'pagination', 'cursor', 'count', 'ordering', 'format'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.count_source = None
+        self.cursor_mode = (
+            self.cursor_query_param in request.query_params or
+            request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_queryset_by_cursor(queryset, request)
 
     def get_paginated_response(self, data):
+        if self.cursor_mode:
+            count = self.cursor_count
+        else:
+            count = self.page.paginator.count
         return Response({
             'links': {
                 'next': self.get_next_link(),
                 'previous': self.get_previous_link()
             },
-            'count': self.page.paginator.count,
+            'count': count,
+            'count_strategy': self.count_source,
             'page_size': self.get_page_size(self.request),
             'results': data
-        })
\ No newline at end of file
+        })
+
+    def django_paginator_class(self, queryset, page_size):
+        return CountStrategyPaginator(queryset, page_size, counter=self.get_count)
+
+    # Counting
+
+    def get_count(self, queryset):
+        try:
+            key = self.get_count_cache_key(queryset)
+        except EmptyResultSet:
+            self.count_source = COUNT_EXACT
+            return 0
+        # A conditional GET counts before the page is built; reuse that
+        counted = self.__dict__.setdefault('_counted', {})
+        if key not in counted:
+            count = self.count_queryset(queryset)
+            counted[key] = (count, self.count_source)
+        count, self.count_source = counted[key]
+        return count
+
+    def count_queryset(self, queryset):
+        strategy = getattr(self.view, 'count_strategy', self.count_strategy)
+        if strategy == COUNT_AUTO:
+            estimate = self.estimate_count(queryset)
+            if estimate is not None:
+                self.count_source = COUNT_ESTIMATED
+                return estimate
+            strategy = COUNT_CACHED
+
+        if strategy == COUNT_CACHED:
+            key = self.get_count_cache_key(queryset)
+            count = cache.get(key)
+            if count is not None:
+                self.count_source = COUNT_CACHED
+                return count
+            count = queryset.count()
+            cache.set(
+                key, count,
+                getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 30)
+            )
+        else:
+            count = queryset.count()
+        self.count_source = COUNT_EXACT
+        return count
+
+    def get_count_cache_key(self, queryset):
+        """
+        Key on the compiled SQL so equivalent filters share an entry
+        whatever order the query parameters came in
+        """
+        sql, params = queryset.order_by().query.sql_with_params()
+        digest = hashlib.sha1(repr((sql, params)).encode('utf-8')).hexdigest()
+        return f'pagination:count:{queryset.model._meta.label_lower}:{digest}'
+
+    def estimate_count(self, queryset):
+        """
+        The planner's row estimate on PostgreSQL for requests the client
+        did not filter, or None when an exact count should be used
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        if any(
+            param not in self.unfiltered_query_params
+            for param in self.request.query_params
+        ):
+            return None
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate < getattr(settings, 'PAGINATION_COUNT_ESTIMATE_THRESHOLD', 10000):
+            return None
+        return estimate
+
+    def get_next_link(self):
+        if self.cursor_mode:
+            return self._cursor_link(self.next_cursor)
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.cursor_mode:
+            return self._cursor_link(self.previous_cursor)
+        return super().get_previous_link()
+
+    # Keyset mode
+
+    def get_ordering(self, queryset):
+        """
+        The queryset ordering as (field, descending) pairs, ending with a
+        unique primary key tiebreaker
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        fields = []
+        for item in ordering:
+            if not isinstance(item, str) or item == '?':
+                raise NotFound('Cursor pagination is not available for this ordering.')
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            if name == 'id':
+                name = 'pk'
+            fields.append((name, descending))
+        if not any(name == 'pk' for name, _ in fields):
+            fields.append(('pk', False))
+        return fields
+
+    def get_page_window(self, queryset, request, view=None):
+        """
+        Primary keys of the rows the page for ``request`` shows, as an
+        unevaluated queryset, and the count the response reports (None
+        when it has none). Lets a conditional GET validate just the page.
+        """
+        self.request = request
+        self.view = view
+        page_size = self.get_page_size(request)
+        if (
+            self.cursor_query_param in request.query_params or
+            request.query_params.get(self.mode_query_param) == 'cursor'
+        ):
+            keyset = self.keyset_queryset(queryset, request)[0]
+            count = None
+            if request.query_params.get(self.count_query_param, '').lower() == 'true':
+                count = self.get_count(queryset)
+            return keyset.values('pk')[:page_size + 1], count
+
+        count = self.get_count(queryset)
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            page_number = math.ceil(count / page_size)
+        try:
+            page_number = max(int(page_number), 1)
+        except ValueError:
+            page_number = 1
+        offset = (page_number - 1) * page_size
+        return queryset.values('pk')[offset:offset + page_size], count
+
+    def keyset_queryset(self, queryset, request):
+        """
+        ``queryset`` ordered for keyset paging and positioned after the
+        request's cursor. Returns it with the ordering, its signature, the
+        decoded cursor and whether the cursor walks backwards.
+        """
+        ordering = self.get_ordering(queryset)
+        signature = [f"{'-' if descending else ''}{name}" for name, descending in ordering]
+
+        cursor = self.decode_cursor(request)
+        if cursor and cursor['o'] != signature:
+            raise NotFound(self.invalid_cursor_message)
+        reverse = bool(cursor and cursor['r'])
+
+        # Read each ordering value off the row, including related lookups
+        # and annotations such as search_rank
+        queryset = queryset.annotate(**{
+            f'_cursor_{index}': F(name) for index, (name, _) in enumerate(ordering)
+        })
+        # NULLs sort last going forward (and so first when walking back),
+        # whatever the backend default is
+        direction = [(name, descending != reverse) for name, descending in ordering]
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        queryset = queryset.order_by(*[
+            F(name).desc(**nulls) if descending else F(name).asc(**nulls)
+            for name, descending in direction
+        ])
+        if cursor:
+            queryset = queryset.filter(self._after(direction, cursor['v'], reverse))
+        return queryset, ordering, signature, cursor, reverse
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        page_size = self.get_page_size(request)
+        keyset, ordering, signature, cursor, reverse = self.keyset_queryset(
+            queryset, request
+        )
+
+        self.cursor_count = None
+        if request.query_params.get(self.count_query_param, '').lower() == 'true':
+            self.cursor_count = self.get_count(queryset)
+
+        rows = list(keyset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        def cursor_for(row, reverse):
+            values = [
+                _encode_value(getattr(row, f'_cursor_{index}'))
+                for index in range(len(ordering))
+            ]
+            return {'o': signature, 'v': values, 'r': reverse}
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = cursor_for(rows[-1], False)
+            if cursor and (has_more or not reverse):
+                self.previous_cursor = cursor_for(rows[0], True)
+        return rows
+
+    def _after(self, direction, values, nulls_first):
+        """
+        Rows strictly after ``values`` in the given direction, as an
+        OR of "equal on the prefix, beyond on this field" terms
+        """
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for (name, descending), value in zip(direction, values):
+            if value is None:
+                beyond = Q(**{f'{name}__isnull': False}) if nulls_first else Q(pk__in=[])
+                equal = Q(**{f'{name}__isnull': True})
+            else:
+                beyond = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if not nulls_first:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                equal = Q(**{name: value})
+            condition |= prefix & beyond
+            prefix &= equal
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            cursor['o'], cursor['v'], cursor['r']
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        return base64.urlsafe_b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+
+    def _cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(cursor))
@@ -0,0 +1,163 @@
+"""
+Full-text product search.
+
+On PostgreSQL products carry a weighted ``search_vector`` (GIN indexed)
+built from name, SKU, barcode, category, brand and description. On SQLite
+the same document is kept in an FTS5 table. Other backends fall back to
+the ``icontains`` search.
+"""
+from django.db import connection
+from django.db.models import (
+    F, Func, Value, FloatField, OuterRef, Subquery, Q
+)
+from django.db.models.expressions import RawSQL
+
+from .models import Product, Category, Brand
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'products_product_fts'
+# bm25 weights for name, sku, barcode, category, brand, description
+FTS_WEIGHTS = (10.0, 8.0, 8.0, 4.0, 4.0, 1.0)
+
+
+def _vendor():
+    return connection.vendor
+
+
+def fts5_available():
+    if _vendor() != 'sqlite':
+        return False
+    if not hasattr(connection, '_products_fts5_available'):
+        with connection.cursor() as cursor:
+            connection._products_fts5_available = FTS_TABLE in \
+                connection.introspection.table_names(cursor)
+    return connection._products_fts5_available
+
+
+def search_vector_expression():
+    """
+    Weighted tsvector for a product row; usable in UPDATE statements since
+    category and brand names are read through subqueries, not joins
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1]
+    )
+    brand_name = Subquery(
+        Brand.objects.filter(pk=OuterRef('brand_id')).values('name')[:1]
+    )
+    return (
+        SearchVector('name', 'sku', 'barcode', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(category_name, brand_name, weight='B', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_index(queryset):
+    """
+    Refresh the search document for every product in the queryset
+    """
+    if _vendor() == 'postgresql':
+        Product.objects.filter(
+            pk__in=queryset.values('pk')
+        ).update(search_vector=search_vector_expression())
+    elif fts5_available():
+        rows = list(queryset.values_list(
+            'pk', 'name', 'sku', 'barcode',
+            'category__name', 'brand__name', 'description'
+        ))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(rowid, name, sku, barcode, category, brand, description) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                [(pk, *[value or '' for value in document]) for pk, *document in rows]
+            )
+
+
+def remove_from_search_index(product_ids):
+    if fts5_available():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in product_ids]
+            )
+
+
+def icontains_search(queryset, value):
+    """
+    The unindexed search: OR of icontains predicates across joins
+    """
+    return queryset.filter(
+        Q(name__icontains=value) |
+        Q(description__icontains=value) |
+        Q(sku__icontains=value) |
+        Q(barcode__icontains=value) |
+        Q(category__name__icontains=value) |
+        Q(brand__name__icontains=value)
+    )
+
+
+def _fts5_query(value):
+    # Quote every term so user input cannot inject FTS5 syntax, and
+    # prefix-match so partial words still hit
+    terms = [term.replace('"', '""') for term in value.split()]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+class FTS5Rank(Func):
+    """
+    bm25 relevance of each product's FTS5 document for an FTS5 ``query``,
+    negated so higher is better. Looked up per row by rowid, so only rows
+    that survive the other filters are ranked.
+    """
+    output_field = FloatField()
+
+    def __init__(self, query):
+        super().__init__(F('pk'), Value(query))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        pk, query = self.get_source_expressions()
+        pk_sql, pk_params = compiler.compile(pk)
+        query_sql, query_params = compiler.compile(query)
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return (
+            f'(SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH {query_sql} AND rowid = {pk_sql})',
+            [*query_params, *pk_params]
+        )
+
+
+def search_products(queryset, value):
+    """
+    Filter the queryset to products matching ``value`` and annotate a
+    ``search_rank`` (higher is more relevant)
+    """
+    value = value.strip()
+    if not value:
+        return queryset
+
+    if _vendor() == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(value, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank('search_vector', query)
+        )
+
+    if fts5_available():
+        # Matches and ranks stay in SQL, so every match is found and the
+        # pagination count is exact
+        query = _fts5_query(value)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query]
+        )).annotate(search_rank=FTS5Rank(query))
+
+    return icontains_search(queryset, value).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
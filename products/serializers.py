@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from django.utils.text import slugify
-from django.db import transaction
+from django.db import models, transaction
 from django.core.exceptions import ObjectDoesNotExist
 from .models import (
     Category, Brand, Product, ProductImage,
@@ -9,6 +9,14 @@ from .models import (
     ProductAttributeValue, ProductVariantAttribute,
     ProductReview, ProductSpecification
 )
+from .fieldsets import SparseFieldsetMixin
+
+
+class CategoryListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Resolve every full_path on the page with one ancestor query
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return super().to_representation(Category.prefetch_full_paths(iterable))
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -27,6 +35,7 @@ class CategorySerializer(serializers.ModelSerializer):
             'is_active', 'full_path', 'product_count',
             'created_at', 'updated_at'
         ]
+        list_serializer_class = CategoryListSerializer
         extra_kwargs = {
             'slug': {
                 'validators': [
@@ -38,6 +47,10 @@ class CategorySerializer(serializers.ModelSerializer):
     def validate_parent(self, value):
         if self.instance and value and value.id == self.instance.id:
             raise serializers.ValidationError("A category cannot be its own parent.")
+        if self.instance and value and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError(
+                "A category cannot be moved under one of its descendants."
+            )
         return value
 
     def create(self, validated_data):
@@ -200,7 +213,7 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         return value
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -245,8 +258,9 @@ class ProductSerializer(serializers.ModelSerializer):
             'continue_selling_when_out_of_stock', 'weight', 'is_featured',
             'is_digital', 'requires_shipping', 'primary_image', 'images',
             'variants', 'specifications', 'reviews', 'average_rating',
-            'published_at', 'created_at', 'updated_at'
+            'review_count', 'published_at', 'created_at', 'updated_at'
         ]
+        read_only_fields = ['review_count']
         extra_kwargs = {
             'slug': {
                 'required': False,
@@ -257,7 +271,7 @@ class ProductSerializer(serializers.ModelSerializer):
         }
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        primary_image = obj.primary_image
         if primary_image:
             return ProductImageSerializer(primary_image).data
         return None
@@ -276,7 +290,7 @@ class ProductSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     primary_image = serializers.SerializerMethodField()
     discount_percentage = serializers.DecimalField(
         max_digits=5,
@@ -284,7 +298,7 @@ class ProductListSerializer(serializers.ModelSerializer):
         read_only=True
     )
     average_rating = serializers.DecimalField(
-        source='calculated_avg_rating',
+        source='rating_average',
         max_digits=3,
         decimal_places=2,
         read_only=True
@@ -296,16 +310,16 @@ class ProductListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'slug', 'price', 'compare_at_price',
             'discount_percentage', 'primary_image', 'average_rating',
-            'inventory_status', 'is_featured', 'created_at'
+            'review_count', 'inventory_status', 'is_featured', 'created_at'
         ]
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        primary_image = obj.primary_image
         if primary_image:
             return ProductImageSerializer(primary_image).data
         return None
     
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     brand = BrandSerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
@@ -318,7 +332,16 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         decimal_places=2,
         read_only=True
     )
-    average_rating = serializers.SerializerMethodField()
+    average_rating = serializers.DecimalField(
+        source='rating_average',
+        max_digits=3,
+        decimal_places=2,
+        read_only=True
+    )
+    rating_histogram = serializers.DictField(
+        child=serializers.IntegerField(),
+        read_only=True
+    )
     inventory_status = serializers.CharField(read_only=True)
     is_in_stock = serializers.BooleanField(read_only=True)
 
@@ -331,14 +354,12 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'inventory_status', 'is_in_stock', 'continue_selling_when_out_of_stock',
             'weight', 'is_featured', 'is_digital', 'requires_shipping',
             'primary_image', 'images', 'variants', 'specifications', 'reviews',
-            'average_rating', 'published_at', 'created_at', 'updated_at'
+            'average_rating', 'review_count', 'rating_histogram',
+            'published_at', 'created_at', 'updated_at'
         ]
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        primary_image = obj.primary_image
         if primary_image:
             return ProductImageSerializer(primary_image).data
         return None
-
-    def get_average_rating(self, obj):
-        return obj.average_rating  # This uses the property from the model
\ No newline at end of file
@@ -0,0 +1,139 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Value, Count, Sum, Q, FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .cache import bump_version
+from .models import Product, ProductReview
+
+RATINGS = range(1, 6)
+
+
+def _average(rating_sum, review_count):
+    return Coalesce(
+        Cast(rating_sum, FloatField()) / NullIf(review_count, Value(0)),
+        Value(0.0),
+        output_field=FloatField()
+    )
+
+
+def apply_rating_delta(product_id, histogram_delta):
+    """
+    Apply a {rating: count delta} change to a product's rating aggregates
+    in a single UPDATE, without reading the reviews table
+    """
+    histogram_delta = {r: n for r, n in histogram_delta.items() if n}
+    if not histogram_delta:
+        return
+
+    count_delta = sum(histogram_delta.values())
+    sum_delta = sum(rating * n for rating, n in histogram_delta.items())
+    updates = {
+        f'rating_{rating}_count': F(f'rating_{rating}_count') + n
+        for rating, n in histogram_delta.items()
+    }
+    # SET expressions read the pre-update row, so derive the average from
+    # the new values explicitly
+    updates.update(
+        review_count=F('review_count') + count_delta,
+        rating_sum=F('rating_sum') + sum_delta,
+        rating_average=_average(
+            F('rating_sum') + sum_delta,
+            F('review_count') + count_delta
+        ),
+    )
+    Product.objects.filter(pk=product_id).update(**updates)
+
+
+def apply_review_change(old_state, new_state):
+    """
+    Move a review's contribution from old_state to new_state, where each
+    state is a (product_id, rating) pair or None
+    """
+    if old_state == new_state:
+        return
+
+    deltas = defaultdict(Counter)
+    if old_state:
+        deltas[old_state[0]][old_state[1]] -= 1
+    if new_state:
+        deltas[new_state[0]][new_state[1]] += 1
+
+    for product_id, histogram_delta in deltas.items():
+        apply_rating_delta(product_id, histogram_delta)
+
+
+def set_reviews_approval(queryset, approved):
+    """
+    Approve or unapprove a queryset of reviews, adjusting the aggregates
+    with one UPDATE per affected product. Returns the number of reviews
+    whose approval changed.
+    """
+    with transaction.atomic():
+        changing = queryset.filter(is_approved=not approved)
+        groups = changing.values('product_id', 'rating').annotate(
+            total=Count('id')
+        ).order_by()
+        sign = 1 if approved else -1
+        deltas = defaultdict(Counter)
+        for row in groups:
+            deltas[row['product_id']][row['rating']] += sign * row['total']
+
+        updated = ProductReview.objects.filter(
+            pk__in=changing.values('pk')
+        ).update(is_approved=approved)
+
+        for product_id, histogram_delta in deltas.items():
+            apply_rating_delta(product_id, histogram_delta)
+
+    # Bulk updates bypass the signals
+    if updated:
+        bump_version(ProductReview)
+        bump_version(Product)
+    return updated
+
+
+def rebuild_rating_aggregates(products=None):
+    """
+    Recompute the rating aggregates from the reviews table. Returns the
+    number of products rewritten.
+    """
+    if products is None:
+        products = Product.objects.all()
+
+    approved = Q(reviews__is_approved=True)
+    products = products.annotate(
+        _review_count=Count('reviews', filter=approved),
+        _rating_sum=Coalesce(Sum('reviews__rating', filter=approved), 0),
+        **{
+            f'_rating_{rating}_count': Count(
+                'reviews', filter=approved & Q(reviews__rating=rating)
+            )
+            for rating in RATINGS
+        }
+    ).order_by()
+
+    fields = ['review_count', 'rating_sum', 'rating_average'] + [
+        f'rating_{rating}_count' for rating in RATINGS
+    ]
+    batch = []
+    for product in products.iterator(chunk_size=500):
+        product.review_count = product._review_count
+        product.rating_sum = product._rating_sum
+        product.rating_average = (
+            Decimal(product.rating_sum) / product.review_count
+        ).quantize(Decimal('0.01')) if product.review_count else Decimal('0.00')
+        for rating in RATINGS:
+            setattr(
+                product,
+                f'rating_{rating}_count',
+                getattr(product, f'_rating_{rating}_count')
+            )
+        batch.append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_update(batch, fields, batch_size=500)
+        bump_version(Product)
+    return len(batch)
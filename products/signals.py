@@ -0,0 +1,63 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import (
+    Product, Category, Brand, ProductImage, ProductVariant,
+    ProductVariantAttribute, ProductSpecification, ProductReview
+)
+from .cache import bump_version
+from .services import apply_review_change
+from .search import update_search_index, remove_from_search_index
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_aggregates_on_save(sender, instance, **kwargs):
+    """Keep product rating aggregates in step with review saves"""
+    new_state = instance.rating_state
+    apply_review_change(getattr(instance, '_rating_state', None), new_state)
+    instance._rating_state = new_state
+
+
+@receiver(post_delete, sender=ProductReview)
+def update_rating_aggregates_on_delete(sender, instance, **kwargs):
+    """Remove a deleted review's contribution from the product aggregates"""
+    apply_review_change(getattr(instance, '_rating_state', None), None)
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, **kwargs):
+    """Refresh the product's full-text search document"""
+    update_search_index(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance, **kwargs):
+    remove_from_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+def reindex_products_on_rename(sender, instance, created, **kwargs):
+    """Category and brand names are part of every product document"""
+    if not created and instance.has_changed('name'):
+        update_search_index(instance.products.all())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductVariantAttribute)
+@receiver(post_delete, sender=ProductVariantAttribute)
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Drop cached catalog responses built from the changed model"""
+    bump_version(sender)
@@ -0,0 +1,86 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+
+from products.models import Category, Product
+from products.serializers import CategorySerializer
+
+
+class CategoryTreeTests(TestCase):
+
+    def setUp(self):
+        self.root = Category.objects.create(name='Electronics', slug='electronics')
+        self.computers = Category.objects.create(name='Computers', slug='computers', parent=self.root)
+        self.laptops = Category.objects.create(name='Laptops', slug='laptops', parent=self.computers)
+        self.phones = Category.objects.create(name='Phones', slug='phones', parent=self.root)
+
+    def test_path_and_depth_maintained_on_save(self):
+        """Test materialized path and depth are written on create"""
+        self.assertEqual(self.root.path, f'{self.root.pk}/')
+        self.assertEqual(self.laptops.path, f'{self.root.pk}/{self.computers.pk}/{self.laptops.pk}/')
+        self.assertEqual(self.laptops.depth, 2)
+
+    def test_get_descendants(self):
+        """Test subtree lookup through the path index"""
+        descendants = set(self.root.get_descendants().values_list('slug', flat=True))
+        self.assertEqual(descendants, {'computers', 'laptops', 'phones'})
+        self.assertIn(self.computers, self.computers.get_descendants(include_self=True))
+
+    def test_full_path_single_query(self):
+        """Test get_full_path does not walk parents one query per level"""
+        laptops = Category.objects.get(pk=self.laptops.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(laptops.get_full_path(), 'Electronics > Computers > Laptops')
+
+    def test_move_subtree(self):
+        """Test re-parenting a category rewrites its descendants"""
+        self.computers.parent = self.phones
+        self.computers.save()
+        self.laptops.refresh_from_db()
+        self.assertEqual(
+            self.laptops.path,
+            f'{self.root.pk}/{self.phones.pk}/{self.computers.pk}/{self.laptops.pk}/'
+        )
+        self.assertEqual(self.laptops.depth, 3)
+        self.assertEqual(self.laptops.get_full_path(), 'Electronics > Phones > Computers > Laptops')
+
+    def test_serializer_full_path_for_page(self):
+        """Test full_path for a list of categories costs one query"""
+        categories = list(Category.objects.all())
+        with self.assertNumQueries(1):
+            data = CategorySerializer(categories, many=True).data
+        paths = {item['slug']: item['full_path'] for item in data}
+        self.assertEqual(paths['laptops'], 'Electronics > Computers > Laptops')
+        self.assertEqual(paths['electronics'], 'Electronics')
+
+
+class CategoryFilterTests(APITestCase):
+
+    def setUp(self):
+        self.root = Category.objects.create(name='Electronics', slug='electronics')
+        self.laptops = Category.objects.create(name='Laptops', slug='laptops', parent=self.root)
+        self.other = Category.objects.create(name='Books', slug='books')
+        for name, category in [('MacBook', self.laptops), ('Radio', self.root), ('Novel', self.other)]:
+            Product.objects.create(
+                name=name,
+                description=name,
+                category=category,
+                price=Decimal('10.00'),
+                status='active'
+            )
+
+    def test_filter_includes_subcategories(self):
+        """Test category filter matches the whole subtree"""
+        response = self.client.get(reverse('product-list'), {'category': 'electronics'})
+        names = {item['name'] for item in response.data['results']}
+        self.assertEqual(names, {'MacBook', 'Radio'})
+
+    def test_filter_without_subcategories(self):
+        """Test include_subcategories=false matches only the category itself"""
+        response = self.client.get(
+            reverse('product-list'),
+            {'category': 'electronics', 'include_subcategories': 'false'}
+        )
+        names = {item['name'] for item in response.data['results']}
+        self.assertEqual(names, {'Radio'})
@@ -0,0 +1,148 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+
+from products.models import Category, Product, ProductReview
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Headphones',
+            description='Wireless headphones',
+            category=self.category,
+            price=Decimal('99.99'),
+            status='active'
+        )
+        self.url = reverse('product-detail', kwargs={'slug': self.product.slug})
+
+    def test_etag_round_trip(self):
+        """Test a matching If-None-Match is answered with 304"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_cached_response_keeps_validators(self):
+        """Test a cached anonymous response answers 304 without queries"""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_last_modified(self):
+        """Test no Last-Modified is sent, since deleting a review moves no timestamp"""
+        review = ProductReview.objects.create(
+            product=self.product, rating=4, title='Good', comment='Good'
+        )
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+
+        review.delete()
+        cache.clear()
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE='Sun, 01 Jan 2090 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_related_changes_update_etag(self):
+        """Test a new review changes the product validators"""
+        etag = self.client.get(self.url)['ETag']
+        ProductReview.objects.create(
+            product=self.product, rating=4, title='Good', comment='Good'
+        )
+        cache.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_validators(self):
+        """Test list validators change when a row is added"""
+        url = reverse('product-list')
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Product.objects.create(
+            name='Speaker',
+            description='Bluetooth speaker',
+            category=self.category,
+            price=Decimal('49.99'),
+            status='active'
+        )
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(reverse('category-list'))['ETag']
+        cache.clear()
+        response = self.client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_validators_do_not_join_relations(self):
+        """Benchmark: validators aggregate each relation in its own subquery, not a join"""
+        for index in range(3):
+            ProductReview.objects.create(
+                product=self.product, rating=4, title=f'Review {index}', comment='Good'
+            )
+        etag = self.client.get(self.url)['ETag']
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('JOIN "products_productreview"', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_list_validates_only_the_page(self):
+        """Test a change beyond the requested page leaves its ETag alone"""
+        for index in range(3):
+            Product.objects.create(
+                name=f'Speaker {index}', description='Bluetooth speaker',
+                category=self.category, price=Decimal('49.99'), status='active'
+            )
+        url = reverse('product-list') + '?page_size=2&ordering=name'
+        etag = self.client.get(url)['ETag']
+        # 'Speaker 2' sorts onto the second page; the count is unchanged
+        speaker = Product.objects.get(name='Speaker 2')
+        speaker.description = 'Portable speaker'
+        speaker.save()
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.product.description = 'Wired headphones'
+        self.product.save()
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_shifted_page_updates_etag(self):
+        """Test a row shifted onto the page by a deletion changes the ETag under a cached count"""
+        for index in range(3):
+            Product.objects.create(
+                name=f'Speaker {index}', description='Bluetooth speaker',
+                category=self.category, price=Decimal('49.99'), status='active'
+            )
+        Product.objects.update(updated_at=self.product.updated_at)
+        url = reverse('product-list') + '?page_size=2&ordering=name'
+        etag = self.client.get(url)['ETag']
+
+        # Speaker 1 moves onto the first page; the cached count stays at 4
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['count_strategy']), (4, 'cached'))
+        self.assertEqual(
+            [item['name'] for item in response.data['results']], ['Speaker 0', 'Speaker 1']
+        )
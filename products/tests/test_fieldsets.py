@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+
+from products.models import Category, Brand, Product, ProductReview, ProductVariant
+from products.fieldsets import prune_related_lookups
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.brand = Brand.objects.create(name='Sonic', slug='sonic')
+        self.product = Product.objects.create(
+            name='Headphones',
+            description='Wireless headphones',
+            category=self.category,
+            brand=self.brand,
+            price=Decimal('99.99'),
+            status='active'
+        )
+        ProductVariant.objects.create(
+            product=self.product, name='Black', sku='HP-BLK', price=Decimal('99.99')
+        )
+        ProductReview.objects.create(
+            product=self.product, rating=5, title='Great', comment='Great'
+        )
+        self.url = reverse('product-detail', kwargs={'slug': self.product.slug})
+
+    def get(self, params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(context.captured_queries)
+
+    def test_fields(self):
+        """Test ?fields= keeps only the listed fields"""
+        data, _ = self.get({'fields': 'name,price,quantity'})
+        self.assertEqual(set(data), {'name', 'price', 'quantity'})
+
+    def test_omit(self):
+        """Test ?omit= drops fields and keeps the rest"""
+        data, _ = self.get({'omit': 'reviews,variants'})
+        self.assertNotIn('reviews', data)
+        self.assertNotIn('variants', data)
+        self.assertEqual(data['category']['name'], 'Electronics')
+
+    def test_omitted_relations_are_not_loaded(self):
+        """Test dropping nested fields drops their joins and prefetches"""
+        _, full = self.get({})
+        data, sparse = self.get({'fields': 'name,price'})
+        self.assertLess(sparse, full)
+
+        _, with_reviews = self.get({'fields': 'name,reviews'})
+        self.assertEqual(with_reviews, sparse + 1)
+
+    def test_prune_related_lookups(self):
+        """Test pruning removes nested lookups under a dropped relation"""
+        queryset = Product.objects.select_related('category', 'brand').prefetch_related(
+            'images', 'variants__attributes'
+        )
+        pruned = prune_related_lookups(queryset, {'brand', 'variants'})
+        self.assertEqual(pruned.query.select_related, {'category': {}})
+        self.assertEqual(pruned._prefetch_related_lookups, ('images',))
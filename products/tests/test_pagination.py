@@ -0,0 +1,127 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+from unittest import mock
+
+from products.models import Category, Product
+from products.views import ProductViewSet
+
+
+class CursorPaginationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        for index in range(7):
+            Product.objects.create(
+                name=f'Product {index}',
+                description='Description',
+                category=self.category,
+                # Repeated prices force the primary key tiebreaker
+                price=Decimal('10.00') + index // 3,
+                status='active'
+            )
+
+    def walk(self, url, params=None, key='next'):
+        names = []
+        pages = 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names.extend(item['name'] for item in response.data['results'])
+            pages += 1
+            link = response.data['links'][key]
+            if not link:
+                return names, pages, response
+            response = self.client.get(link)
+
+    def test_cursor_pages_match_offset_ordering(self):
+        """Test walking cursor pages visits every row once in list order"""
+        url = reverse('product-list')
+        expected = [
+            item['name'] for item in
+            self.client.get(url, {'ordering': 'price', 'page_size': 100}).data['results']
+        ]
+        names, pages, response = self.walk(
+            url, {'pagination': 'cursor', 'ordering': 'price', 'page_size': 2}
+        )
+        self.assertEqual(names, expected)
+        self.assertEqual(pages, 4)
+        self.assertIsNone(response.data['count'])
+
+        # and back again through the previous links
+        previous = response.data['links']['previous']
+        names, pages, _ = self.walk(previous, key='previous')
+        self.assertEqual(pages, 3)
+        self.assertEqual(names, expected[4:6] + expected[2:4] + expected[0:2])
+
+    def test_previous_link_returns_prior_page(self):
+        """Test the previous link of page two is the first page"""
+        url = reverse('product-list')
+        first = self.client.get(url, {'pagination': 'cursor', 'page_size': 3})
+        self.assertIsNone(first.data['links']['previous'])
+        second = self.client.get(first.data['links']['next'])
+        back = self.client.get(second.data['links']['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNotNone(back.data['links']['next'])
+
+    def test_count_is_opt_in(self):
+        """Test ?count=true adds the total in cursor mode"""
+        response = self.client.get(
+            reverse('product-list'), {'pagination': 'cursor', 'count': 'true'}
+        )
+        self.assertEqual(response.data['count'], 7)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        response = self.client.get(reverse('product-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_rejected_when_ordering_changes(self):
+        """Test a cursor cannot be replayed against another ordering"""
+        url = reverse('product-list')
+        first = self.client.get(url, {'pagination': 'cursor', 'page_size': 2})
+        cursor = first.data['links']['next'].split('cursor=')[1].split('&')[0]
+        response = self.client.get(url, {'cursor': cursor, 'ordering': 'price'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CountStrategyTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.create_products(3)
+
+    def create_products(self, number):
+        for index in range(number):
+            Product.objects.create(
+                name=f'Product {Product.objects.count()}',
+                description='Description',
+                category=self.category,
+                price=Decimal('10.00'),
+                status='active'
+            )
+
+    def count(self, **params):
+        response = self.client.get(reverse('product-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['count'], response.data['count_strategy']
+
+    def test_count_is_cached_per_filter(self):
+        """Test counts are reused for the same filters and reported as cached"""
+        self.assertEqual(self.count(), (3, 'exact'))
+        self.create_products(2)
+        self.assertEqual(self.count(page=1, ordering='price'), (3, 'cached'))
+        self.assertEqual(self.count(min_price='5'), (5, 'exact'))
+
+        cache.clear()
+        self.assertEqual(self.count(), (5, 'exact'))
+
+    def test_exact_strategy(self):
+        """Test the exact strategy counts on every request"""
+        with mock.patch.object(ProductViewSet, 'count_strategy', 'exact'):
+            self.count()
+            self.create_products(1)
+            self.assertEqual(self.count(page=1), (4, 'exact'))
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+
+from products.models import Category, Product, ProductImage, primary_image_prefetch
+from products.serializers import ProductListSerializer
+
+
+def create_product(category, index):
+    product = Product.objects.create(
+        name=f'Product {index}',
+        description='Description',
+        category=category,
+        price=Decimal('10.00'),
+        status='active'
+    )
+    ProductImage.objects.create(product=product, image=f'products/images/{index}.jpg', order=1)
+    ProductImage.objects.create(
+        product=product,
+        image=f'products/images/{index}-primary.jpg',
+        is_primary=True,
+        order=2
+    )
+    return product
+
+
+class PrimaryImageTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.products = [create_product(self.category, i) for i in range(3)]
+
+    def test_primary_image_from_prefetch(self):
+        """Test the primary image comes from the prefetched rows"""
+        products = Product.objects.prefetch_related(primary_image_prefetch())
+        with self.assertNumQueries(2):
+            data = ProductListSerializer(products, many=True).data
+        for item in data:
+            self.assertTrue(item['primary_image']['image_url'].endswith('-primary.jpg'))
+
+    def test_primary_image_from_images_prefetch(self):
+        """Test an existing images prefetch is reused"""
+        product = Product.objects.prefetch_related('images').get(pk=self.products[0].pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(product.primary_image.is_primary)
+
+    def test_primary_image_without_prefetch(self):
+        """Test the property still works on a plain instance"""
+        product = Product.objects.get(pk=self.products[0].pk)
+        self.assertTrue(product.primary_image.is_primary)
+
+
+class ProductListPrimaryImageQueryTests(APITestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+
+    def list_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_query_count_is_flat(self):
+        """Test listing does not issue a primary image query per product"""
+        create_product(self.category, 0)
+        baseline = self.list_queries()
+        for i in range(1, 6):
+            create_product(self.category, i)
+        self.assertEqual(self.list_queries(), baseline)
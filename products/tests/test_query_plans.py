@@ -0,0 +1,171 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+
+from products.models import (
+    Category, Brand, Product, ProductImage, ProductVariant, ProductAttribute,
+    ProductAttributeValue, ProductVariantAttribute, ProductSpecification,
+    ProductReview
+)
+from users.models import User
+
+
+class ProductQueryPlanTests(APITestCase):
+    """Query counts, tables touched and rows fetched per ProductViewSet action"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.brand = Brand.objects.create(name='Sonic', slug='sonic')
+        self.color = ProductAttribute.objects.create(name='Color', slug='color')
+        self.black = ProductAttributeValue.objects.create(
+            attribute=self.color, value='Black', slug='black'
+        )
+        self.reviewers = [
+            User.objects.create_user(
+                email=f'reviewer{i}@example.com',
+                password='testpass123',
+                first_name='Review',
+                last_name='Er',
+                phone=f'+25471234567{i}'
+            )
+            for i in range(2)
+        ]
+        self.products = [self.create_product(i) for i in range(2)]
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+            first_name='Ad',
+            last_name='Min',
+            phone='+254700000000'
+        )
+
+    def create_product(self, index):
+        product = Product.objects.create(
+            name=f'Product {index}',
+            description='Description',
+            category=self.category,
+            brand=self.brand,
+            sku=f'SKU-{index}',
+            price=Decimal('10.00'),
+            status='active'
+        )
+        for order in range(2):
+            ProductImage.objects.create(
+                product=product,
+                image=f'products/images/{index}-{order}.jpg',
+                is_primary=order == 0,
+                order=order
+            )
+            variant = ProductVariant.objects.create(
+                product=product,
+                name=f'Variant {order}',
+                sku=f'SKU-{index}-{order}',
+                price=Decimal('10.00')
+            )
+            ProductVariantAttribute.objects.create(
+                variant=variant, attribute=self.color, value=self.black
+            )
+            ProductSpecification.objects.create(
+                product=product, name=f'Spec {order}', value='Value', order=order
+            )
+        for reviewer in self.reviewers:
+            ProductReview.objects.create(
+                product=product, user=reviewer, rating=4, title='Good', comment='Good',
+                is_approved=True
+            )
+        return product
+
+    def capture(self, method, url, data=None):
+        cache.clear()
+        self.rows = []
+        with CaptureQueriesContext(connection) as context, \
+                connection.execute_wrapper(self.count_rows):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def count_rows(self, execute, sql, params, many, context):
+        """
+        Record how many rows each query returns, by running SELECTs once
+        more on a bare cursor just before the real one; None for others
+        """
+        rows = None
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            cursor = connection.create_cursor()
+            try:
+                cursor.execute(sql, params)
+                rows = len(cursor.fetchall())
+            finally:
+                cursor.close()
+        self.rows.append(rows)
+        return execute(sql, params, many, context)
+
+    def assertTablesNotQueried(self, queries, *tables):
+        for sql in queries:
+            for table in tables:
+                self.assertNotIn(f'"{table}"', sql)
+
+    def test_list(self):
+        """Test list reads list columns and primary image rows only"""
+        _, queries = self.capture('get', reverse('product-list'))
+        rows = self.rows
+        self.create_product(2)
+        _, more_queries = self.capture('get', reverse('product-list'))
+
+        # count, page keys and validators, page and primary images; flat
+        # as rows grow
+        self.assertEqual(len(queries), 5)
+        self.assertEqual(len(more_queries), 5)
+        self.assertTablesNotQueried(
+            queries[3:], 'products_productvariant', 'products_productspecification',
+            'products_productreview', 'products_category', 'products_brand'
+        )
+        page_query = queries[3]
+        self.assertNotIn('"products_product"."description"', page_query)
+        self.assertIn('"products_productimage"."is_primary"', queries[4])
+        # One row per product on the page and only its primary image
+        self.assertEqual(rows, [1, 2, 1, 2, 2])
+        self.assertEqual(self.rows, [1, 3, 1, 3, 3])
+
+    def test_retrieve(self):
+        """Test retrieve loads each nested relation with one query"""
+        url = reverse('product-detail', kwargs={'slug': self.products[0].slug})
+        _, queries = self.capture('get', url)
+        # validators, product with category and brand, images, variants,
+        # variant attributes, specifications, reviews with users
+        self.assertEqual(len(queries), 7)
+        self.assertEqual(self.rows, [1, 1, 2, 2, 2, 2, 2])
+
+        for _ in range(3):
+            ProductReview.objects.create(
+                product=self.products[0], rating=5, title='Great', comment='Great'
+            )
+        self.create_product(2)
+        _, queries = self.capture('get', url)
+        self.assertEqual(len(queries), 7)
+        # Unapproved reviews and other products' rows stay unread
+        self.assertEqual(self.rows, [1, 1, 2, 2, 2, 2, 2])
+
+    def test_update(self):
+        """Test writes join category and brand but prefetch nothing up front"""
+        self.client.force_authenticate(self.admin)
+        url = reverse('product-detail', kwargs={'slug': self.products[0].slug})
+        _, queries = self.capture('patch', url, {'name': 'Renamed'})
+        index, object_query = next(
+            (index, sql) for index, sql in enumerate(queries) if sql.startswith('SELECT')
+        )
+        self.assertIn('"products_category"', object_query)
+        self.assertNotIn('"products_productreview"', object_query)
+        self.assertEqual(self.rows[index], 1)
+
+    def test_destroy(self):
+        """Test delete loads the bare product row"""
+        self.client.force_authenticate(self.admin)
+        url = reverse('product-detail', kwargs={'slug': self.products[0].slug})
+        _, queries = self.capture('delete', url)
+        self.assertNotIn('"products_category"', queries[0])
+        self.assertEqual(self.rows[0], 1)
@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.core.management import call_command
+from decimal import Decimal
+from io import StringIO
+
+from products.models import Category, Product, ProductReview
+from products.services import set_reviews_approval
+
+
+class ProductRatingAggregateTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.product = Product.objects.create(
+            name='Headphones',
+            description='Wireless headphones',
+            category=self.category,
+            price=Decimal('99.99'),
+            status='active'
+        )
+
+    def review(self, rating, is_approved=True):
+        return ProductReview.objects.create(
+            product=self.product,
+            rating=rating,
+            title='Review',
+            comment='Comment',
+            is_approved=is_approved
+        )
+
+    def test_approved_review_updates_aggregates(self):
+        """Test creating approved reviews maintains count, sum and histogram"""
+        self.review(5)
+        self.review(4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.rating_sum, 9)
+        self.assertEqual(self.product.average_rating, Decimal('4.50'))
+        self.assertEqual(self.product.rating_histogram, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+
+    def test_unapproved_review_is_not_counted(self):
+        """Test pending reviews only count once approved"""
+        review = self.review(2, is_approved=False)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+
+        review.is_approved = True
+        review.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 1)
+        self.assertEqual(self.product.rating_2_count, 1)
+
+    def test_rating_change_and_delete(self):
+        """Test editing and deleting an approved review adjusts the aggregates"""
+        review = self.review(1)
+        review = ProductReview.objects.get(pk=review.pk)
+        review.rating = 3
+        review.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 3)
+        self.assertEqual(self.product.rating_1_count, 0)
+        self.assertEqual(self.product.rating_3_count, 1)
+
+        review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+        self.assertEqual(self.product.average_rating, Decimal('0.00'))
+
+    def test_bulk_approval(self):
+        """Test the admin approval path updates aggregates per product"""
+        self.review(5, is_approved=False)
+        self.review(3, is_approved=False)
+        reviews = ProductReview.objects.filter(product=self.product)
+
+        self.assertEqual(set_reviews_approval(reviews, approved=True), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.average_rating, Decimal('4.00'))
+
+        self.assertEqual(set_reviews_approval(reviews, approved=False), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+
+    def test_rebuild_command(self):
+        """Test rebuild_product_ratings recomputes from the reviews table"""
+        self.review(4)
+        self.review(2)
+        Product.objects.filter(pk=self.product.pk).update(review_count=0, rating_sum=0)
+
+        call_command('rebuild_product_ratings', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 2)
+        self.assertEqual(self.product.rating_sum, 6)
+        self.assertEqual(self.product.average_rating, Decimal('3.00'))
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+from io import StringIO
+
+from products.cache import get_stats
+from products.models import Category, Brand, Product, ProductReview
+from products.services import set_reviews_approval
+from users.models import User
+
+
+class CatalogResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics', slug='electronics')
+        self.brand = Brand.objects.create(name='Sonic', slug='sonic')
+        self.product = Product.objects.create(
+            name='Headphones',
+            description='Wireless headphones',
+            category=self.category,
+            brand=self.brand,
+            price=Decimal('99.99'),
+            status='active'
+        )
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous_reads_are_cached(self):
+        """Test a repeated anonymous GET is served from the cache"""
+        url = reverse('product-list')
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['name'], 'Headphones')
+        self.assertEqual(get_stats(), {'hits': 1, 'misses': 1})
+
+    def test_query_params_are_normalized(self):
+        """Test parameter order does not split the cache"""
+        url = reverse('product-list')
+        self.get(url + '?ordering=price&page_size=5')
+        self.assertEqual(self.get(url + '?page_size=5&ordering=price')['X-Cache'], 'HIT')
+        self.assertEqual(self.get(url + '?page_size=6&ordering=price')['X-Cache'], 'MISS')
+
+    def test_saves_invalidate(self):
+        """Test saving a dependent model bumps its version"""
+        url = reverse('product-detail', kwargs={'slug': self.product.slug})
+        self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brand.name = 'Acoustica'
+            self.brand.save()
+        response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['brand']['name'], 'Acoustica')
+
+    def test_bulk_review_approval_invalidates(self):
+        """Test the admin approval path, which bypasses signals, invalidates"""
+        url = reverse('product-detail', kwargs={'slug': self.product.slug})
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(
+                product=self.product, rating=5, title='Great',
+                comment='Great', is_approved=False
+            )
+        self.assertEqual(self.get(url).data['review_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            set_reviews_approval(ProductReview.objects.all(), approved=True)
+        self.assertEqual(self.get(url).data['review_count'], 1)
+
+    def test_authenticated_reads_bypass_cache(self):
+        """Test signed-in users always get a fresh response"""
+        user = User.objects.create_user(
+            email='shopper@example.com',
+            password='testpass123',
+            first_name='Shop',
+            last_name='Per',
+            phone='+254712345678'
+        )
+        self.client.force_authenticate(user)
+        url = reverse('brand-list')
+        self.get(url)
+        self.assertNotIn('X-Cache', self.get(url))
+
+    def test_stats_command(self):
+        """Test the counters are reported for operations"""
+        url = reverse('category-list')
+        self.get(url)
+        self.get(url)
+        out = StringIO()
+        call_command('catalog_cache_stats', stdout=out)
+        self.assertIn('hits=1 misses=1', out.getvalue())
@@ -0,0 +1,98 @@
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from products.models import Category, Brand, Product
+from products.search import search_products
+
+
+class ProductSearchTests(APITestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Audio', slug='audio')
+        self.brand = Brand.objects.create(name='Sonic', slug='sonic')
+        self.headphones = Product.objects.create(
+            name='Wireless Headphones',
+            description='Over-ear with noise cancelling',
+            category=self.category,
+            brand=self.brand,
+            sku='HP-100',
+            price=Decimal('99.99'),
+            status='active'
+        )
+        self.speaker = Product.objects.create(
+            name='Bluetooth Speaker',
+            description='Pairs with wireless headphones and phones',
+            category=self.category,
+            price=Decimal('49.99'),
+            status='active'
+        )
+        Product.objects.create(
+            name='Desk Lamp',
+            description='LED lamp',
+            price=Decimal('19.99'),
+            status='active'
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('product-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data['results']]
+
+    def test_ranked_search(self):
+        """Test ?q= matches and ranks name hits above description hits"""
+        self.assertEqual(self.search(q='headphones'), ['Wireless Headphones', 'Bluetooth Speaker'])
+
+    def test_search_matches_brand_and_sku(self):
+        """Test the document covers brand names and SKUs"""
+        self.assertEqual(self.search(q='sonic'), ['Wireless Headphones'])
+        self.assertEqual(self.search(q='HP-100'), ['Wireless Headphones'])
+
+    def test_explicit_ordering_wins(self):
+        """Test ?ordering= overrides relevance ordering"""
+        self.assertEqual(
+            self.search(q='headphones', ordering='price'),
+            ['Bluetooth Speaker', 'Wireless Headphones']
+        )
+
+    def test_search_syntax_is_escaped(self):
+        """Test query syntax characters do not raise"""
+        self.assertEqual(self.search(q='"head* OR (lamp'), [])
+
+    def test_index_follows_updates(self):
+        """Test product and brand renames refresh the search document"""
+        self.headphones.name = 'Studio Monitors'
+        self.headphones.save()
+        self.assertNotIn('Studio Monitors', self.search(q='wireless'))
+        self.assertIn('Studio Monitors', self.search(q='studio'))
+
+        self.brand.name = 'Acoustica'
+        self.brand.save()
+        self.assertEqual(self.search(q='acoustica'), ['Studio Monitors'])
+
+    def test_touching_category_skips_reindex(self):
+        """Test saving a category without renaming it leaves its products' documents alone"""
+        self.category.description = 'Speakers and headphones'
+        with patch('products.signals.update_search_index') as update:
+            self.category.save()
+        update.assert_not_called()
+
+        self.category.name = 'Sound'
+        with patch('products.signals.update_search_index') as update:
+            self.category.save()
+        update.assert_called_once()
+
+    def test_search_products_annotates_rank(self):
+        """Test search_products exposes a search_rank annotation"""
+        results = search_products(Product.objects.all(), 'lamp')
+        self.assertEqual([p.name for p in results], ['Desk Lamp'])
+        self.assertIsNotNone(results[0].search_rank)
+
+    def test_benchmark_command(self):
+        """Test the benchmark compares both search paths"""
+        out = StringIO()
+        call_command('benchmark_product_search', 'headphones', iterations=1, stdout=out)
+        self.assertIn('headphones', out.getvalue())
@@ -4,11 +4,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, DjangoModelPermissions
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Prefetch, Count, Avg
+from django.db.models import Prefetch, Count, Max, Sum
 from django.shortcuts import get_object_or_404
 
 from .models import (
-    Category, Brand, Product, ProductImage,
+    Category, Brand, Product, ProductImage, primary_image_prefetch,
     ProductVariant, ProductAttribute,
     ProductAttributeValue, ProductVariantAttribute,
     ProductReview, ProductSpecification
@@ -21,11 +21,16 @@ from .serializers import (
     ProductVariantAttributeSerializer, ProductReviewSerializer,
     ProductSpecificationSerializer, ProductDetailSerializer
 )
-from .filters import ProductFilter, CategoryFilter, ProductVariantFilter
+from .filters import (
+    ProductFilter, CategoryFilter, ProductVariantFilter, SearchRankOrderingFilter
+)
 from .pagination import OptimizedPagination
+from .cache import CatalogCacheMixin
+from .conditional import ConditionalGetMixin, related_aggregates
+from .fieldsets import SparseFieldsetViewMixin
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.annotate(
         product_count=Count('products', distinct=True)
     ).prefetch_related('children')
@@ -36,6 +41,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'product_count', 'created_at']
     ordering = ['name']
     pagination_class = OptimizedPagination
+    count_strategy = 'auto'
+    cache_models = (Category, Product)
     lookup_field = 'slug'
 
     def get_permissions(self):
@@ -43,6 +50,12 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return [IsAuthenticated(), DjangoModelPermissions()]
 
+    def get_conditional_aggregates(self):
+        return {
+            **super().get_conditional_aggregates(),
+            **related_aggregates(Product.objects.all(), 'category', _products=Count('pk')),
+        }
+
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -59,15 +72,19 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def children(self, request, slug=None):
-        category = self.get_object()
-        children = category.children.annotate(
+        category = get_object_or_404(Category.objects.only('id', 'path', 'depth'), slug=slug)
+        self.check_object_permissions(request, category)
+        children = Category.objects.filter(
+            path__startswith=category.path,
+            depth=category.depth + 1
+        ).annotate(
             product_count=Count('products', distinct=True)
         )
         serializer = self.get_serializer(children, many=True)
         return Response(serializer.data)
 
 
-class BrandViewSet(viewsets.ModelViewSet):
+class BrandViewSet(CatalogCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Brand.objects.annotate(
         product_count=Count('products', distinct=True)
     )
@@ -77,6 +94,8 @@ class BrandViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'product_count', 'created_at']
     ordering = ['name']
     pagination_class = OptimizedPagination
+    count_strategy = 'auto'
+    cache_models = (Brand, Product)
     lookup_field = 'slug'
 
     def get_permissions(self):
@@ -84,34 +103,50 @@ class BrandViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return [IsAuthenticated(), DjangoModelPermissions()]
 
-
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.select_related(
-        'category', 'brand'
-    ).prefetch_related(
-        Prefetch('images', queryset=ProductImage.objects.order_by('order')),
-        Prefetch('variants', queryset=ProductVariant.objects.prefetch_related(
-            'attributes__attribute',
-            'attributes__value'
-        )),
-        Prefetch('specifications', queryset=ProductSpecification.objects.order_by('order')),
-        Prefetch('reviews', queryset=ProductReview.objects.filter(is_approved=True))
-    ).annotate(
-        calculated_avg_rating=Avg('reviews__rating')
-    )
+    def get_conditional_aggregates(self):
+        return {
+            **super().get_conditional_aggregates(),
+            **related_aggregates(Product.objects.all(), 'brand', _products=Count('pk')),
+        }
+
+
+class ProductViewSet(
+    CatalogCacheMixin, ConditionalGetMixin, SparseFieldsetViewMixin,
+    viewsets.ModelViewSet
+):
+    queryset = Product.objects.all()
+    # Columns ProductListSerializer renders
+    list_fields = [
+        'id', 'name', 'slug', 'price', 'compare_at_price', 'rating_average',
+        'review_count', 'is_featured', 'created_at'
+    ]
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchFilter, SearchRankOrderingFilter]
     filterset_class = ProductFilter
     search_fields = [
         'name', 'description', 'sku', 'barcode',
         'category__name', 'brand__name'
     ]
     ordering_fields = [
-        'name', 'price', 'average_rating', 'created_at',
+        'name', 'price', 'rating_average', 'review_count', 'created_at',
         'updated_at', 'published_at'
     ]
     ordering = ['-created_at']
     pagination_class = OptimizedPagination
+    count_strategy = 'auto'
+    cache_models = (
+        Product, ProductImage, ProductVariant, ProductVariantAttribute,
+        ProductSpecification, Category, Brand, ProductReview
+    )
+    sparse_field_lookups = {
+        'category': ['category'],
+        'brand': ['brand'],
+        'images': ['images'],
+        'primary_image': ['images'],
+        'variants': ['variants'],
+        'specifications': ['specifications'],
+        'reviews': ['reviews'],
+    }
     lookup_field = 'slug'
 
     def get_permissions(self):
@@ -119,6 +154,32 @@ class ProductViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return [IsAuthenticated(), DjangoModelPermissions()]
 
+    def get_conditional_aggregates(self):
+        aggregates = {
+            **super().get_conditional_aggregates(),
+            '_category_updated_at': Max('category__updated_at'),
+            '_brand_updated_at': Max('brand__updated_at'),
+            # Rating columns are maintained with UPDATEs that skip auto_now
+            '_review_count': Sum('review_count'),
+            '_rating_sum': Sum('rating_sum'),
+            **related_aggregates(ProductImage.objects.all(), 'product', _images=Count('pk')),
+        }
+        if self.action == 'retrieve':
+            aggregates.update(
+                **related_aggregates(
+                    ProductVariant.objects.all(), 'product',
+                    _variants=Count('pk'), _variants_updated_at=Max('updated_at')
+                ),
+                **related_aggregates(
+                    ProductSpecification.objects.all(), 'product', _specifications=Count('pk')
+                ),
+                **related_aggregates(
+                    ProductReview.objects.all(), 'product',
+                    _reviews=Count('pk'), _reviews_updated_at=Max('updated_at')
+                ),
+            )
+        return aggregates
+
     def get_serializer_class(self):
         if self.action == 'list':
             return ProductListSerializer
@@ -127,13 +188,41 @@ class ProductViewSet(viewsets.ModelViewSet):
         return super().get_serializer_class()
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
+        # Each action loads only what its serializer renders; the
+        # sparse fieldset pruning then applies on top
+        queryset = Product.objects.all()
+        if self.action == 'list':
+            queryset = queryset.only(*self.list_fields).prefetch_related(
+                primary_image_prefetch()
+            )
+        elif self.action == 'retrieve':
+            queryset = queryset.select_related(
+                'category', 'brand'
+            ).prefetch_related(
+                Prefetch('images', queryset=ProductImage.objects.order_by('order')),
+                Prefetch('variants', queryset=ProductVariant.objects.prefetch_related(
+                    Prefetch(
+                        'attributes',
+                        queryset=ProductVariantAttribute.objects.select_related(
+                            'attribute', 'value'
+                        )
+                    )
+                )),
+                Prefetch('specifications', queryset=ProductSpecification.objects.order_by('order')),
+                Prefetch('reviews', queryset=ProductReview.objects.filter(
+                    is_approved=True
+                ).select_related('user'))
+            )
+        elif self.action in ['create', 'update', 'partial_update']:
+            # Saving clears prefetched relations, so only join what
+            # survives into the response
+            queryset = queryset.select_related('category', 'brand')
+
         # Filter by status (only active products for non-staff)
         if not self.request.user.is_staff:
             queryset = queryset.filter(status='active')
-        
-        return queryset
+
+        return self.prune_sparse_lookups(queryset)
 
     @action(detail=True, methods=['post'])
     def add_image(self, request, slug=None):
@@ -150,7 +239,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def reviews(self, request, slug=None):
         product = self.get_object()
-        reviews = product.reviews.filter(is_approved=True)
+        reviews = product.reviews.filter(is_approved=True).select_related('user')
         page = self.paginate_queryset(reviews)
         if page is not None:
             serializer = ProductReviewSerializer(page, many=True)
@@ -0,0 +1,94 @@
+"""
+Knox token authentication with a cache in front of the token table.
+
+A verified token is remembered in the cache under its digest for up to
+``AUTH_TOKEN_CACHE_TIMEOUT`` seconds, so later requests skip knox's scan
+of candidate tokens, the clean-up of the user's expired tokens and the
+expiry write. They still read the token row by its digest (the primary
+key) together with its user in one query, so a token revoked by another
+process, or a deactivated user, is refused at once even when the cache is
+per process. Deleting a token (logout, logout-all, expiry) also removes
+its cache entry through a ``post_delete`` handler.
+
+With ``AUTO_REFRESH`` the expiry is written at most once per
+``MIN_REFRESH_INTERVAL`` per token, whichever process serves the request.
+"""
+import binascii
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from knox.auth import TokenAuthentication
+from knox.crypto import hash_token
+from knox.models import get_token_model
+from knox.settings import knox_settings
+from rest_framework import exceptions
+
+TOKEN_KEY = 'auth:token:{}'
+REFRESH_KEY = 'auth:token-refresh:{}'
+
+
+def remember_token(auth_token):
+    """
+    Remember that ``auth_token`` was verified, until it expires or the
+    cache timeout runs out
+    """
+    timeout = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 300)
+    if auth_token.expiry is not None:
+        timeout = min(timeout, (auth_token.expiry - timezone.now()).total_seconds())
+        if timeout <= 0:
+            return
+    cache.set(TOKEN_KEY.format(auth_token.digest), True, timeout)
+
+
+def forget_token(digest):
+    cache.delete_many([TOKEN_KEY.format(digest), REFRESH_KEY.format(digest)])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``knox.auth.TokenAuthentication`` that answers from the cache when it
+    can and falls back to knox otherwise
+    """
+
+    def authenticate_credentials(self, token):
+        try:
+            digest = hash_token(token.decode('utf-8'))
+        except (TypeError, binascii.Error, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not cache.get(TOKEN_KEY.format(digest)):
+            user, auth_token = super().authenticate_credentials(token)
+            remember_token(auth_token)
+            return user, auth_token
+
+        auth_token = get_token_model().objects.select_related('user').filter(
+            digest=digest
+        ).first()
+        if auth_token is None:
+            # Revoked, possibly by a process whose cache we do not share
+            forget_token(digest)
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if auth_token.expiry and auth_token.expiry < timezone.now():
+            # Knox deletes it and refuses the request
+            forget_token(digest)
+            return super().authenticate_credentials(token)
+        if knox_settings.AUTO_REFRESH and auth_token.expiry:
+            self.renew_token(auth_token)
+        return self.validate_user(auth_token)
+
+    def renew_token(self, auth_token):
+        new_expiry = timezone.now() + knox_settings.TOKEN_TTL
+        if knox_settings.AUTO_REFRESH_MAX_TTL is not None:
+            new_expiry = min(new_expiry, auth_token.created + knox_settings.AUTO_REFRESH_MAX_TTL)
+
+        interval = knox_settings.MIN_REFRESH_INTERVAL
+        if (new_expiry - auth_token.expiry).total_seconds() <= interval:
+            return
+        # Whoever adds the key writes; other processes skip until it expires
+        if not cache.add(REFRESH_KEY.format(auth_token.digest), True, interval):
+            return
+        get_token_model().objects.filter(digest=auth_token.digest).update(expiry=new_expiry)
+        auth_token.expiry = new_expiry
+        remember_token(auth_token)
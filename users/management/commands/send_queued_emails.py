@@ -0,0 +1,47 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from users.outbox import process_email_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails (verification, order confirmation and shipping) over one SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Emails claimed per batch'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new emails instead of exiting when the outbox is drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep between polls when the outbox is empty (with --loop)'
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        processed = 0
+        try:
+            while True:
+                claimed = process_email_outbox(options['batch_size'], connection=connection)
+                processed += claimed
+                if claimed:
+                    continue
+                # Do not hold an idle SMTP session open between polls
+                connection.close()
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} queued emails.'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_alter_profile_profile_picture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='subject')),
+                ('to', models.JSONField(default=list, verbose_name='to')),
+                ('from_email', models.CharField(blank=True, max_length=254, verbose_name='from email')),
+                ('reply_to', models.JSONField(blank=True, default=list, verbose_name='reply to')),
+                ('body', models.TextField(verbose_name='body')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML body')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Not picked up by a worker before this time', verbose_name='available at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='sent at')),
+            ],
+            options={
+                'verbose_name': 'queued email',
+                'verbose_name_plural': 'queued emails',
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='users_email_status_6f9315_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
 import uuid
-from django.db import models
+import re
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Cast, Substr
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
@@ -8,12 +12,16 @@ from phonenumber_field.modelfields import PhoneNumberField
 from django.core.validators import FileExtensionValidator
 from django.utils.text import slugify
 from django.conf import settings
+from ecommerce.tracking import DirtyFieldsMixin
 
 # Import CloudinaryField only if not in DEBUG mode
 if not settings.DEBUG:
     from cloudinary.models import CloudinaryField
 
 
+USERNAME_ALLOCATION_ATTEMPTS = 5
+
+
 class UserManager(BaseUserManager):
     """Custom user model manager with email as primary identifier"""
     
@@ -26,9 +34,7 @@ class UserManager(BaseUserManager):
         
         email = self.normalize_email(email)
         
-        if not extra_fields.get('username'):
-            extra_fields['username'] = self._generate_unique_username(email)
-        
+        # A missing username is allocated by User.save()
         user = self.model(email=email, **extra_fields)
         
         if password:
@@ -63,20 +69,29 @@ class UserManager(BaseUserManager):
         return self._create_user(email, password, **extra_fields)
 
     def _generate_unique_username(self, email):
-        """Generate unique username from email"""
-        base = slugify(email.split('@')[0].replace('.', '_'))
-        username = base
-        counter = 1
-        
-        while self.model.objects.filter(username=username).exists():
-            username = f"{base}_{counter}"
-            counter += 1
-            
-        return username
+        """
+        Username from the email's local part, with the next free numeric
+        suffix if it is taken, found in one indexed query
+        """
+        base = slugify(email.split('@')[0].replace('.', '_')) or 'user'
+        prefix = f"{base}_"
+        taken = self.model.objects.filter(
+            Q(username=base) | Q(username__startswith=prefix)
+        ).aggregate(
+            base_taken=Count('pk', filter=Q(username=base)),
+            last_suffix=Max(
+                Cast(Substr('username', len(prefix) + 1), models.IntegerField()),
+                filter=Q(username__regex=rf'^{re.escape(base)}_[0-9]{{1,9}}$')
+            )
+        )
+        if not taken['base_taken']:
+            return base
+        return f"{prefix}{(taken['last_suffix'] or 0) + 1}"
 
-class User(AbstractUser):
+class User(DirtyFieldsMixin, AbstractUser):
     """Custom user model with extended fields"""
-    
+    tracked_fields = ('password',)
+
     class UserType(models.TextChoices):
         CUSTOMER = 'CUSTOMER', _('Customer')
         VENDOR = 'VENDOR', _('Vendor')
@@ -179,14 +194,31 @@ class User(AbstractUser):
             raise ValidationError(_("First name and last name are required."))
 
     def save(self, *args, **kwargs):
-        if not self.username:
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'password' in update_fields:
+            # Saved alongside the password by the pre_save signal
+            kwargs['update_fields'] = {*update_fields, 'password_changed_at'}
+        if self.username:
+            super().save(*args, **kwargs)
+            return
+
+        # A concurrent signup can take the allocated name before this
+        # insert; pick again when the unique constraint says so
+        for attempt in range(USERNAME_ALLOCATION_ATTEMPTS):
             self.username = User.objects._generate_unique_username(self.email)
-        super().save(*args, **kwargs)
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                if (attempt == USERNAME_ALLOCATION_ATTEMPTS - 1 or
+                        not User.objects.filter(username=self.username).exists()):
+                    raise
 
     
 
 
-class Profile(models.Model):
+class Profile(DirtyFieldsMixin, models.Model):
     """Extended user profile information"""
     
     class Gender(models.TextChoices):
@@ -341,3 +373,54 @@ class Profile(models.Model):
         ]
         return ', '.join(filter(None, parts))
 
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing emails, rendered and recorded in the transaction that triggers
+    them and sent by the ``send_queued_emails`` worker once it commits
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SENT = 'sent', _('Sent')
+        FAILED = 'failed', _('Failed')
+
+    subject = models.CharField(_('subject'), max_length=255)
+    to = models.JSONField(_('to'), default=list)
+    from_email = models.CharField(_('from email'), max_length=254, blank=True)
+    reply_to = models.JSONField(_('reply to'), default=list, blank=True)
+    body = models.TextField(_('body'))
+    html_body = models.TextField(_('HTML body'), blank=True)
+    status = models.CharField(
+        _('status'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    available_at = models.DateTimeField(
+        _('available at'),
+        default=timezone.now,
+        help_text=_('Not picked up by a worker before this time')
+    )
+    last_error = models.TextField(_('last error'), blank=True)
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True
+    )
+    sent_at = models.DateTimeField(
+        _('sent at'),
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = _('queued email')
+        verbose_name_plural = _('queued emails')
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,128 @@
+"""
+Transactional outbox for emails.
+
+Requests render an email and record it as an ``EmailOutbox`` row in their
+own transaction instead of talking to the SMTP server, so a slow or failing
+mail server never delays or fails them. ``process_email_outbox`` (run by
+the ``send_queued_emails`` command) claims due rows and sends them over one
+SMTP connection.
+
+A claim pushes ``available_at`` forward by ``EMAIL_OUTBOX_LEASE_SECONDS``,
+so rows claimed by a worker that dies are picked up again once the lease
+runs out. Failed sends are retried with backoff up to
+``EMAIL_OUTBOX_MAX_ATTEMPTS`` times.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import EmailOutbox
+
+
+def queue_email(subject, template_name, context, to, reply_to=None):
+    """
+    Render ``template_name`` and queue it for ``to`` (an address or a
+    list). Call inside the transaction the email belongs to, so it is only
+    sent if that commits.
+    """
+    html_body = render_to_string(template_name, context)
+    return EmailOutbox.objects.create(
+        subject=subject,
+        to=[to] if isinstance(to, str) else list(to),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        reply_to=reply_to if reply_to is not None else [settings.REPLY_TO_EMAIL],
+        body=strip_tags(html_body),
+        html_body=html_body
+    )
+
+
+def claim_emails(batch_size=50, now=None):
+    """
+    Lease up to ``batch_size`` due emails to this worker. Rows another
+    worker has locked are skipped rather than waited on.
+    """
+    now = now or timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 60))
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True).filter(
+                status=EmailOutbox.Status.PENDING, available_at__lte=now
+            ).order_by('available_at')[:batch_size]
+        )
+        EmailOutbox.objects.filter(pk__in=[email.pk for email in emails]).update(
+            available_at=now + lease, attempts=F('attempts') + 1
+        )
+    return emails
+
+
+def build_message(email, connection=None):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+        reply_to=email.reply_to,
+        connection=connection
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def send_email(email, connection):
+    """
+    Send one claimed email. Returns the status it was left in.
+    """
+    now = timezone.now()
+    try:
+        # A no-op while the session is open; otherwise it opens one that
+        # stays open for the following emails
+        connection.open()
+        build_message(email, connection).send()
+    except Exception as e:
+        logging.warning(f"Sending email {email.pk} failed: {e}")
+        # The session may be broken; the next send opens a fresh one
+        connection.close()
+        attempts = email.attempts + 1
+        if attempts < getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5):
+            EmailOutbox.objects.filter(pk=email.pk).update(
+                available_at=now + timedelta(seconds=30 * 2 ** attempts),
+                last_error=str(e)
+            )
+            return EmailOutbox.Status.PENDING
+        EmailOutbox.objects.filter(pk=email.pk).update(
+            status=EmailOutbox.Status.FAILED, last_error=str(e)
+        )
+        return EmailOutbox.Status.FAILED
+
+    EmailOutbox.objects.filter(pk=email.pk).update(
+        status=EmailOutbox.Status.SENT, sent_at=now, last_error=''
+    )
+    return EmailOutbox.Status.SENT
+
+
+def process_email_outbox(batch_size=50, now=None, connection=None):
+    """
+    Claim and send one batch of due emails; returns how many were claimed.
+    Pass an open ``connection`` to reuse it across batches.
+    """
+    emails = claim_emails(batch_size, now)
+    if not emails:
+        return 0
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_connection()
+    try:
+        for email in emails:
+            send_email(email, connection)
+    finally:
+        if owns_connection:
+            connection.close()
+    return len(emails)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from .models import User, Profile
 from knox.models import AuthToken
@@ -38,14 +39,15 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password2')
-        user = User.objects.create_user(**validated_data)
-        
-        # Send verification email
-        request = self.context.get('request')
-        if request:
-            from users.utils.email import EmailVerification
-            EmailVerification.send_verification_email(user, request)
-        
+        # The verification email is queued with the user, not sent here
+        with transaction.atomic():
+            user = User.objects.create_user(**validated_data)
+
+            request = self.context.get('request')
+            if request:
+                from users.utils.email import EmailVerification
+                EmailVerification.send_verification_email(user, request)
+
         return user
 
 
@@ -1,25 +1,33 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
+from knox.models import AuthToken
+from .authentication import forget_token
 from .models import User, Profile
 
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
-    """Create or update profile when user is saved"""
+    """Create the profile with the user; save it later only if it was edited"""
     if created:
         Profile.objects.create(user=instance)
-    else:
-        instance.profile.save()
+        return
+    # Only a profile already loaded on this instance can carry edits
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None:
+        dirty_fields = profile.get_dirty_fields()
+        if dirty_fields:
+            profile.save(update_fields=[*dirty_fields, 'updated_at'])
 
 
 @receiver(pre_save, sender=User)
 def update_password_change_date(sender, instance, **kwargs):
     """Update password_changed_at when password changes"""
-    if instance.pk:  # Only for existing users
-        try:
-            original = User.objects.get(pk=instance.pk)
-            if original.password != instance.password:
-                instance.password_changed_at = timezone.now()
-        except User.DoesNotExist:
-            pass  # New user being created
\ No newline at end of file
+    if instance.has_changed('password'):
+        instance.password_changed_at = timezone.now()
+
+
+@receiver(post_delete, sender=AuthToken)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Drop a deleted token (logout, logout-all, expiry) from the auth cache"""
+    forget_token(instance.digest)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from knox.models import AuthToken
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from users.authentication import CachedTokenAuthentication, remember_token
+from users.models import User
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='member@example.com',
+            password='testpass123',
+            first_name='Mem',
+            last_name='Ber',
+            phone='+254712345678'
+        )
+        self.instance, self.token = AuthToken.objects.create(user=self.user)
+
+    def authenticate(self, token=None):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token or self.token}')
+        return CachedTokenAuthentication().authenticate(request)
+
+    def test_cached_token_costs_one_query(self):
+        """Benchmark: a cached token is read by its digest with its user in one query"""
+        with CaptureQueriesContext(connection) as first:
+            self.authenticate()
+        with self.assertNumQueries(1):
+            user, auth_token = self.authenticate()
+        self.assertGreater(len(first.captured_queries), 1)
+        self.assertEqual(user, self.user)
+        self.assertEqual(auth_token.digest, self.instance.digest)
+
+    def test_refresh_written_once_per_window(self):
+        """Test an expiry refresh is written once and not repeated within the window"""
+        AuthToken.objects.filter(pk=self.instance.pk).update(
+            expiry=timezone.now() + timedelta(hours=1)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.authenticate()
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.instance.refresh_from_db()
+        self.assertGreater(self.instance.expiry, timezone.now() + timedelta(hours=23))
+
+    def test_inactive_user_refused_from_cache(self):
+        """Test a cached token stops working as soon as the user is deactivated"""
+        self.authenticate()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_logout_invalidates_cached_token(self):
+        """Test logging out rejects the token even though it was cached"""
+        self.authenticate()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(AuthToken.objects.exists())
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_logout_all_invalidates_every_token(self):
+        """Test logging out everywhere rejects all of the user's cached tokens"""
+        other, other_token = AuthToken.objects.create(user=self.user)
+        self.authenticate()
+        self.authenticate(other_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        response = self.client.post(reverse('logout-all'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for token in (self.token, other_token):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(token)
+
+    def test_token_revoked_elsewhere_is_refused(self):
+        """Test a token deleted by a process with its own cache is refused here"""
+        self.authenticate()
+        AuthToken.objects.filter(pk=self.instance.pk).delete()
+        # This process never saw the delete, so its entry is still there
+        remember_token(self.instance)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
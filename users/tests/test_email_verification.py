@@ -3,6 +3,7 @@ from django.core import mail
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from users.models import User
+from users.outbox import process_email_outbox
 from users.utils.email import EmailVerification, email_verification_token_generator
 
 class EmailVerificationTests(TestCase):
@@ -22,9 +23,11 @@ class EmailVerificationTests(TestCase):
         """Test that verification emails are sent correctly"""
         # Send verification email
         result = EmailVerification.send_verification_email(self.user, self.request)
-        self.assertTrue(result, "Email sending should return True on success")
-        
-        # Check email was sent
+        self.assertTrue(result, "Email sending should return the queued email")
+        self.assertEqual(len(mail.outbox), 0, "Email should only be queued")
+
+        # Check email was sent by the outbox worker
+        process_email_outbox()
         self.assertEqual(len(mail.outbox), 1, "Email should be in outbox")
         self.assertIn('Verify your email address', mail.outbox[0].subject)
         self.assertIn(self.user.email, mail.outbox[0].to)
@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from users.models import EmailOutbox
+from users.outbox import process_email_outbox, queue_email
+
+BACKEND = 'users.tests.test_outbox.CountingBackend'
+
+
+class CountingBackend(EmailBackend):
+    """Locmem backend that counts sessions and can refuse recipients"""
+    opened = 0
+    refuse = set()
+
+    def open(self):
+        if getattr(self, 'is_open', False):
+            return False
+        self.is_open = True
+        CountingBackend.opened += 1
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.refuse:
+                raise ConnectionError('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND=BACKEND)
+class EmailOutboxTests(APITestCase):
+
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.refuse = set()
+
+    def queue(self, to):
+        return queue_email(
+            'Hello', 'emails/verification_email.html',
+            {'verification_url': 'https://example.com/verify/'}, to
+        )
+
+    def test_registration_only_queues_the_email(self):
+        """Test signing up records the verification email instead of sending it"""
+        response = self.client.post(reverse('register'), {
+            'email': 'new@example.com',
+            'first_name': 'New',
+            'last_name': 'User',
+            'phone': '+254712345678',
+            'password': 'Str0ngPass!23',
+            'password2': 'Str0ngPass!23',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.to, ['new@example.com'])
+        self.assertIn('/api/v1/auth/verify-email/', email.html_body)
+        self.assertNotIn('<', email.body)
+
+    def test_worker_reuses_one_connection(self):
+        """Benchmark: a batch of 20 emails is sent over a single SMTP session"""
+        for index in range(20):
+            self.queue(f'user{index}@example.com')
+
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        self.assertIn('Processed 20', out.getvalue())
+        self.assertEqual(len(mail.outbox), 20)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(
+            EmailOutbox.objects.filter(status=EmailOutbox.Status.SENT).count(), 20
+        )
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_given_up(self):
+        """Test a failed send is retried later and marked failed when attempts run out"""
+        CountingBackend.refuse = {'bad@example.com'}
+        bad = self.queue('bad@example.com')
+        self.queue('good@example.com')
+
+        self.assertEqual(process_email_outbox(), 2)
+        self.assertEqual([message.to for message in mail.outbox], [['good@example.com']])
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, EmailOutbox.Status.PENDING)
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn('unexpectedly closed', bad.last_error)
+        self.assertGreater(bad.available_at, timezone.now())
+
+        # Not due yet
+        self.assertEqual(process_email_outbox(), 0)
+        process_email_outbox(now=bad.available_at)
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, EmailOutbox.Status.FAILED)
@@ -0,0 +1,42 @@
+from django.contrib.auth.models import update_last_login
+from django.test import TestCase
+
+from users.models import Profile, User
+
+
+class UserSignalTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(
+            email='member@example.com',
+            password='testpass123',
+            first_name='Mem',
+            last_name='Ber',
+            phone='+254712345678'
+        )
+        self.user = User.objects.get()
+
+    def test_password_change_stamped_without_reload(self):
+        """Test changing the password sets password_changed_at with a single UPDATE"""
+        self.assertIsNone(self.user.password_changed_at)
+        self.user.set_password('newpass456')
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['password'])
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.password_changed_at)
+        self.assertTrue(self.user.check_password('newpass456'))
+
+    def test_login_does_not_touch_profile(self):
+        """Test a last_login update saves only the user row"""
+        self.user.profile
+        with self.assertNumQueries(1):
+            update_last_login(None, self.user)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.password_changed_at)
+
+    def test_loaded_profile_edits_are_saved(self):
+        """Test profile fields edited through the user are saved with it"""
+        self.user.profile.city = 'Nairobi'
+        self.user.save()
+        self.assertEqual(Profile.objects.get().city, 'Nairobi')
@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from users.models import User, UserManager
+
+
+class UsernameAllocationTests(TestCase):
+
+    def create(self, email, index=0):
+        return User.objects.create_user(
+            email=email,
+            password='testpass123',
+            first_name='John',
+            last_name='Doe',
+            phone=f'+2547{index:08d}'
+        )
+
+    def test_same_local_part_gets_next_suffix(self):
+        """Test users sharing a local part get john, john_1, john_2, ..."""
+        users = [self.create(f'john@domain{index}.com', index) for index in range(4)]
+        self.assertEqual(
+            [user.username for user in users], ['john', 'john_1', 'john_2', 'john_3']
+        )
+
+    def test_free_base_name_is_reused(self):
+        """Test the bare local part is handed out again once it is free"""
+        self.create('john@one.com', 1)
+        self.create('john@two.com', 2).delete()
+        User.objects.filter(username='john').delete()
+        self.assertEqual(self.create('john@three.com', 3).username, 'john')
+
+    def test_allocation_is_one_query(self):
+        """Benchmark: 50 users with the same local part, one allocation query each"""
+        for index in range(50):
+            with CaptureQueriesContext(connection) as queries:
+                User.objects._generate_unique_username('john@example.com')
+            self.assertEqual(len(queries.captured_queries), 1)
+            self.create(f'john@domain{index}.com', index)
+        self.assertEqual(
+            User.objects.filter(username__startswith='john').count(), 50
+        )
+        self.assertTrue(User.objects.filter(username='john_49').exists())
+
+    def test_lookalike_usernames_are_ignored(self):
+        """Test names that only start like the base do not affect the suffix"""
+        self.create('john@one.com', 1)
+        User.objects.filter(username='john').update(username='john_smith')
+        self.create('john@two.com', 2)
+        self.assertEqual(self.create('john@three.com', 3).username, 'john_1')
+
+    def test_taken_name_is_retried(self):
+        """Test a name taken by a concurrent signup is reallocated on insert"""
+        self.create('john@one.com', 1)
+        allocate = UserManager._generate_unique_username
+        names = iter(['john'])
+
+        def racing(manager, email):
+            # The first pick is stale, as if another signup just took it
+            return next(names, None) or allocate(manager, email)
+
+        with patch.object(UserManager, '_generate_unique_username', racing):
+            user = self.create('john@two.com', 2)
+        self.assertEqual(user.username, 'john_1')
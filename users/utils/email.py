@@ -1,12 +1,10 @@
-from django.core.mail import EmailMultiAlternatives
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.core.exceptions import ValidationError
 from users.models import User
+from users.outbox import queue_email
 from .tokens import email_verification_token_generator
 import logging
 
@@ -16,7 +14,8 @@ class EmailVerification:
     @staticmethod
     def send_verification_email(user, request):
         """
-        Send email verification link to user with enhanced error handling
+        Queue the email verification link for the user and return the
+        queued email; the ``send_queued_emails`` worker sends it
         """
         try:
             token = email_verification_token_generator.make_token(user)
@@ -32,24 +31,18 @@ class EmailVerification:
                 'site_name': settings.SITE_NAME
             }
 
-            subject = 'Verify your email address'
-            html_message = render_to_string('emails/verification_email.html', context)
-            plain_message = strip_tags(html_message)
-
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email],
-                reply_to=[settings.REPLY_TO_EMAIL],
+            email = queue_email(
+                'Verify your email address',
+                'emails/verification_email.html',
+                context,
+                user.email
             )
-            email.attach_alternative(html_message, "text/html")
-            email.send()
-            
-            logger.info(f"Verification email sent to {user.email}")
-            
+
+            logger.info(f"Verification email queued for {user.email}")
+            return email
+
         except Exception as e:
-            logger.error(f"Failed to send verification email: {str(e)}", exc_info=True)
+            logger.error(f"Failed to queue verification email: {str(e)}", exc_info=True)
             raise ValidationError('Failed to send verification email') from e
 
     @staticmethod
@@ -5,6 +5,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.throttling import AnonRateThrottle
 import logging
 from users.utils.tokens import email_verification_token_generator
+from orders.session_cart import get_cart_token, merge_session_cart
 
 from .serializers import (
     UserRegistrationSerializer,
@@ -46,7 +47,12 @@ class UserLoginAPIView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        
+
+        # Carry over the cart the visitor filled before logging in
+        cart_token = get_cart_token(request)
+        if cart_token:
+            merge_session_cart(cart_token, user)
+
         return Response({
             "user": AuthUserSerializer(
                 user,